@@ -1,24 +1,21 @@
+import asyncio
 import os
-from dotenv import load_dotenv
+import threading
+from dataclasses import asdict
 from langchain.tools import tool
-from langchain_core.prompts import PromptTemplate
 from langchain.agents import create_agent
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain.chat_models import init_chat_model
+from langchain_core.messages import AIMessage, ToolMessage
 
-from tools.drug_retrieval import retrieve_drug_info
+from tools.drug_retrieval import knowledge_version, retrieve_drug_info
 from tools.clinical_trial_tool import clinical_trials_tool
-
-load_dotenv(dotenv_path=".env", override=True)
-
-# 🔐 Ensure key is loaded
-if not os.getenv("GEMINI_API_KEY"):
-    raise ValueError("GEMINI_API_KEY not set. Check your .env file.")
-
-# ✅ GPT-4 model
-llm = init_chat_model(os.getenv("MODEL_NAME"), 
-                      model_provider="google_genai", 
-                      api_key=os.getenv("GEMINI_API_KEY"))
+from tools.web_search import ResilientSearchRun
+from utils.answer_cache import AnswerCache
+from utils.context_budget import ContextBudgetMiddleware
+from utils.query_router import Route, answer_fast, route
+from utils.resilience import QUERY_BUDGET_S, QueryBudgetMiddleware, query_budget
+from utils.resources import get_llm, timed
+from utils.tool_runtime import ParallelToolMiddleware
+from utils.tracing import span
 
 # Tool 1: Drug info from local RAG index
 @tool("DrugInfo")
@@ -27,10 +24,18 @@ def drug_tool(q: str) -> str:
     Input: string drug name.
     """
     return "\n\n".join(doc.page_content for doc in retrieve_drug_info(q))
+
+
+async def adrug_tool(q: str) -> str:
+    return await asyncio.to_thread(drug_tool.func, q)
+
+
+# Used when the agent runs with ainvoke(): tool calls of a turn are gathered concurrently
+drug_tool.coroutine = adrug_tool
 # Tool 2: Clinical trials search
 
 # Tool 3: Web search fallback
-web_search_tool = DuckDuckGoSearchRun(name="WebSearch")
+web_search_tool = ResilientSearchRun(name="WebSearch")
 
 tools = [drug_tool, clinical_trials_tool, web_search_tool]
 
@@ -56,12 +61,154 @@ agent_prompt = '''You are a helpful medical information agent.
         Question: {input}
         Thought:{agent_scratchpad}'''
 
-prompt = PromptTemplate.from_template(agent_prompt)
 
+_medagent = None
+_medagent_lock = threading.Lock()
+
+
+def default_middleware() -> list:
+    return [QueryBudgetMiddleware(), ContextBudgetMiddleware(), ParallelToolMiddleware()]
+
+
+def build_medagent(model=None, agent_tools=None, middleware=None):
+    """Create an agent; model and tools default to the production ones (benchmarks inject stand-ins).
+
+    Independent tool calls from one model turn run concurrently, capped and
+    timed out by ParallelToolMiddleware (TOOL_CONCURRENCY / TOOL_TIMEOUT_S).
+    Their results are trimmed to the context budget by ContextBudgetMiddleware
+    (CONTEXT_OBSERVATION_TOKENS / CONTEXT_CONVERSATION_TOKENS). Once the
+    question's time budget (QUERY_BUDGET_S, set by ask()) is spent,
+    QueryBudgetMiddleware ends the loop.
+    """
+    return create_agent(
+        tools=agent_tools if agent_tools is not None else tools,
+        model=model if model is not None else get_llm(),
+        system_prompt=agent_prompt,
+        middleware=middleware if middleware is not None else default_middleware(),
+    )
+
+
+def get_medagent():
+    """Build the agent on first use; the chat model comes from the shared registry."""
+    global _medagent
+    if _medagent is None:
+        with _medagent_lock:
+            if _medagent is None:
+                with timed("build_agent"):
+                    # 🚀 Initialize the agent
+                    _medagent = build_medagent()
+    return _medagent
+
+
+def __getattr__(name):
+    # Keep `from agent import medagent` working without building at import time
+    if name == "medagent":
+        return get_medagent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def content_to_text(content) -> str:
+    # content can be a string OR a list of blocks like [{"type":"text","text":"..."}]
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, dict):
+                if block.get("type") == "text" and "text" in block:
+                    parts.append(block["text"])
+                elif "content" in block:
+                    parts.append(str(block["content"]))
+                else:
+                    # fallback: keep something readable
+                    parts.append(str(block))
+            else:
+                parts.append(str(block))
+        return "\n".join(parts).strip()
+    return str(content)
+
+
+def final_answer(result) -> str:
+    messages = result.get("messages", result)  # sometimes it's already a list
+
+    final_text = None
+    if isinstance(messages, list):
+        for m in reversed(messages):
+            if isinstance(m, AIMessage):
+                final_text = content_to_text(m.content)  # <-- normalize here
+                break
+            if isinstance(m, dict) and m.get("role") in ("assistant", "ai"):
+                final_text = content_to_text(m.get("content"))
+                break
+    return final_text or str(result)
+
+
+# ♻️ Final answers keyed by normalized question, model and knowledge index version.
+# ANSWER_CACHE_PATH persists them; set ANSWER_CACHE=off to disable.
+answer_cache = AnswerCache(db_path=os.getenv("ANSWER_CACHE_PATH"))
+
+
+def _run_agent(query: str, config, agent) -> dict:
+    result = (agent or get_medagent()).invoke({"messages": [{"role": "user", "content": query}]}, config=config)
+    messages = result.get("messages", []) if isinstance(result, dict) else []
+    tool_messages = [m for m in messages if isinstance(m, ToolMessage)]
+    return {
+        "answer": final_answer(result),
+        "tools": sorted({m.name for m in tool_messages if m.name}),
+        "tokens": sum((m.usage_metadata or {}).get("total_tokens", 0)
+                      for m in messages if isinstance(m, AIMessage)),
+        "context_tokens_saved": sum(m.response_metadata.get("context_budget", {}).get("tokens_saved", 0)
+                                    for m in tool_messages),
+        "result": result,
+        # Never cache an answer produced while a tool was failing or time ran out
+        "cacheable": not any(m.status == "error" for m in tool_messages)
+                     and not any(m.response_metadata.get("budget_exhausted") for m in messages
+                                 if isinstance(m, AIMessage)),
+    }
+
+
+def ask(query: str, config=None, agent=None, llm=None) -> dict:
+    """
+    Answer a question through the answer cache and the query router.
+
+    Single-drug, single-section questions are answered from that section
+    with one LLM call (QUERY_ROUTER=off disables this); everything else
+    runs the agent. Both share a QUERY_BUDGET_S time budget that caps
+    dependency deadlines, tool timeouts and agent turns.
+
+    Returns:
+        Dictionary with answer, cached flag, tools used, LLM tokens, tool
+        observation tokens removed by the context budget, the routing
+        decision and the raw agent result (None on a cache hit)
+    """
+    use_cache = os.getenv("ANSWER_CACHE", "on") != "off"
+    key = AnswerCache.make_key(query, os.getenv("MODEL_NAME", ""), knowledge_version()) if use_cache else None
+    if use_cache:
+        cached = answer_cache.get(key)
+        if cached is not None:
+            return {"answer": cached["answer"], "cached": True, "tools": cached["tools"], "tokens": 0,
+                    "context_tokens_saved": 0, "route": {"path": "cache"}, "result": None}
+
+    with query_budget(QUERY_BUDGET_S):
+        with span("query router", "route") as attributes:
+            decision = route(query) if os.getenv("QUERY_ROUTER", "on") != "off" else Route("agent", "router disabled")
+            attributes.update(asdict(decision))
+        response = None
+        if decision.path == "fast":
+            with span("fast path", "route", drug=decision.drug, section=decision.section) as attributes:
+                try:
+                    message = answer_fast(query, decision, llm or get_llm(), config=config)
+                    response = {"answer": content_to_text(message.content), "tools": ["DrugInfo"],
+                                "tokens": (message.usage_metadata or {}).get("total_tokens", 0),
+                                "context_tokens_saved": 0, "result": message, "cacheable": True}
+                except LookupError as e:
+                    attributes["fallback"] = str(e)
+                    decision = Route("agent", f"fast path unavailable: {e}", decision.drug, decision.section)
+        if response is None:
+            with span("agent path", "route", reason=decision.reason):
+                response = _run_agent(query, config, agent)
 
-# 🚀 Initialize the agent
-medagent = create_agent(
-    tools=tools,
-    model=llm,
-    system_prompt=agent_prompt
-)
\ No newline at end of file
+    cacheable = response.pop("cacheable")
+    if use_cache and cacheable:
+        answer_cache.put(key, response["answer"], response["tools"], response["tokens"])
+    return {**response, "cached": False, "route": asdict(decision)}
@@ -1,39 +1,24 @@
 import os
-from pyexpat.errors import messages
 os.environ["STREAMLIT_SERVER_ENABLE_FILE_WATCHER"] = "false"
 
-import torch
-torch.classes.__path__ = []
+import sys
 
+from utils.resources import VECTOR_STORE, startup_report, warm_up
 
-import sys
-import pysqlite3
+# Chroma needs SQLite >= 3.35; the NumPy store does not touch SQLite
+if VECTOR_STORE == "chroma":
+    import pysqlite3
 
-sys.modules['sqlite3'] = pysqlite3
-from langchain_core.messages import AIMessage
+    sys.modules['sqlite3'] = pysqlite3
 
 import streamlit as st
-from agent import medagent
-
-def content_to_text(content) -> str:
-    # content can be a string OR a list of blocks like [{"type":"text","text":"..."}]
-    if isinstance(content, str):
-        return content
-    if isinstance(content, list):
-        parts = []
-        for block in content:
-            if isinstance(block, dict):
-                if block.get("type") == "text" and "text" in block:
-                    parts.append(block["text"])
-                elif "content" in block:
-                    parts.append(str(block["content"]))
-                else:
-                    # fallback: keep something readable
-                    parts.append(str(block))
-            else:
-                parts.append(str(block))
-        return "\n".join(parts).strip()
-    return str(content)
+from utils import tracing
+
+
+@st.cache_resource
+def start_metrics_endpoint(port: int):
+    # One /metrics server per process, however many times the script reruns
+    return tracing.start_metrics_server(port, host="0.0.0.0")
 
 
 def main():
@@ -41,6 +26,16 @@ def main():
     st.set_page_config(page_title="MedAgent 💊", layout="centered")
     st.title("💊 MedAgent: Your AI Drug Assistant")
 
+    # Imported after the page renders; torch / Chroma load on first use (or in the warm-up below)
+    from agent import answer_cache, ask
+
+    # 🔥 Load embedder, vector store and LLM in the background (no-op after the first run)
+    warm_up()
+    if os.getenv("MEDAGENT_METRICS_PORT"):
+        start_metrics_endpoint(int(os.getenv("MEDAGENT_METRICS_PORT")))
+
+    trace = result = response = None
+
     # 🧠 Input Prompt
     query = st.text_input("Ask a drug-related question (e.g., 'What are the side effects of metformin?')")
 
@@ -48,23 +43,17 @@ def main():
     if query:
         with st.spinner("Thinking..."):
             try:
-                result = medagent.invoke({"messages": [{"role": "user", "content": query}]})
-                messages = result.get("messages", result)  # sometimes it's already a list
-                
-                final_text = None
-                if isinstance(messages, list):
-                    for m in reversed(messages):
-                        if isinstance(m, AIMessage):
-                            final_text = content_to_text(m.content)  # <-- normalize here
-                            break
-                        if isinstance(m, dict) and m.get("role") in ("assistant", "ai"):
-                            final_text = content_to_text(m.get("content"))
-                            break
-                if not final_text:
-                    final_text = str(result)
+                with tracing.trace(query) as trace:
+                    response = ask(query, config={"callbacks": trace.callbacks()})
+                result = response["result"] or response
 
                 st.markdown("### 🧠 Answer")
-                st.markdown(final_text)
+                st.markdown(response["answer"])
+                if response["cached"]:
+                    st.caption("⚡ Served from the answer cache")
+                elif response["route"]["path"] == "fast":
+                    st.caption(f"⚡ Answered from the {response['route']['section']} section for "
+                               f"{response['route']['drug']} without the agent loop")
             except Exception as e:
                 st.error("Something went wrong. Please try again.")
                 st.exception(e)
@@ -72,6 +61,17 @@ def main():
     if st.checkbox("Show agent debug trace"):
         with st.expander("Agent Debug Logs"):
             st.code(result)  
+        if trace is not None:
+            with st.expander("Latency waterfall"):
+                if response is not None:
+                    st.caption(f"✂️ Tool observation tokens trimmed by the context budget: "
+                               f"{response['context_tokens_saved']}")
+                st.code(trace.waterfall())
+                st.json(trace.to_dict())
+        with st.expander("Startup timings"):
+            st.json(startup_report())
+        with st.expander("Answer cache"):
+            st.json(answer_cache.stats())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""Batch mode: answer a file of questions with bounded concurrency.
+
+    uv run python batch.py questions.jsonl --output answers.jsonl --concurrency 4
+
+Input is JSONL (objects with "question" and optional "id", or plain JSON
+strings) or CSV with a "question" column and optional "id" column. One
+JSON record per question is appended to the output as soon as it is
+answered: answer, tools, route, tokens and per-question timings. Rerunning
+with the same output skips questions already answered there, so an
+interrupted run resumes where it stopped; failed questions are retried.
+
+All questions share one agent whose tool results are memoized for the run
+(utils/shared_tool_calls.py), so e.g. DrugInfo("metformin") runs once per
+batch however many questions mention metformin.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Set
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+
+def question_id(question: str) -> str:
+    """Stable id for inputs without one, so resuming works across runs."""
+    return hashlib.sha1(question.strip().encode("utf-8")).hexdigest()[:12]
+
+
+def read_questions(path: str, column: str = "question") -> Iterator[Dict]:
+    """Yield {"id", "question"} from a JSONL or CSV file, skipping blank questions."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            if isinstance(row, str):
+                row = {column: row}
+            question = (row.get(column) or "").strip()
+            if question:
+                yield {"id": str(row.get("id") or question_id(question)), "question": question}
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """Ids already answered in output_path (a truncated last line is ignored)."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def _timings(trace) -> Dict[str, float]:
+    by_kind: Dict[str, float] = {}
+    for s in trace.spans:
+        if s.kind in ("llm", "tool", "vector", "lexical", "embedding"):
+            by_kind[f"{s.kind}_s"] = round(by_kind.get(f"{s.kind}_s", 0.0) + s.duration_s, 4)
+    return {"seconds": round(trace.duration_s, 4), **by_kind}
+
+
+def build_batch_agent(model=None, agent_tools=None):
+    """Agent whose tool results are shared by all questions; returns (agent, middleware)."""
+    from agent import build_medagent, default_middleware
+    from utils.shared_tool_calls import SharedToolCallMiddleware
+
+    shared = SharedToolCallMiddleware()
+    # Innermost, so the raw result is shared and each conversation trims its own copy
+    agent = build_medagent(model=model, agent_tools=agent_tools,
+                           middleware=[*default_middleware(), shared])
+    return agent, shared
+
+
+def run_batch(input_path: str, output_path: str, concurrency: int = BATCH_CONCURRENCY,
+              column: str = "question", limit: Optional[int] = None, agent=None, llm=None,
+              shared=None) -> Dict:
+    """
+    Answer every question of input_path not yet answered in output_path
+
+    Args:
+        input_path: JSONL or CSV file of questions
+        output_path: JSONL results, appended to (and read back to resume)
+        concurrency: Questions answered at once
+        column: Question field / CSV column
+        limit: Stop after this many new questions
+        agent: Agent to use; default the production agent with shared tool calls
+        llm: Chat model for the fast path; default the shared one
+        shared: The SharedToolCallMiddleware of agent, for its counters
+
+    Returns:
+        Counts, wall time, questions per second and shared tool call counters
+    """
+    from agent import ask
+    from utils.tracing import trace
+
+    if agent is None:
+        agent, shared = build_batch_agent()
+
+    done = completed_ids(output_path)
+    counts = {"answered": 0, "failed": 0, "skipped": 0}
+    write_lock = threading.Lock()
+    # Bounds questions read ahead of the workers, so huge inputs stream
+    in_flight = threading.BoundedSemaphore(concurrency * 2)
+
+    def answer(item: Dict) -> None:
+        try:
+            record = {**item}
+            try:
+                with trace(item["question"]) as current:
+                    response = ask(item["question"], config={"callbacks": current.callbacks()}, agent=agent, llm=llm)
+                record.update(status="ok", answer=response["answer"], cached=response["cached"],
+                              tools=response["tools"], route=response["route"], tokens=response["tokens"],
+                              context_tokens_saved=response["context_tokens_saved"])
+            except Exception as e:
+                record.update(status="error", error=f"{type(e).__name__}: {e}")
+            record.update(_timings(current), finished_at=time.time())
+            with write_lock:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                counts["answered" if record["status"] == "ok" else "failed"] += 1
+            print(f"{'✅' if record['status'] == 'ok' else '❌'} {item['id']} "
+                  f"{record['seconds']:.2f}s {item['question'][:60]}")
+        finally:
+            in_flight.release()
+
+    start = time.perf_counter()
+    submitted = set()
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for item in read_questions(input_path, column):
+            if item["id"] in done or item["id"] in submitted:
+                counts["skipped"] += 1
+                continue
+            if limit is not None and len(submitted) >= limit:
+                break
+            submitted.add(item["id"])
+            in_flight.acquire()
+            pool.submit(answer, item)
+    elapsed = time.perf_counter() - start
+
+    processed = counts["answered"] + counts["failed"]
+    summary = {**counts, "seconds": round(elapsed, 3),
+               "questions_per_sec": round(processed / elapsed, 3) if elapsed else 0.0,
+               "shared_tool_calls": shared.stats() if shared is not None else None}
+    print(f"\n📦 {counts['answered']} answered, {counts['failed']} failed, {counts['skipped']} skipped "
+          f"in {elapsed:.1f}s ({summary['questions_per_sec']:.2f} questions/s)")
+    if shared is not None:
+        stats = shared.stats()
+        print(f"🔁 Tool calls: {stats['calls']} requested, {stats['executed']} executed, {stats['shared']} shared")
+    return summary
+
+
+def main(argv=None) -> Dict:
+    parser = argparse.ArgumentParser(description="Answer a JSONL/CSV file of questions with MedAgent")
+    parser.add_argument("input", help="JSONL or CSV file of questions")
+    parser.add_argument("--output", required=True, help="JSONL results; rerun with the same file to resume")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--column", default="question", help="question field / CSV column")
+    parser.add_argument("--limit", type=int, help="answer at most this many new questions")
+    parser.add_argument("--stub-llm", type=float, metavar="LATENCY",
+                        help="dry run: answer with the benchmark stub LLM (seconds per turn)")
+    args = parser.parse_args(argv)
+
+    agent = llm = shared = None
+    if args.stub_llm is not None:
+        from agent import drug_tool
+        from benchmarks.stubs import StubChatModel, make_web_search_tool
+        from tools.clinical_trial_tool import clinical_trials_tool
+
+        llm = StubChatModel(latency_s=args.stub_llm)
+        agent, shared = build_batch_agent(llm, [drug_tool, clinical_trials_tool, make_web_search_tool(0.05)])
+    return run_batch(args.input, args.output, args.concurrency, args.column, args.limit,
+                     agent=agent, llm=llm, shared=shared)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Latency and recall of the embedding backends on the drug corpus.
+
+Embeds the MedlinePlus section chunks and a query set with every backend
+and compares each against the first one (the PyTorch model by default):
+
+* recall@k: overlap of exact top-k neighbours when corpus and queries are
+  both embedded by the backend (a store re-ingested with it);
+* query_only_recall@k: queries embedded by the backend against the
+  baseline corpus vectors (switching backends without re-ingesting);
+* mean cosine between the backend's and the baseline's document vectors.
+
+    uv run python -m benchmarks.embeddings --backends torch,onnx,onnx-int8 --threads 1,4
+
+The model files must be available locally (Hugging Face cache) or online.
+"""
+import argparse
+import json
+import os
+import platform
+import time
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.run import DEFAULT_CSV, DEFAULT_QUERIES, percentile
+from utils import resources
+from utils.embeddings import load_embeddings
+from utils.ingest_embed import row_to_documents
+
+QUERY_TEMPLATES = ["What are the side effects of {}?", "What is {} used for?", "precautions before taking {}"]
+
+
+def load_corpus(csv_path: str, max_docs: int) -> List[str]:
+    texts = []
+    for row in pd.read_csv(csv_path, sep=";").to_dict("records"):
+        texts.extend(d.page_content for d in row_to_documents(row))
+    return texts[:max_docs] if max_docs else texts
+
+
+def load_queries(queries_path: str, csv_path: str) -> List[str]:
+    with open(queries_path) as f:
+        queries = [q["question"] for q in json.load(f) if "DrugInfo" in q["tools"]]
+    drugs = pd.read_csv(csv_path, sep=";")["drug_name"].dropna().astype(str)
+    queries.extend(t.format(drug) for drug in drugs for t in QUERY_TEMPLATES)
+    return queries
+
+
+def top_k(queries: np.ndarray, corpus: np.ndarray, k: int) -> np.ndarray:
+    # Vectors are L2-normalized, so the dot product is the cosine similarity
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall(found: np.ndarray, expected: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(e)) for f, e in zip(found, expected))
+    return hits / expected.size
+
+
+def measure(backend: str, model: str, threads: int, batch_size: int,
+            corpus: List[str], queries: List[str]) -> Dict:
+    start = time.perf_counter()
+    embedder = load_embeddings(model, backend=backend, threads=threads, batch_size=batch_size)
+    embedder.embed_query("warm up")
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    doc_vectors = np.asarray(embedder.embed_documents(corpus), dtype=np.float32)
+    corpus_s = time.perf_counter() - start
+
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(embedder.embed_query(query))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    return {
+        "load_s": round(load_s, 3),
+        "docs_per_sec": round(len(corpus) / corpus_s, 1) if corpus_s else 0.0,
+        "query_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "query_p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "_docs": doc_vectors,
+        "_queries": np.asarray(query_vectors, dtype=np.float32),
+    }
+
+
+def main(argv=None) -> Dict:
+    parser = argparse.ArgumentParser(description="Embedding backend latency / recall benchmark")
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8",
+                        help="comma-separated backends; the first is the recall baseline")
+    parser.add_argument("--model", default=resources.EMBEDDING_MODEL)
+    parser.add_argument("--threads", default="0", help="comma-separated thread counts (0 = library default)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--queries", default=DEFAULT_QUERIES)
+    parser.add_argument("--max-docs", type=int, default=0, help="limit the corpus (0 = all chunks)")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.csv, args.max_docs)
+    queries = load_queries(args.queries, args.csv)
+    backends = args.backends.split(",")
+    report: Dict = {
+        "meta": {"python": platform.python_version(), "cpus": os.cpu_count(), "model": args.model,
+                 "docs": len(corpus), "queries": len(queries), "k": args.k, "baseline": backends[0]},
+        "backends": {},
+    }
+
+    baseline = None
+    for threads in (int(t) for t in args.threads.split(",")):
+        for backend in backends:
+            result = measure(backend, args.model, threads, args.batch_size, corpus, queries)
+            docs, query_vectors = result.pop("_docs"), result.pop("_queries")
+            if baseline is None:
+                baseline = {"docs": docs, "expected": top_k(query_vectors, docs, args.k)}
+            result[f"recall@{args.k}"] = round(recall(top_k(query_vectors, docs, args.k), baseline["expected"]), 4)
+            result[f"query_only_recall@{args.k}"] = round(
+                recall(top_k(query_vectors, baseline["docs"], args.k), baseline["expected"]), 4)
+            result["mean_cosine_to_baseline"] = round(float((docs * baseline["docs"]).sum(axis=1).mean()), 5)
+            report["backends"][f"{backend}/threads={threads}"] = result
+
+    report["peak_rss_mb"] = round(resources.peak_rss_mb(), 1)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Fault-injection run: how the agent behaves when its remote dependencies misbehave.
+
+Drives `ask()` with the stub LLM against the stub ClinicalTrials.gov server
+and stub web search while injecting faults, one scenario after another:
+
+    healthy      no faults (fills the response cache)
+    trials-slow  a share of trials requests stall; hedged requests answer
+    trials-down  trials server drops every connection; stale cache is served
+    trials-cold  same outage with an empty cache; the tool reports itself
+                 unavailable and the breaker opens, so later calls fail fast
+    recovered    faults cleared; after the breaker reset a probe closes it
+    web-flaky    half of the web searches fail
+    over-budget  every trials request stalls and the question budget is
+                 shorter than the dependency deadline
+
+    uv run python -m benchmarks.faults --questions 12 --output faults.json
+
+Per scenario it reports latency percentiles, dependency outcomes (ok,
+hedged, stale, unavailable), breaker states and how many answers said a
+tool was unavailable or used stale results.
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+
+from benchmarks.run import summarize
+from benchmarks.stubs import FaultPlan, StubChatModel, StubClinicalTrialsServer, make_web_search_tool
+
+DRUGS = ["metformin", "warfarin", "ibuprofen", "liraglutide", "atorvastatin", "omeprazole"]
+
+
+def make_questions(count: int) -> List[str]:
+    templates = ["Are there any recruiting trials for {}?", "Latest FDA news and ongoing studies for {}"]
+    return [templates[i % 2].format(DRUGS[i % len(DRUGS)]) for i in range(count)]
+
+
+def run_scenario(name: str, questions: List[str], agent, llm, dependencies) -> Dict:
+    from agent import ask
+
+    before = {d.name: d.stats() for d in dependencies}
+    latencies, unavailable, stale, out_of_time = [], 0, 0, 0
+    start = time.perf_counter()
+    for question in questions:
+        began = time.perf_counter()
+        response = ask(question, agent=agent, llm=llm)
+        latencies.append(time.perf_counter() - began)
+        answer = response["answer"]
+        unavailable += "unavailable right now" in answer
+        stale += "not responding" in answer
+        out_of_time += "time limit" in answer or "time budget" in answer
+    report = summarize(latencies, time.perf_counter() - start)
+    report.update(answers_unavailable=unavailable, answers_stale=stale, answers_out_of_time=out_of_time)
+    report["dependencies"] = {}
+    for d in dependencies:
+        after = d.stats()
+        report["dependencies"][d.name] = {"state": after.pop("state"),
+                                          **{k: v - before[d.name].get(k, 0) for k, v in after.items()
+                                             if v - before[d.name].get(k, 0)}}
+    print(f"🧪 {name:12s} p50 {report['p50_ms']:8.1f}ms  p95 {report['p95_ms']:8.1f}ms  "
+          f"unavailable {unavailable}  stale {stale}  {json.dumps(report['dependencies'])}")
+    return report
+
+
+def main(argv=None) -> Dict:
+    parser = argparse.ArgumentParser(description="Inject faults into MedAgent's dependencies")
+    parser.add_argument("--questions", type=int, default=12, help="questions per scenario")
+    parser.add_argument("--deadline", type=float, default=2.0, help="dependency deadline in seconds")
+    parser.add_argument("--hedge-after", type=float, default=0.5)
+    parser.add_argument("--stall", type=float, default=5.0, help="seconds a slow request stalls")
+    parser.add_argument("--breaker-failures", type=int, default=3)
+    parser.add_argument("--breaker-reset", type=float, default=2.0)
+    parser.add_argument("--budget", type=float, default=1.0, help="question budget of the over-budget scenario")
+    parser.add_argument("--llm-latency", type=float, default=0.02)
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args(argv)
+
+    # Every question must reach the agent and its tools
+    os.environ["ANSWER_CACHE"] = "off"
+    os.environ["QUERY_ROUTER"] = "off"
+
+    import agent as agent_module
+    from agent import build_medagent
+    from tools import clinical_trial_tool as ct
+    from tools.clinical_trials_api import ResponseCache
+    from tools.web_search import last_results, web_dependency
+
+    dependencies = [ct.trials_dependency, web_dependency]
+    for dependency in dependencies:
+        dependency.timeout_s = args.deadline
+        dependency.hedge_after_s = args.hedge_after
+        dependency.breaker.failures = args.breaker_failures
+        dependency.breaker.reset_after_s = args.breaker_reset
+    # Entries expire almost at once, so the outage below can only be served stale
+    ct.api.cache = ResponseCache(ttls={"search_studies": 0.5})
+    last_results.clear()
+
+    questions = make_questions(args.questions)
+    trials_faults, web_faults = FaultPlan(seed=0), FaultPlan(seed=1)
+    llm = StubChatModel(latency_s=args.llm_latency)
+    agent = build_medagent(model=llm, agent_tools=[ct.clinical_trials_tool,
+                                                   make_web_search_tool(0.02, web_faults)])
+    report: Dict = {"settings": vars(args), "scenarios": {}}
+
+    def scenario(name: str, **changes) -> None:
+        for plan, values in ((trials_faults, changes.get("trials", {})), (web_faults, changes.get("web", {}))):
+            plan.down, plan.error_rate, plan.slow_rate = False, 0.0, 0.0
+            plan.slow_s = args.stall
+            for key, value in values.items():
+                setattr(plan, key, value)
+        report["scenarios"][name] = run_scenario(name, questions, agent, llm, dependencies)
+
+    with StubClinicalTrialsServer(latency_s=0.02, faults=trials_faults) as server:
+        ct.api.base_url = server.base_url
+        scenario("healthy")
+        scenario("trials-slow", trials={"slow_rate": 0.5})
+        time.sleep(0.6)
+        scenario("trials-down", trials={"down": True})
+        ct.api.cache.clear()
+        scenario("trials-cold", trials={"down": True})
+        time.sleep(args.breaker_reset)
+        scenario("recovered")
+        scenario("web-flaky", web={"error_rate": 0.5})
+        saved_budget = agent_module.QUERY_BUDGET_S
+        agent_module.QUERY_BUDGET_S = args.budget
+        ct.api.cache.clear()
+        try:
+            scenario("over-budget", trials={"slow_rate": 1.0})
+        finally:
+            agent_module.QUERY_BUDGET_S = saved_budget
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Offline benchmark and load test for MedAgent.
+
+Runs ingestion, the retrieval and clinical-trials tools, and full agent
+invocations against local stand-ins (see benchmarks/stubs.py), then prints
+a JSON report with p50/p95/p99 latency, QPS, peak RSS and per-tool time.
+
+    uv run python -m benchmarks.run --concurrency 1,4,8 --output bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from benchmarks.stubs import StubChatModel, StubClinicalTrialsServer, ToolTimer, make_web_search_tool
+from utils import resources
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_QUERIES = os.path.join(HERE, "queries.json")
+DEFAULT_CSV = os.path.join(HERE, "..", "data", "medlineplus_drugs.csv")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], wall_s: float) -> Dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "qps": round(len(ordered) / wall_s, 2) if wall_s else 0.0,
+    }
+
+
+def drive(fn: Callable[[str], object], questions: List[str], concurrency: int) -> Dict:
+    """Call fn for every question with `concurrency` threads and time each call."""
+    def timed_call(question):
+        start = time.perf_counter()
+        fn(question)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed_call, questions))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def use_offline_embeddings(size: int = 384) -> None:
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    resources.reset()
+    resources._instances["embedding"] = DeterministicFakeEmbedding(size=size)
+
+
+def main(argv=None) -> Dict:
+    parser = argparse.ArgumentParser(description="Offline MedAgent benchmark")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES)
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--concurrency", default="1,4", help="comma-separated concurrency levels")
+    parser.add_argument("--repeat", type=int, default=2, help="times the query corpus is replayed per level")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per stub LLM turn")
+    parser.add_argument("--web-latency", type=float, default=0.2, help="seconds per stub web search")
+    parser.add_argument("--trials-latency", type=float, default=0.15, help="seconds per stub API response")
+    parser.add_argument("--real-embeddings", action="store_true",
+                        help="use the real sentence-transformers model (must be cached locally)")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args(argv)
+
+    with open(args.queries) as f:
+        corpus = json.load(f)
+    questions = [q["question"] for q in corpus] * args.repeat
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    if not args.real_embeddings:
+        use_offline_embeddings()
+    workdir = tempfile.mkdtemp(prefix="medagent-bench-")
+    resources.CHROMA_DIR = workdir
+
+    report: Dict = {
+        "meta": {"python": platform.python_version(), "queries": len(corpus), "repeat": args.repeat,
+                 "real_embeddings": args.real_embeddings, "llm_latency_s": args.llm_latency,
+                 "web_latency_s": args.web_latency, "trials_latency_s": args.trials_latency},
+    }
+
+    from utils.ingest_embed import inject_medlineplus_to_chroma
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingest = inject_medlineplus_to_chroma(args.csv, workdir)
+    report["ingest"] = {k: round(v, 3) if isinstance(v, float) else v for k, v in ingest.items()}
+
+    from agent import build_medagent, drug_tool
+    from tools import clinical_trial_tool as ct
+    from tools.drug_retrieval import retrieval_cache, retrieve_drug_info
+
+    report["retrieve_drug_info"] = {}
+    retrieval_cache.invalidate()
+    report["retrieve_drug_info"]["cold"] = drive(retrieve_drug_info, [q["question"] for q in corpus], 1)
+    for level in levels:
+        report["retrieve_drug_info"][f"c{level}"] = drive(retrieve_drug_info, questions, level)
+
+    with StubClinicalTrialsServer(latency_s=args.trials_latency) as server:
+        ct.api.base_url = server.base_url
+        ct.api.cache.clear()
+        trial_questions = [q["question"] for q in corpus if "ClinicalTrialsSearch" in q["tools"]] * args.repeat
+        report["clinical_trials_tool"] = {}
+        for level in levels:
+            ct.api.cache.clear()
+            report["clinical_trials_tool"][f"c{level}"] = drive(
+                lambda q: ct.clinical_trials_tool.invoke({"query": q}), trial_questions, level)
+        report["clinical_trials_tool"]["cache"] = ct.api.cache_stats()
+
+        agent = build_medagent(model=StubChatModel(latency_s=args.llm_latency),
+                               agent_tools=[drug_tool, ct.clinical_trials_tool,
+                                            make_web_search_tool(args.web_latency)])
+        report["agent"] = {}
+        for level in levels:
+            ct.api.cache.clear()
+            timer = ToolTimer()
+            run = drive(lambda q: agent.invoke({"messages": [{"role": "user", "content": q}]},
+                                               config={"callbacks": [timer]}),
+                        questions, level)
+            run["tool_time_s"] = {name: round(total, 4) for name, total in sorted(timer.totals.items())}
+            run["tool_calls"] = dict(sorted(timer.calls.items()))
+            report["agent"][f"c{level}"] = run
+        report["stub_trials_requests"] = server.requests
+
+    report["retrieval_cache"] = retrieval_cache.stats()
+    report["peak_rss_mb"] = round(resources.peak_rss_mb(), 1)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
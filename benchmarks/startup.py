@@ -0,0 +1,114 @@
+"""Startup profile: what importing MedAgent's entry points costs.
+
+Imports each module in a fresh interpreter under `python -X importtime`
+and reports the wall time, RSS after import, import time per top-level
+package and the slowest modules, plus which heavy libraries (torch,
+chromadb, pandas, ...) were pulled in. --warm also loads the embedder and
+vector store, as the first question would; --profile compares runtime
+profiles (MEDAGENT_PROFILE).
+
+    uv run python -m benchmarks.startup --module agent --module serve --profile full --profile lite
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; prints one JSON line after the imports
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter() - start
+report = {{"import_s": imported}}
+if {warm}:
+    from utils.resources import warm_up
+    start = time.perf_counter()
+    warm_up(background=False, include_llm=False)
+    report["warm_s"] = time.perf_counter() - start
+from utils.resources import peak_rss_mb
+from utils.runtime_profile import heavy_modules_loaded
+report.update(peak_rss_mb=peak_rss_mb(), heavy_modules=heavy_modules_loaded(), modules=len(sys.modules))
+print("STARTUP_PROFILE " + json.dumps(report))
+"""
+
+
+def parse_importtime(stderr: str) -> List[tuple]:
+    """(module, self_us, cumulative_us, depth) for each line of -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def profile_module(module: str, profile: str, warm: bool = False, top: int = 15) -> Dict:
+    env = {**os.environ, "MEDAGENT_PROFILE": profile, "PYTHONPATH": ROOT}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, warm=warm)],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    marker = next((line for line in result.stdout.splitlines() if line.startswith("STARTUP_PROFILE ")), None)
+    if marker is None:
+        error = (result.stderr.strip().splitlines() or ["no output"])[-1]
+        return {"error": error}
+    report = json.loads(marker.split(" ", 1)[1])
+
+    rows = parse_importtime(result.stderr)
+    packages: Dict[str, int] = {}
+    for name, self_us, _, _ in rows:
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+    # Modules the entry point (or the MedAgent code it imports) asked for directly
+    first_party = {"agent", "app", "serve", "batch", "tools", "utils", "benchmarks"}
+    direct = [(name, cumulative) for name, _, cumulative, depth in rows
+              if depth <= 1 or name.split(".")[0] in first_party]
+    return {
+        "import_s": round(report["import_s"], 3),
+        **({"warm_s": round(report["warm_s"], 3)} if "warm_s" in report else {}),
+        "peak_rss_mb": round(report["peak_rss_mb"], 1),
+        "modules": report["modules"],
+        "heavy_modules": report["heavy_modules"],
+        "packages_ms": {name: round(us / 1000, 1)
+                        for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]},
+        "slowest_imports_ms": {name: round(us / 1000, 1)
+                               for name, us in sorted(direct, key=lambda item: -item[1])[:top]},
+    }
+
+
+def main(argv=None) -> Dict:
+    parser = argparse.ArgumentParser(description="Import-time profile of MedAgent entry points")
+    parser.add_argument("--module", action="append", help="module to import (repeatable, default agent)")
+    parser.add_argument("--profile", action="append", help="MEDAGENT_PROFILE to use (repeatable, default full)")
+    parser.add_argument("--warm", action="store_true", help="also load the embedder and vector store")
+    parser.add_argument("--top", type=int, default=15, help="packages / modules listed per report")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args(argv)
+
+    report: Dict = {}
+    for profile in args.profile or ["full"]:
+        for module in args.module or ["agent"]:
+            result = profile_module(module, profile, args.warm, args.top)
+            report[f"{module}@{profile}"] = result
+            if "error" in result:
+                print(f"❌ {module} ({profile}): {result['error']}", file=sys.stderr)
+            else:
+                print(f"⏱️ {module} ({profile}): {result['import_s']:.2f}s import, "
+                      f"{result['peak_rss_mb']:.0f} MB, heavy: {', '.join(result['heavy_modules']) or 'none'}",
+                      file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Local stand-ins for Gemini, DuckDuckGo and ClinicalTrials.gov.
+
+They let the benchmark (and anything else that needs to run offline) drive
+the real agent graph, tools and HTTP client code without network access.
+Each stand-in sleeps for a configurable latency so results stay comparable
+to production shapes, and can inject faults (errors, stalls, outages) from
+a `FaultPlan` to exercise the breakers, deadlines and stale fallbacks.
+"""
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain.tools import tool
+
+TRIAL_WORDS = ("trial", "trials", "study", "studies", "recruiting")
+WEB_WORDS = ("latest", "news", "fda", "warning", "recall", "approved", "2024", "2025")
+
+
+class StubChatModel(BaseChatModel):
+    """Rule-based chat model that plans tool calls the way the agent prompt asks.
+
+    First turn: call DrugInfo for drug questions, ClinicalTrialsSearch when
+    trials are mentioned and WebSearch for news-like questions, all in one
+    message. Next turn: write a final answer from the tool observations.
+    Without bound tools it answers straight from the last message.
+    Token usage is estimated (~4 characters per token) so cost-related
+    metrics have something realistic to report.
+    """
+
+    latency_s: float = 0.05
+    tool_names: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "medagent-stub"
+
+    def bind_tools(self, tools, **kwargs):
+        names = [getattr(t, "name", None) or t.get("name") for t in tools]
+        return self.model_copy(update={"tool_names": names})
+
+    def _plan(self, question: str) -> List[dict]:
+        text = question.lower()
+        calls = []
+        if any(w in text for w in TRIAL_WORDS):
+            calls.append(("ClinicalTrialsSearch", {"query": _topic(question)}))
+        if any(w in text for w in WEB_WORDS):
+            calls.append(("WebSearch", {"query": question}))
+        if not calls or re.search(r"side effect|use|precaution|dose|interact|take", text):
+            calls.insert(0, ("DrugInfo", {"q": question}))
+        return [{"name": name, "args": args, "id": f"call_{i}", "type": "tool_call"}
+                for i, (name, args) in enumerate(calls) if not self.tool_names or name in self.tool_names]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_s)
+        prompt_chars = sum(len(str(m.content)) for m in messages)
+        question = next((str(m.content) for m in messages if isinstance(m, HumanMessage)), "")
+        if not self.tool_names:
+            # Not bound to tools (e.g. the query router's summarizing call): answer from the prompt
+            message = AIMessage(content="Final Answer: " + str(messages[-1].content)[:200])
+        elif isinstance(messages[-1], ToolMessage):
+            observations = [str(m.content) for m in messages if isinstance(m, ToolMessage)]
+            content = "Final Answer: " + " ".join(o[:200] for o in observations)
+            message = AIMessage(content=content)
+        else:
+            message = AIMessage(content="", tool_calls=self._plan(question))
+        message.usage_metadata = {
+            "input_tokens": prompt_chars // 4,
+            "output_tokens": max(1, len(str(message.content)) // 4),
+            "total_tokens": prompt_chars // 4 + max(1, len(str(message.content)) // 4),
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+@dataclass
+class FaultPlan:
+    """What share of calls a stand-in fails; can be changed while it is running.
+
+    down: every call fails (connection dropped / exception)
+    error_rate: share of calls answered with HTTP 503 / an exception
+    slow_rate: share of calls that stall for slow_s on top of the latency
+    """
+
+    error_rate: float = 0.0
+    slow_rate: float = 0.0
+    slow_s: float = 30.0
+    down: bool = False
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> Optional[str]:
+        """The fault for one call: "down", "error", "slow" or None."""
+        if self.down:
+            return "down"
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.slow_rate:
+            return "slow"
+        return None
+
+
+def _topic(question: str) -> str:
+    words = [w for w in re.findall(r"[A-Za-z0-9-]+", question)
+             if w.lower() not in TRIAL_WORDS + ("are", "there", "any", "for", "ongoing", "the", "of", "what")]
+    return " ".join(words[:4]) or question
+
+
+def make_web_search_tool(latency_s: float = 0.2, faults: Optional[FaultPlan] = None):
+    """Stand-in for the WebSearch tool, behind the same single-flight / breaker / stale fallback."""
+    from tools.web_search import resilient_search
+
+    def search(query: str) -> str:
+        fault = faults.draw() if faults is not None else None
+        if fault in ("down", "error"):
+            raise ConnectionError(f"web search stub: injected {fault}")
+        time.sleep(latency_s + (faults.slow_s if fault == "slow" else 0.0))
+        return (f"Result 1 for {query}: regulators published an update this year. "
+                f"Result 2 for {query}: a summary article discusses recent findings.")
+
+    @tool("WebSearch")
+    def web_search_stub(query: str) -> str:
+        """A wrapper around web search. Input should be a search query."""
+        return resilient_search(search, query)
+    return web_search_stub
+
+
+def fake_study(nct_id: str, title: str, status: str = "RECRUITING") -> dict:
+    return {
+        "protocolSection": {
+            "identificationModule": {"nctId": nct_id, "briefTitle": title},
+            "statusModule": {"overallStatus": status,
+                             "lastUpdatePostDateStruct": {"date": "2024-01-15"}},
+            "conditionsModule": {"conditions": [title.split()[0]]},
+        }
+    }
+
+
+class StubClinicalTrialsServer:
+    """Threaded HTTP server imitating the ClinicalTrials.gov v2 /studies endpoints.
+
+    Use `base_url` as the ClinicalTrialsAPI base URL. `studies` can be
+    replaced with a recorded dump; search filters on query.term/query.cond
+    substrings, comma-separated query.id lists and a LastUpdatePostDate
+    RANGE in filter.advanced, honours sort=LastUpdatePostDate:asc|desc and
+    paginates with numeric page tokens. `faults` makes requests fail: "down"
+    drops the connection, "error" answers 503, "slow" stalls.
+    """
+
+    def __init__(self, latency_s: float = 0.15, studies: Optional[List[dict]] = None,
+                 faults: Optional[FaultPlan] = None):
+        self.latency_s = latency_s
+        self.faults = faults if faults is not None else FaultPlan()
+        self.studies = studies if studies is not None else [
+            fake_study(f"NCT{10000000 + i}", f"{drug} trial {i}")
+            for i, drug in enumerate(["Metformin", "Warfarin", "Ibuprofen", "Liraglutide",
+                                      "Atorvastatin", "Omeprazole", "Albuterol", "Amoxicillin"] * 4)
+        ]
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.requests += 1
+                fault = stub.faults.draw()
+                if fault == "down":
+                    self.close_connection = True
+                    return
+                time.sleep(stub.latency_s + (stub.faults.slow_s if fault == "slow" else 0.0))
+                status, body = (503, {"error": "injected fault"}) if fault == "error" \
+                    else stub.respond(urlparse(self.path))
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/api/v2"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def respond(self, url) -> tuple:
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        path = url.path.split("/api/v2", 1)[-1]
+        if path.startswith("/studies/") and path != "/studies/metadata":
+            nct_id = path.rsplit("/", 1)[-1]
+            for study in self.studies:
+                if study["protocolSection"]["identificationModule"]["nctId"] == nct_id:
+                    return 200, study
+            return 404, {"error": "not found"}
+        if path == "/studies":
+            term = (params.get("query.term") or params.get("query.cond") or "").lower()
+            words = [w for w in term.split() if len(w) > 3]
+            matches = [s for s in self.studies
+                       if not words or any(w in json.dumps(s).lower() for w in words)]
+            if params.get("query.id"):
+                ids = set(params["query.id"].split(","))
+                matches = [s for s in matches if s["protocolSection"]["identificationModule"]["nctId"] in ids]
+            since = re.search(r"AREA\[LastUpdatePostDate\]RANGE\[([\d-]+),", params.get("filter.advanced", ""))
+            if since:
+                matches = [s for s in matches if s["protocolSection"]["statusModule"]
+                           .get("lastUpdatePostDateStruct", {}).get("date", "") >= since.group(1)]
+            if params.get("sort", "").startswith("LastUpdatePostDate"):
+                matches.sort(key=lambda s: s["protocolSection"]["statusModule"]
+                             .get("lastUpdatePostDateStruct", {}).get("date", ""),
+                             reverse=params["sort"].endswith(":desc"))
+            start = int(params.get("pageToken", 0))
+            size = int(params.get("pageSize", 10))
+            body = {"studies": matches[start:start + size], "totalCount": len(matches)}
+            if start + size < len(matches):
+                body["nextPageToken"] = str(start + size)
+            return 200, body
+        if path == "/stats":
+            return 200, {"totalStudies": len(self.studies)}
+        return 200, {"fields": []}
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ToolTimer(BaseCallbackHandler):
+    """Callback handler that sums wall-clock time per tool name."""
+
+    def __init__(self):
+        self.totals: dict = {}
+        self.calls: dict = {}
+        self._starts: dict = {}
+        self._lock = threading.Lock()
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs: Any):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._starts[run_id] = (name, time.perf_counter())
+
+    def _finish(self, run_id):
+        name, start = self._starts.pop(run_id, (None, None))
+        if name is None:
+            return
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - start
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def on_tool_end(self, output, *, run_id, **kwargs: Any):
+        self._finish(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs: Any):
+        self._finish(run_id)
@@ -0,0 +1,149 @@
+"""Chroma vs the NumPy exact-search store on the same vectors.
+
+Embeds the MedlinePlus section chunks once, writes them to a Chroma store
+and to NumPy stores (float32 and float16), then reports for each: open
+time, single-query p50/p95, batched query throughput, on-disk size and
+recall@k against exact float32 search.
+
+    uv run python -m benchmarks.vector_stores --replicate 20 --batch 32
+
+Embeddings are deterministic fakes unless --real-embeddings; --replicate
+adds jittered copies of the corpus to see how each store scales.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.embeddings import load_corpus, load_queries, recall
+from benchmarks.run import DEFAULT_CSV, DEFAULT_QUERIES, percentile, use_offline_embeddings
+from utils import resources
+
+
+def directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def build_vectors(corpus: List[str], queries: List[str], replicate: int, seed: int = 0):
+    embedder = resources.get_embedding()
+    docs = np.asarray(embedder.embed_documents(corpus), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    copies = [docs] + [docs + rng.normal(0, 0.01, docs.shape).astype(np.float32) for _ in range(replicate - 1)]
+    query_vectors = np.asarray([embedder.embed_query(q) for q in queries], dtype=np.float32)
+    return np.vstack(copies), query_vectors
+
+
+def write_chroma(path: str, ids: List[str], texts: List[str], vectors: np.ndarray) -> None:
+    import chromadb
+    from chromadb.api.shared_system_client import SharedSystemClient
+    collection = chromadb.PersistentClient(path=path).create_collection("langchain")
+    for start in range(0, len(ids), 1000):
+        collection.add(ids=ids[start:start + 1000], embeddings=vectors[start:start + 1000],
+                       documents=texts[start:start + 1000])
+    # Reopened cold below
+    SharedSystemClient.clear_system_cache()
+
+
+def open_store(kind: str, path: str):
+    """(store, batched search function returning top-k ids per query)."""
+    if kind == "chroma":
+        import chromadb
+        collection = chromadb.PersistentClient(path=path).get_collection("langchain")
+        return collection, lambda q, k: collection.query(query_embeddings=q, n_results=k, include=[])["ids"]
+    from tools.numpy_store import NumpyCollection
+    collection = NumpyCollection(path)
+
+    def search(q, k):
+        rows = collection.rows()
+        return [[rows.ids[i] for i, _ in hits] for hits in collection.search(q, k, rows)]
+    return collection, search
+
+
+def measure(kind: str, path: str, queries: np.ndarray, k: int, batch: int, expected: np.ndarray) -> Dict:
+    start = time.perf_counter()
+    _, search = open_store(kind, path)
+    search(queries[:1], k)
+    open_s = time.perf_counter() - start
+
+    latencies, found = [], []
+    for q in queries:
+        start = time.perf_counter()
+        found.append(search(q[None, :], k)[0])
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        search(queries[i:i + batch], k)
+    batched_s = time.perf_counter() - start
+
+    return {
+        "open_s": round(open_s, 4),
+        "query_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "query_p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        f"batched_qps@{batch}": round(len(queries) / batched_s, 1) if batched_s else 0.0,
+        f"recall@{k}": round(recall(np.asarray(found), expected), 4),
+        "disk_mb": round(directory_bytes(path) / 1e6, 3),
+    }
+
+
+def main(argv=None) -> Dict:
+    parser = argparse.ArgumentParser(description="Chroma vs NumPy vector store benchmark")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=32, help="queries per batched search")
+    parser.add_argument("--replicate", type=int, default=1, help="corpus copies (with jitter) to scale it up")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--queries", default=DEFAULT_QUERIES)
+    parser.add_argument("--real-embeddings", action="store_true",
+                        help="use the real sentence-transformers model (must be cached locally)")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args(argv)
+
+    if not args.real_embeddings:
+        use_offline_embeddings()
+    corpus = load_corpus(args.csv, 0)
+    queries = load_queries(args.queries, args.csv)
+    vectors, query_vectors = build_vectors(corpus, queries, args.replicate)
+    texts = corpus * args.replicate
+    ids = [f"doc-{i}" for i in range(len(texts))]
+
+    # Ground truth: exact float32 search
+    distances = (query_vectors ** 2).sum(axis=1, keepdims=True) + (vectors ** 2).sum(axis=1) \
+        - 2 * query_vectors @ vectors.T
+    expected = np.asarray(ids)[np.argsort(distances, axis=1)[:, :args.k]]
+
+    from tools.numpy_store import NumpyCollection
+    workdir = tempfile.mkdtemp(prefix="medagent-stores-")
+    report: Dict = {
+        "meta": {"python": platform.python_version(), "cpus": os.cpu_count(), "docs": len(ids),
+                 "dim": int(vectors.shape[1]), "queries": len(queries), "k": args.k,
+                 "embeddings": "real" if args.real_embeddings else "fake"},
+        "stores": {},
+    }
+    try:
+        write_chroma(os.path.join(workdir, "chroma"), ids, texts, vectors)
+        for dtype in ("float32", "float16"):
+            NumpyCollection(os.path.join(workdir, dtype), dtype).upsert(ids, vectors, texts, None)
+        for name, kind in (("chroma", "chroma"), ("numpy-float32", "numpy"), ("numpy-float16", "numpy")):
+            path = os.path.join(workdir, name.split("-")[-1])
+            report["stores"][name] = measure(kind, path, query_vectors, args.k, args.batch, expected)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report["peak_rss_mb"] = round(resources.peak_rss_mb(), 1)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""Headless HTTP/JSON serving mode: agent worker processes behind one bounded queue.
+
+    uv run python serve.py --workers 4 --port 8000
+
+    POST /ask      {"question": "..."} -> {"answer", "cached", "tools", "tokens", "context_tokens_saved",
+                                           "route", "worker", "latency_s"}
+    GET  /health   worker liveness, queue depth, retrieval service status
+    GET  /metrics  Prometheus text: agent spans plus queue / worker gauges
+
+The parent process loads the embedder, Chroma store and hybrid index once
+and serves them to the workers over a local retrieval service
+(utils/retrieval_service.py). Each worker process runs its own agent and
+LLM client, so questions are answered on several cores. Requests beyond
+`workers + queue_size` outstanding are rejected with 503 and Retry-After
+instead of piling up.
+"""
+import argparse
+import collections
+import json
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", str(min(4, os.cpu_count() or 1))))
+SERVE_QUEUE_SIZE = int(os.getenv("SERVE_QUEUE_SIZE", "32"))
+SERVE_REQUEST_TIMEOUT_S = float(os.getenv("SERVE_REQUEST_TIMEOUT_S", "120"))
+
+
+class Overloaded(Exception):
+    """Raised when the queue is full; the caller should retry later."""
+
+
+def _worker_main(worker_id: int, jobs, results, env: Dict[str, str], stub_llm_latency: Optional[float]) -> None:
+    # Runs in a spawned process: configure the environment before importing the agent
+    os.environ.update(env)
+    from agent import ask, build_medagent, drug_tool, get_medagent
+    from utils import tracing
+
+    agent = llm = None
+    try:
+        if stub_llm_latency is not None:
+            from benchmarks.stubs import StubChatModel, make_web_search_tool
+            from tools.clinical_trial_tool import clinical_trials_tool
+            llm = StubChatModel(latency_s=stub_llm_latency)
+            agent = build_medagent(model=llm, agent_tools=[drug_tool, clinical_trials_tool, make_web_search_tool(0.05)])
+        else:
+            agent = get_medagent()
+    except Exception as e:
+        # Keep serving: every request will report the error until it is fixed
+        print(f"⚠️ Worker {worker_id}: agent not available: {e}", file=sys.stderr)
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, question = job
+        try:
+            with tracing.trace(question) as trace:
+                response = ask(question, config={"callbacks": trace.callbacks()}, agent=agent, llm=llm)
+            payload = {key: response[key] for key in ("answer", "cached", "tools", "tokens",
+                                                         "context_tokens_saved", "route")}
+            results.put(("done", worker_id, job_id, {"response": payload, "trace": trace.to_dict()}))
+        except Exception as e:
+            results.put(("error", worker_id, job_id, {"error": f"{type(e).__name__}: {e}"}))
+
+
+class WorkerPool:
+    """
+    Agent worker processes fed from one job queue
+
+    Admission is bounded: at most `workers + queue_size` questions are
+    accepted at once (running or waiting), the rest raise Overloaded. The
+    parent hands each question to an idle worker's own queue and records
+    the assignment, so a monitor that restarts a dead worker can fail the
+    question it held. A collector thread routes results back to callers.
+    """
+
+    def __init__(self, workers: int, queue_size: int, env: Dict[str, str],
+                 stub_llm_latency: Optional[float] = None):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.env = env
+        self.stub_llm_latency = stub_llm_latency
+        self._ctx = mp.get_context("spawn")
+        self._queues: Dict[int, mp.Queue] = {}  # worker_id -> its job queue
+        self._results = self._ctx.Queue()
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, list] = {}  # job_id -> [event, outcome]
+        self._running: Dict[int, str] = {}  # worker_id -> job_id
+        self._backlog = collections.deque()  # (job_id, question) waiting for an idle worker
+        self._idle = collections.deque()  # worker ids
+        self._processes: Dict[int, mp.Process] = {}
+        self._stopping = False
+        self.counters = {"accepted": 0, "rejected": 0, "completed": 0, "failed": 0,
+                         "timed_out": 0, "worker_restarts": 0}
+
+    def _spawn(self, worker_id: int) -> None:
+        # A fresh queue each time: one a worker died reading from may be unusable
+        jobs = self._ctx.Queue()
+        process = self._ctx.Process(target=_worker_main, name=f"medagent-worker-{worker_id}", daemon=True,
+                                    args=(worker_id, jobs, self._results, self.env, self.stub_llm_latency))
+        process.start()
+        with self._lock:
+            self._queues[worker_id] = jobs
+            self._processes[worker_id] = process
+            self._idle.append(worker_id)
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        # Caller holds self._lock
+        while self._backlog and self._idle:
+            worker_id = self._idle.popleft()
+            job_id, question = self._backlog.popleft()
+            self._running[worker_id] = job_id
+            self._queues[worker_id].put((job_id, question))
+
+    def start(self) -> None:
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+        threading.Thread(target=self._collect, name="medagent-collector", daemon=True).start()
+        threading.Thread(target=self._monitor, name="medagent-monitor", daemon=True).start()
+
+    def _finish(self, job_id: str, outcome: Dict) -> None:
+        with self._lock:
+            entry = self._pending.pop(job_id, None)
+        if entry is None:
+            return
+        self._slots.release()
+        entry[1] = outcome
+        entry[0].set()
+
+    def _collect(self) -> None:
+        from utils import tracing
+        while True:
+            kind, worker_id, job_id, data = self._results.get()
+            with self._lock:
+                if self._running.get(worker_id) == job_id:
+                    del self._running[worker_id]
+                    self._idle.append(worker_id)
+                    self._dispatch()
+            if kind == "done":
+                # Worker traces feed this process's /metrics
+                tracing.metrics.observe_trace(tracing.Trace.from_dict(data["trace"]))
+                data["response"]["worker"] = worker_id
+            self._finish(job_id, data)
+
+    def _monitor(self) -> None:
+        while not self._stopping:
+            time.sleep(1.0)
+            for worker_id, process in list(self._processes.items()):
+                if process.is_alive() or self._stopping:
+                    continue
+                with self._lock:
+                    job_id = self._running.pop(worker_id, None)
+                    if worker_id in self._idle:
+                        self._idle.remove(worker_id)
+                    self.counters["worker_restarts"] += 1
+                if job_id is not None:
+                    self._finish(job_id, {"error": f"worker {worker_id} exited (code {process.exitcode})"})
+                self._spawn(worker_id)
+
+    def submit(self, question: str, timeout: float = SERVE_REQUEST_TIMEOUT_S) -> Dict:
+        """
+        Answer a question on a worker, waiting at most timeout seconds
+
+        Raises:
+            Overloaded: when the queue is full
+            TimeoutError: when no answer arrived in time (the question still completes)
+            RuntimeError: when the agent failed on the worker
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise Overloaded("queue full")
+        job_id = uuid.uuid4().hex
+        entry = [threading.Event(), None]
+        with self._lock:
+            self._pending[job_id] = entry
+            self.counters["accepted"] += 1
+            self._backlog.append((job_id, question))
+            self._dispatch()
+
+        if not entry[0].wait(timeout):
+            with self._lock:
+                self.counters["timed_out"] += 1
+            raise TimeoutError(f"no answer within {timeout:g}s")
+        outcome = entry[1]
+        with self._lock:
+            self.counters["failed" if "error" in outcome else "completed"] += 1
+        if "error" in outcome:
+            raise RuntimeError(outcome["error"])
+        return outcome["response"]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "workers": self.workers,
+                "workers_alive": sum(p.is_alive() for p in self._processes.values()),
+                "busy": len(self._running),
+                "queued": len(self._backlog),
+                "capacity": self.workers + self.queue_size,
+            }
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for key, value in self.stats().items():
+            kind = "counter" if key in self.counters else "gauge"
+            suffix = "_total" if kind == "counter" else ""
+            lines.append(f"# TYPE medagent_serve_{key}{suffix} {kind}")
+            lines.append(f"medagent_serve_{key}{suffix} {value}")
+        return "\n".join(lines) + "\n"
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping = True
+        for jobs in self._queues.values():
+            jobs.put(None)
+        for process in self._processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+
+def make_server(pool: WorkerPool, retrieval_url: str, port: int, host: str,
+                request_timeout: float = SERVE_REQUEST_TIMEOUT_S) -> ThreadingHTTPServer:
+    import requests
+    from utils import tracing
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body, content_type: str = "application/json", headers: Dict = None) -> None:
+            payload = (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/health":
+                stats = pool.stats()
+                try:
+                    retrieval = requests.get(f"{retrieval_url}/health", timeout=2).json()
+                except requests.RequestException as e:
+                    retrieval = {"status": "down", "error": str(e)}
+                healthy = stats["workers_alive"] == stats["workers"] and retrieval.get("status") == "ok"
+                self._send(200 if healthy else 503,
+                           {"status": "ok" if healthy else "degraded", **stats, "retrieval": retrieval})
+            elif self.path == "/metrics":
+                self._send(200, tracing.metrics.render_prometheus() + pool.render_prometheus(),
+                           content_type="text/plain; version=0.0.4")
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/ask":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                question = str(body["question"]).strip()
+            except (KeyError, ValueError) as e:
+                self._send(400, {"error": f"expected JSON body {{\"question\": ...}}: {e}"})
+                return
+            if not question:
+                self._send(400, {"error": "question is empty"})
+                return
+
+            start = time.perf_counter()
+            try:
+                response = pool.submit(question, timeout=request_timeout)
+            except Overloaded:
+                self._send(503, {"error": "server busy, retry later"}, headers={"Retry-After": "1"})
+                return
+            except TimeoutError as e:
+                self._send(504, {"error": str(e)})
+                return
+            except RuntimeError as e:
+                self._send(500, {"error": str(e)})
+                return
+            self._send(200, {**response, "latency_s": round(time.perf_counter() - start, 4)})
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Serve MedAgent over HTTP/JSON with worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=SERVE_QUEUE_SIZE,
+                        help="questions allowed to wait for a worker before 503")
+    parser.add_argument("--request-timeout", type=float, default=SERVE_REQUEST_TIMEOUT_S)
+    parser.add_argument("--retrieval-port", type=int, default=0, help="port of the shared retrieval service")
+    parser.add_argument("--stub-llm", type=float, metavar="LATENCY",
+                        help="load testing: answer with the benchmark stub LLM (seconds per turn)")
+    args = parser.parse_args(argv)
+
+    from utils.resources import get_hybrid_index, startup_report, warm_up
+    from utils.retrieval_service import start_retrieval_service
+
+    # Embedder, Chroma and index live here only; workers reach them over HTTP
+    warm_up(background=False, include_llm=False)
+    get_hybrid_index()
+    retrieval = start_retrieval_service(args.retrieval_port)
+    retrieval_url = f"http://127.0.0.1:{retrieval.server_address[1]}"
+    print(f"🔎 Retrieval service on {retrieval_url} ({startup_report()['phases_s']})")
+
+    pool = WorkerPool(args.workers, args.queue_size, env={"RETRIEVAL_SERVICE_URL": retrieval_url},
+                      stub_llm_latency=args.stub_llm)
+    pool.start()
+    server = make_server(pool, retrieval_url, args.port, args.host, args.request_timeout)
+    print(f"🚀 MedAgent API on http://{args.host}:{server.server_address[1]} "
+          f"({args.workers} workers, queue {args.queue_size})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.stop()
+        retrieval.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,8 @@
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from utils.resources import get_vectordb
 
-embedding = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-vectordb = Chroma(persist_directory="chroma_db", embedding_function=embedding)
+vectordb = get_vectordb()
 
 retriever = vectordb.as_retriever()
 docs = retriever.invoke("What are the side effects of metformin?")
 for i, doc in enumerate(docs):
-    print(f"\nDocument {i + 1}:\n{doc.page_content[:500]}")
\ No newline at end of file
+    print(f"\nDocument {i + 1}:\n{doc.page_content[:500]}")
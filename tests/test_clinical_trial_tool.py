@@ -0,0 +1,31 @@
+import pytest
+
+from tools.clinical_trial_tool import format_trials
+from utils.resilience import DependencyUnavailable
+
+STUDY = {"protocolSection": {"identificationModule": {"nctId": "NCT05100001", "briefTitle": "Metformin in Prediabetes"},
+                             "statusModule": {"overallStatus": "RECRUITING"}}}
+
+
+@pytest.mark.parametrize("results", [
+    {"error": "circuit open", "status_code": None, "unavailable": True},
+    {"error": "connection reset", "status_code": None},
+    {"error": "Service Unavailable", "status_code": 503},
+    {"error": "Too Many Requests", "status_code": 429},
+])
+def test_outages_make_the_tool_unavailable(results):
+    with pytest.raises(DependencyUnavailable):
+        format_trials(results, "metformin")
+
+
+def test_rejected_request_is_a_plain_observation():
+    observation = format_trials({"error": "invalid filter.advanced", "status_code": 400}, "metformin")
+    assert observation == "ClinicalTrials.gov search failed for 'metformin': invalid filter.advanced"
+
+
+def test_stale_results_are_marked():
+    observation = format_trials({"studies": [STUDY], "stale_age_s": 600}, "metformin")
+    assert observation.splitlines() == [
+        "(ClinicalTrials.gov is not responding; cached results from 10 minutes ago)",
+        "• Metformin in Prediabetes (NCT: NCT05100001) — Status: RECRUITING",
+    ]
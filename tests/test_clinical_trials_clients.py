@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from benchmarks.stubs import StubClinicalTrialsServer
+from tools.clinical_trials_api import ClinicalTrialsAPI, IncompleteResults, ResponseCache
+
+IDS = ["NCT10000000", "NCT10000001"]
+
+
+def nct_ids(result):
+    return [s["protocolSection"]["identificationModule"]["nctId"] for s in result["studies"]]
+
+
+def test_sync_and_async_fetch_ids_alike_and_share_the_cache():
+    with StubClinicalTrialsServer(latency_s=0.0) as server:
+        api = ClinicalTrialsAPI(base_url=server.base_url, cache=ResponseCache())
+        assert nct_ids(api.get_studies_by_ids(IDS)) == IDS
+        sent = server.requests
+
+        async def fetch():
+            async with api.async_client() as client:
+                return await client.get_studies_by_ids(IDS)
+
+        assert nct_ids(asyncio.run(fetch())) == IDS
+        assert server.requests == sent
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_strict_pagination_raises_on_a_failed_page(prefetch):
+    with StubClinicalTrialsServer(latency_s=0.0) as server:
+        api = ClinicalTrialsAPI(base_url=server.base_url, cache=ResponseCache())
+        params = {"page_size": 10}
+        assert len(api.paginate_all_results(params, prefetch=prefetch)) == 32
+
+        respond = server.respond
+        # Every page after the first answers 404 (not retried)
+        server.respond = lambda url: respond(url) if "pageToken" not in url.query else (404, {"error": "gone"})
+        params = {"page_size": 10, "query_term": "trial"}
+        assert len(api.paginate_all_results(params, prefetch=prefetch)) == 10
+        with pytest.raises(IncompleteResults) as failed:
+            api.paginate_all_results({**params, "page_size": 9}, prefetch=prefetch, strict=True)
+        assert len(failed.value.studies) == 9
@@ -0,0 +1,24 @@
+import os
+import shutil
+
+from utils import index_maintenance
+
+STORE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chroma_db")
+
+
+def test_rebuild_tune_and_report_leave_no_store_open(tmp_path):
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    persist_dir = str(tmp_path / "chroma_db")
+    shutil.copytree(STORE, persist_dir)
+    before = index_maintenance.report(persist_dir, sample=20)
+
+    rebuilt = index_maintenance.rebuild(persist_dir, str(tmp_path / "chroma_db.new"), ef_search=64)
+    assert rebuilt["documents"] == before["documents"] - before["duplicate_records"]
+    assert index_maintenance.set_ef_search(rebuilt["out_dir"], 80)["ef_search"] == 80
+
+    after = index_maintenance.report(rebuilt["out_dir"], sample=20)
+    assert after["hnsw"]["ef_search"] == 80 and after["duplicate_records"] == 0
+    assert after["recall"]["recall_at_k"] == 1.0
+    # Every Chroma client lived in a child process
+    assert not SharedSystemClient._identifier_to_system
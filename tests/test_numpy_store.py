@@ -0,0 +1,45 @@
+import numpy as np
+
+from tools.numpy_store import NumpyCollection
+
+
+def test_empty_upsert_is_a_no_op(tmp_path):
+    collection = NumpyCollection(str(tmp_path / "store"))
+    collection.upsert([], [], [])
+    assert collection.count() == 0
+    assert not (tmp_path / "store").exists()
+
+    collection.upsert(["a"], np.ones((1, 3)), ["alpha"])
+    collection.upsert([], [], [])
+    assert collection.get()["ids"] == ["a"]
+
+
+def test_float16_store_searches_a_cached_float32_copy(tmp_path):
+    vectors = np.random.default_rng(0).normal(size=(50, 8)).astype(np.float32)
+    ids = [f"doc-{i}" for i in range(50)]
+    exact = NumpyCollection(str(tmp_path / "float32"), "float32")
+    exact.upsert(ids, vectors, ids)
+    half = NumpyCollection(str(tmp_path / "float16"), "float16")
+    half.upsert(ids, vectors, ids)
+
+    rows = half.rows()
+    assert rows.matrix.dtype == np.float16 and rows.vectors.dtype == np.float32
+    queries = vectors[:5] + 0.01
+    assert [[i for i, _ in hits] for hits in half.search(queries, 3)] == \
+        [[i for i, _ in hits] for hits in exact.search(queries, 3)]
+    # No reload and no new copy between queries
+    assert half.rows() is rows
+
+
+def test_rows_snapshot_survives_a_rewrite(tmp_path):
+    path = str(tmp_path / "store")
+    writer = NumpyCollection(path)
+    writer.upsert(["a", "b"], np.eye(2), ["alpha", "beta"])
+    reader = NumpyCollection(path)
+    before = reader.rows()
+
+    writer.delete(["a"])
+    # Rows taken before the rewrite stay aligned; the next read picks up the new ones
+    assert before.ids[reader.search(np.array([1.0, 0.0]), 1, before)[0][0][0]] == "a"
+    assert reader.rows().ids == ["b"] and before.ids == ["a", "b"]
+    assert reader.get(include=["embeddings"])["embeddings"].tolist() == [[0.0, 1.0]]
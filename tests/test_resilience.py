@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.resilience import (CircuitBreaker, Dependency, DependencyUnavailable, RequestSlots, hedged_call,
+                              query_budget)
+
+
+def open_breaker(reset_after_s: float = 0.05) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failures=1, reset_after_s=reset_after_s)
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(reset_after_s)
+    return breaker
+
+
+def test_half_open_allows_one_probe_then_closes():
+    breaker = open_breaker()
+    assert breaker.allow() and breaker.state == "half-open"
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_unreported_probe_is_given_up_after_reset_period():
+    breaker = open_breaker()
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.05)
+    assert breaker.allow()
+
+
+def test_budget_refusal_does_not_take_the_probe():
+    dependency = Dependency("test", timeout_s=1, breaker=open_breaker())
+    with query_budget(0):
+        with pytest.raises(DependencyUnavailable, match="time budget"):
+            dependency.call(lambda: "ok")
+    assert dependency.call(lambda: "ok") == "ok"
+    assert dependency.breaker.state == "closed"
+
+
+def test_cancelled_probe_is_released():
+    dependency = Dependency("test", timeout_s=5, breaker=open_breaker(reset_after_s=0.2))
+
+    async def stall():
+        await asyncio.sleep(5)
+
+    async def main():
+        probe = asyncio.ensure_future(dependency.acall(stall))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(main())
+    # The cancelled probe counts as a failure and reopens the circuit ...
+    assert dependency.breaker.state == "open"
+    time.sleep(0.2)
+
+    async def ok():
+        return "ok"
+
+    # ... so after the reset period a new probe goes out and closes it
+    assert asyncio.run(dependency.acall(ok)) == "ok"
+    assert dependency.breaker.state == "closed"
+
+
+def test_deadline_starts_when_the_request_runs():
+    slots = RequestSlots("test", size=1)
+    busy = slots.submit(lambda: time.sleep(0.3))
+
+    def fetch():
+        time.sleep(0.2)
+        return "ok"
+
+    # 0.3s waiting for the slot + 0.2s running is over 0.4s, but the run is not
+    assert hedged_call(fetch, slots, timeout_s=0.4) == ("ok", False)
+    busy.result()
+
+
+def test_requests_in_flight_are_bounded_per_dependency():
+    dependency = Dependency("test", timeout_s=2, max_in_flight=2)
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def fetch():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.1)
+        with lock:
+            running[0] -= 1
+        return "ok"
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(lambda _: dependency.call(fetch), range(6)))
+    assert results == ["ok"] * 6 and peak[0] == 2
+
+
+def test_no_free_slot_falls_back():
+    dependency = Dependency("test", timeout_s=0.1, max_in_flight=1)
+    release = threading.Event()
+    dependency.slots.submit(lambda: release.wait(5))
+    assert dependency.call(lambda: "fresh", fallback=lambda: "stale") == "stale"
+    release.set()
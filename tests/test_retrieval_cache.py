@@ -0,0 +1,57 @@
+import hashlib
+
+from langchain_core.embeddings import Embeddings
+
+from tools.numpy_store import NumpyVectorStore
+from tools.retrieval_cache import RetrievalCache
+
+
+class CountingEmbeddings(Embeddings):
+    """Bag-of-letters vectors; counts query embeddings."""
+
+    def __init__(self):
+        self.queries = 0
+
+    def _vector(self, text):
+        return [text.lower().count(c) + 0.1 for c in "aeiourstnm"]
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.queries += 1
+        return self._vector(text)
+
+
+def _chunk(text):
+    return {"source": "s", "content_hash": hashlib.sha1(text.encode("utf-8")).hexdigest()}
+
+
+def make_store(tmp_path):
+    store = NumpyVectorStore(str(tmp_path / "store"), CountingEmbeddings())
+    texts = ["metformin side effects", "warfarin dosage"]
+    store.add_texts(texts, [_chunk(t) for t in texts], ids=["a", "b"])
+    return store
+
+
+def test_exact_hit_skips_embedding(tmp_path):
+    store = make_store(tmp_path)
+    cache = RetrievalCache(lambda: store, similarity_threshold=0.99)
+    cache.search("What are the side effects of metformin?")
+    embedded = store.embeddings.queries
+    cache.search("metformin side effects")
+    assert store.embeddings.queries == embedded
+    assert cache.stats()["result_hits"] == 1
+
+
+def test_same_count_update_invalidates(tmp_path):
+    store = make_store(tmp_path)
+    cache = RetrievalCache(lambda: store, check_interval=0)
+    cache.search("warfarin dosage", threshold=-1e9)
+    before = cache.fingerprint()
+    text = "warfarin dosage and monitoring"
+    store._collection.upsert(["b"], store.embeddings.embed_documents([text]), [text], [_chunk(text)])
+    assert store._collection.count() == 2
+    assert cache.fingerprint() != before
+    assert cache.stats()["invalidations"] == 1
+    assert cache.search("warfarin dosage", threshold=-1e9)[0].page_content == text
@@ -0,0 +1,28 @@
+import pytest
+
+from tools import drug_retrieval
+from utils.retrieval_service import RetrievalServiceError, remote_call, start_retrieval_service
+
+
+@pytest.fixture
+def service(monkeypatch):
+    def broken_match(query):
+        raise RuntimeError("hybrid index is missing")
+
+    monkeypatch.setattr(drug_retrieval, "match_drugs", broken_match)
+    monkeypatch.setattr(drug_retrieval, "drug_section", lambda drug, section: f"{drug}: {section}")
+    server = start_retrieval_service()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_unexpected_error_is_a_500_with_its_message(service):
+    with pytest.raises(RetrievalServiceError, match="/match failed with 500: RuntimeError: hybrid index is missing"):
+        remote_call(service, "/match", {"query": "metformin"})
+
+
+def test_bad_request_and_success(service):
+    with pytest.raises(RetrievalServiceError, match="failed with 400"):
+        remote_call(service, "/section", {"drug": "Metformin"})
+    assert remote_call(service, "/section", {"drug": "Metformin", "section": "Uses"}) == {"text": "Metformin: Uses"}
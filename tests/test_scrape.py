@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from utils.scrape import Checkpoint, FixtureFetcher, scrape_incremental
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "benchmarks", "fixtures", "medlineplus")
+URLS = ["https://medlineplus.gov/druginfo/meds/a696005.html",  # Metformin
+        "https://medlineplus.gov/druginfo/meds/a682277.html"]  # Warfarin
+
+
+def setup_run(tmp_path):
+    pages = tmp_path / "pages"
+    shutil.copytree(FIXTURES, pages)
+    return FixtureFetcher(str(pages)), str(tmp_path / "drugs.csv"), str(tmp_path / "checkpoint.json")
+
+
+def test_resume_skips_pages_already_checkpointed(tmp_path):
+    fetcher, output, checkpoint_path = setup_run(tmp_path)
+    # A run that crashed after the first page left its validators in the checkpoint
+    status, _, validators = fetcher.fetch(URLS[0], {})
+    assert status == 200
+    Checkpoint(checkpoint_path).update(URLS[0], validators)
+
+    counts = scrape_incremental(URLS, output, checkpoint_path, workers=2, fetcher=fetcher)
+    assert (counts["fetched"], counts["unchanged"], counts["failed"]) == (1, 1, 0)
+    assert pd.read_csv(output, sep=";")["drug_name"].tolist() == ["Warfarin"]
+    assert set(Checkpoint(checkpoint_path).entries) == set(URLS)
+
+
+def test_rerun_only_refetches_changed_pages(tmp_path):
+    fetcher, output, checkpoint_path = setup_run(tmp_path)
+    first = scrape_incremental(URLS, output, checkpoint_path, workers=2, fetcher=fetcher)
+    assert first["fetched"] == 2 and first["rows"] == 2
+
+    again = scrape_incremental(URLS, output, checkpoint_path, workers=2, fetcher=fetcher)
+    assert (again["fetched"], again["unchanged"]) == (0, 2)
+
+    page = os.path.join(fetcher.fixtures_dir, "a682277.html")
+    os.utime(page, (os.path.getatime(page), os.path.getmtime(page) + 60))
+    changed = scrape_incremental(URLS, output, checkpoint_path, workers=2, fetcher=fetcher)
+    assert (changed["fetched"], changed["unchanged"]) == (1, 1)
+    df = pd.read_csv(output, sep=";")
+    assert sorted(df["drug_name"]) == ["Metformin", "Warfarin"]
+    assert df.loc[df["drug_name"] == "Metformin", "uses"].str.contains("type 2 diabetes").all()
+
+
+def test_checkpoint_appends_and_skips_bad_lines(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = Checkpoint(path)
+    checkpoint.update(URLS[0], {"etag": "a"})
+    checkpoint.update(URLS[0], {"etag": "b"})
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('["not", "an", "entry"]\n42\n"text"\n')
+        f.write('{"url": "https://medlineplus.gov/torn')
+    assert Checkpoint(path).get(URLS[0])["etag"] == "b"
+
+    checkpoint.compact()
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["url"] for line in f] == [URLS[0]]
+
+
+def test_checkpoint_reads_single_object_format(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    path.write_text(json.dumps({URLS[0]: {"etag": "x", "last_modified": None}}))
+    assert Checkpoint(str(path)).get(URLS[0])["etag"] == "x"
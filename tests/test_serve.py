@@ -0,0 +1,42 @@
+import threading
+import time
+
+import pytest
+
+from serve import WorkerPool
+
+# Caching and routing off: the question goes straight to the stub LLM, which stalls
+ENV = {"ANSWER_CACHE": "off", "QUERY_ROUTER": "off"}
+
+
+def test_worker_killed_mid_job_fails_the_job_and_frees_its_slot():
+    pool = WorkerPool(workers=1, queue_size=0, env=ENV, stub_llm_latency=60)
+    pool.start()
+    try:
+        outcome = {}
+
+        def submit():
+            try:
+                pool.submit("What are the side effects of metformin?", timeout=15)
+            except Exception as e:
+                outcome["error"] = e
+
+        caller = threading.Thread(target=submit)
+        caller.start()
+        deadline = time.monotonic() + 10
+        while pool.stats()["accepted"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Killed while still starting up, before it has read the job (or said so)
+        pool._processes[0].kill()
+        caller.join(20)
+
+        assert isinstance(outcome.get("error"), RuntimeError)
+        assert "worker 0 exited" in str(outcome["error"])
+        stats = pool.stats()
+        assert stats["accepted"] - stats["completed"] - stats["failed"] == 0
+        assert (stats["worker_restarts"], stats["busy"], stats["queued"]) == (1, 0, 0)
+        # The only slot is free again: the next question is admitted (and times out) instead of Overloaded
+        with pytest.raises(TimeoutError):
+            pool.submit("What are the side effects of warfarin?", timeout=0.1)
+    finally:
+        pool.stop(timeout=1)
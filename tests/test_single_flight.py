@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_threads_share_one_call():
+    group, calls = SingleFlight("test"), []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(group.do("metformin", fetch))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["result"] * 4 and len(calls) == 1
+    assert group.stats()["in_flight"] == 0
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    group, calls = SingleFlight("test"), []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "result"
+
+    async def main():
+        leader = asyncio.ensure_future(group.ado("metformin", fetch))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(group.ado("metformin", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(main()) == "result"
+    assert len(calls) == 1
+    assert group.stats() == {"calls": 2, "executed": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_errors_reach_every_caller():
+    group = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        raise ValueError("bad gateway")
+
+    async def main():
+        return await asyncio.gather(group.ado("k", fetch), group.ado("k", fetch), return_exceptions=True)
+
+    assert [type(r) for r in asyncio.run(main())] == [ValueError, ValueError]
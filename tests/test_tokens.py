@@ -0,0 +1,16 @@
+import pytest
+
+from utils.tokens import estimate_tokens, split_by_tokens
+
+
+@pytest.mark.parametrize("max_tokens", [2, 3, 10, 64, 199, 200, 256])
+def test_hard_wrapped_pieces_stay_within_budget(max_tokens):
+    text = " ".join(f"word{i}" for i in range(max_tokens * 3))
+    pieces = split_by_tokens(text, max_tokens)
+    assert all(estimate_tokens(piece) <= max_tokens for piece in pieces)
+    assert " ".join(pieces).split() == text.split()
+
+
+def test_sentences_are_packed_greedily():
+    text = "One two three. Four five six. Seven eight nine."
+    assert split_by_tokens(text, 9) == ["One two three. Four five six.", "Seven eight nine."]
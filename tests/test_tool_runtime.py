@@ -0,0 +1,56 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from utils.resilience import DependencyUnavailable
+from utils.tool_runtime import ParallelToolMiddleware
+
+
+def make_request(turn: str, call_id: str = "call-1", name: str = "DrugRetrieval"):
+    return SimpleNamespace(tool_call={"id": call_id, "name": name},
+                           state={"messages": [AIMessage(content="", id=turn)]})
+
+
+def ok(request):
+    return ToolMessage(content="ok", tool_call_id=request.tool_call["id"])
+
+
+def test_concurrent_questions_do_not_queue_into_timeouts():
+    # One 0.5s call per question, eight questions at once, 0.8s timeout
+    middleware = ParallelToolMiddleware(max_concurrency=1, timeout_s=0.8)
+
+    def slow(request):
+        time.sleep(0.5)
+        return ok(request)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: middleware.wrap_tool_call(make_request(f"turn-{i}"), slow), range(8)))
+    assert [r.content for r in results] == ["ok"] * 8
+
+
+def test_overrunning_call_times_out_without_blocking_the_next():
+    middleware = ParallelToolMiddleware(max_concurrency=1, timeout_s=0.2)
+    release = threading.Event()
+
+    def stuck(request):
+        release.wait(5)
+        return ok(request)
+
+    start = time.monotonic()
+    assert middleware.wrap_tool_call(make_request("turn-a"), stuck).status == "error"
+    assert middleware.wrap_tool_call(make_request("turn-b"), ok).content == "ok"
+    assert time.monotonic() - start < 1
+    release.set()
+
+
+def test_dependency_unavailable_becomes_observation():
+    middleware = ParallelToolMiddleware()
+
+    def down(request):
+        raise DependencyUnavailable("ClinicalTrials.gov", "circuit open")
+
+    message = middleware.wrap_tool_call(make_request("turn-c", name="ClinicalTrialsSearch"), down)
+    assert message.status == "error" and "unavailable right now (circuit open)" in message.content
@@ -0,0 +1,135 @@
+import copy
+import json
+import os
+import re
+
+from tools.clinical_trials_api import IncompleteResults
+from tools.trials_mirror import TrialsMirror
+
+DUMP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    "benchmarks", "fixtures", "clinical_trials_dump.json")
+
+
+def load_studies():
+    with open(DUMP, encoding="utf-8") as f:
+        return json.load(f)["studies"]
+
+
+def last_update(study):
+    return study["protocolSection"]["statusModule"]["lastUpdatePostDateStruct"]["date"]
+
+
+def nct_ids(result):
+    return [s["protocolSection"]["identificationModule"]["nctId"] for s in result["studies"]]
+
+
+class RecordedAPI:
+    """Serves the dump to sync(), honouring the LastUpdatePostDate range filter and sort.
+
+    With `fail_after` set, the page after that many records fails.
+    """
+
+    def __init__(self, studies, fail_after=None):
+        self.studies = studies
+        self.fail_after = fail_after
+        self.calls = []
+
+    def paginate_all_results(self, search_params, max_results=None, strict=False):
+        self.calls.append(search_params)
+        match = re.search(r"RANGE\[([0-9-]+),MAX\]", search_params.get("advanced_filter", ""))
+        since = match.group(1) if match else ""
+        term = (search_params.get("query_term") or "").lower()
+        found = [s for s in self.studies if last_update(s) >= since and term in json.dumps(s).lower()]
+        if search_params.get("sort") == "LastUpdatePostDate:asc":
+            found.sort(key=last_update)
+        if self.fail_after is not None and len(found) > self.fail_after:
+            partial = found[:self.fail_after]
+            if strict:
+                raise IncompleteResults("503 Server Error", partial)
+            return partial
+        return found[:max_results]
+
+
+def test_load_dump_and_search(tmp_path):
+    mirror = TrialsMirror(str(tmp_path / "mirror.sqlite3"))
+    assert mirror.load_dump(DUMP) == 12
+    result = mirror.search("Are there any recruiting trials for metformin?")
+    assert result["source"] == "mirror"
+    # "recruiting" filters on status: NCT05100002 is active but not recruiting
+    assert nct_ids(result) == ["NCT05100001"]
+    assert sorted(nct_ids(mirror.search("ongoing metformin studies"))) == ["NCT05100001", "NCT05100002"]
+    assert nct_ids(mirror.search("metformin trials not recruiting")) == ["NCT05100002"]
+    assert nct_ids(mirror.search("warfarin", status="COMPLETED")) == ["NCT05100004"]
+    assert mirror.search("clinical trials")["studies"] == []
+
+
+def test_resync_uses_watermark_and_reindexes_updates(tmp_path):
+    studies = load_studies()
+    api = RecordedAPI(studies)
+    mirror = TrialsMirror(str(tmp_path / "mirror.sqlite3"))
+
+    first = mirror.sync(api, query_term="warfarin")
+    assert (first["since"], first["written"], first["watermark"]) == (None, 2, "2025-01-09")
+    assert "advanced_filter" not in api.calls[-1]
+
+    # NCT05100004 is retitled upstream after the first sync
+    original = next(s for s in studies if "NCT05100004" in json.dumps(s))
+    updated = copy.deepcopy(original)
+    updated["protocolSection"]["identificationModule"]["briefTitle"] = "Pharmacogenomic Warfarin Titration"
+    updated["protocolSection"]["statusModule"]["lastUpdatePostDateStruct"]["date"] = "2025-06-01"
+    api.studies = [s for s in studies if s is not original] + [updated]
+
+    second = mirror.sync(api, query_term="warfarin")
+    assert api.calls[-1]["advanced_filter"] == "AREA[LastUpdatePostDate]RANGE[2025-01-09,MAX]"
+    assert (second["since"], second["watermark"]) == ("2025-01-09", "2025-06-01")
+    # Only records on or after the watermark came back: the edited one and the boundary one
+    assert second["written"] == 2
+    assert mirror.count() == 2
+
+    # The update trigger replaced the FTS row: new title matches, old one does not
+    assert nct_ids(mirror.search("pharmacogenomic warfarin")) == ["NCT05100004"]
+    assert mirror.search("genotype guided warfarin")["studies"] == []
+
+    third = mirror.sync(api, query_term="warfarin")
+    assert third["since"] == "2025-06-01" and third["written"] == 1
+
+
+def test_full_sync_ignores_watermark(tmp_path):
+    api = RecordedAPI(load_studies())
+    mirror = TrialsMirror(str(tmp_path / "mirror.sqlite3"))
+    mirror.sync(api, query_term="liraglutide")
+    result = mirror.sync(api, query_term="liraglutide", full=True)
+    assert result["since"] is None and result["written"] == 2
+    assert "advanced_filter" not in api.calls[-1]
+
+
+def test_failed_page_keeps_previous_watermark(tmp_path):
+    studies = load_studies()
+    mirror = TrialsMirror(str(tmp_path / "mirror.sqlite3"))
+    broken = mirror.sync(RecordedAPI(studies, fail_after=1), query_term="warfarin")
+    # The first page is kept, but nothing marks the missing records as synced
+    assert (broken["complete"], broken["written"], broken["watermark"]) == (False, 1, None)
+    assert "503" in broken["error"]
+
+    api = RecordedAPI(studies)
+    mirror.sync(api, query_term="warfarin")
+    assert "advanced_filter" not in api.calls[-1]
+    assert mirror.count() == 2
+
+    failed_resync = mirror.sync(RecordedAPI(studies, fail_after=0), query_term="warfarin")
+    assert (failed_resync["since"], failed_resync["watermark"]) == ("2025-01-09", "2025-01-09")
+
+
+def test_capped_sync_advances_only_past_fetched_records(tmp_path):
+    studies = load_studies()
+    api = RecordedAPI(studies)
+    mirror = TrialsMirror(str(tmp_path / "mirror.sqlite3"))
+    capped = mirror.sync(api, query_term="warfarin", max_results=1)
+    assert api.calls[-1]["sort"] == "LastUpdatePostDate:asc"
+    oldest = min(last_update(s) for s in studies if "warfarin" in json.dumps(s).lower())
+    assert (capped["written"], capped["watermark"], capped["complete"]) == (1, oldest, True)
+
+    # The record the cap left out is still newer than the watermark, so the next run picks it up
+    rest = mirror.sync(api, query_term="warfarin")
+    assert rest["since"] == oldest and rest["watermark"] == "2025-01-09"
+    assert mirror.count() == 2
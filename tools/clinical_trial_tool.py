@@ -1,24 +1,101 @@
+import asyncio
+import os
+import weakref
 from langchain.tools import tool
-from tools.clinical_trials_api import ClinicalTrialsAPI
+from tools.clinical_trials_api import ClinicalTrialsAPI, ResponseCache, dependency_failure
+from tools.trials_mirror import TrialsMirror, open_default_mirror
+from utils.resilience import Dependency, DependencyUnavailable
+
+# Give up on ClinicalTrials.gov after CT_DEADLINE_S, re-send a request still
+# unanswered after CT_HEDGE_AFTER_S, and stop calling it for a while after
+# repeated failures; meanwhile expired cached results are served.
+trials_dependency = Dependency(
+    "ClinicalTrials.gov",
+    timeout_s=float(os.getenv("CT_DEADLINE_S", "8")),
+    hedge_after_s=float(os.getenv("CT_HEDGE_AFTER_S", "2")),
+)
+
+# Shared across tool calls so repeated questions are served from the cache.
+# Set CT_CACHE_PATH to persist responses between processes.
+api = ClinicalTrialsAPI(cache=ResponseCache(db_path=os.getenv("CT_CACHE_PATH")), dependency=trials_dependency)
+
+# Local mirror built with `python -m tools.trials_mirror` (CT_MIRROR_PATH);
+# questions it can answer never reach the live API.
+mirror = open_default_mirror()
+
+# One pooled async client per event loop (httpx clients are bound to their loop)
+_async_clients = weakref.WeakKeyDictionary()
+
+
+async def _close_with_loop(client):
+    # Parked after its first step; loop.shutdown_asyncgens() (asyncio.run does
+    # it before closing the loop) finalizes it, closing the pool on its own loop
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def get_async_api():
+    """Return the pooled async client for the running event loop (closed when the loop shuts down)."""
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        client = api.async_client()
+        closer = _close_with_loop(client)
+        await closer.__anext__()
+        entry = _async_clients[loop] = (client, closer)
+    return entry[0]
+
+
+def search_mirror(query: str) -> dict:
+    if mirror is None:
+        return {"studies": []}
+    return mirror.search(query, limit=5)
+
+
+def format_trials(results: dict, query: str) -> str:
+    if "error" in results:
+        # Not "no trials": the agent must know the search itself failed. Only an
+        # outage makes the tool unavailable; a rejected request (4xx) does not
+        if results.get("unavailable") or dependency_failure(results):
+            raise DependencyUnavailable("ClinicalTrialsSearch", results["error"])
+        return f"ClinicalTrials.gov search failed for '{query}': {results['error']}"
+    studies = results.get("studies", [])
+    if not studies:
+        return f"No trials found for '{query}'"
+
+    formatted = []
+    if "stale_age_s" in results:
+        formatted.append(f"(ClinicalTrials.gov is not responding; cached results from "
+                         f"{results['stale_age_s'] // 60} minutes ago)")
+    for s in studies[:5]:
+        try:
+            title = s["protocolSection"]["identificationModule"].get("briefTitle", "No Title")
+            nct = s["protocolSection"]["identificationModule"]["nctId"]
+            status = s["protocolSection"]["statusModule"].get("overallStatus", "Unknown")
+            formatted.append(f"• {title} (NCT: {nct}) — Status: {status}")
+        except Exception:
+            continue
+    return "\n".join(formatted)
+
 
 @tool("ClinicalTrialsSearch")
 def clinical_trials_tool(query: str) -> str:
     "Useful for finding clinical trials related to a drug or condition."
-    api = ClinicalTrialsAPI()
-
-    def trial_search(query: str) -> str:
-        results = api.search_studies(query_term=query, page_size=5)
-        studies = results.get("studies", [])
-        if not studies:
-            return f"No trials found for '{query}'"
-        
-        formatted = []
-        for s in studies[:5]:
-            try:
-                title = s["protocolSection"]["identificationModule"].get("briefTitle", "No Title")
-                nct = s["protocolSection"]["identificationModule"]["nctId"]
-                status = s["protocolSection"]["statusModule"].get("overallStatus", "Unknown")
-                formatted.append(f"• {title} (NCT: {nct}) — Status: {status}")
-            except Exception:
-                continue
-        return "\n".join(formatted)
\ No newline at end of file
+    results = search_mirror(query)
+    if not results["studies"]:
+        results = api.search_studies(query_term=query, status=TrialsMirror.query_status(query), page_size=5)
+    return format_trials(results, query)
+
+
+async def aclinical_trials_search(query: str) -> str:
+    results = search_mirror(query)
+    if not results["studies"]:
+        client = await get_async_api()
+        results = await client.search_studies(query_term=query, status=TrialsMirror.query_status(query), page_size=5)
+    return format_trials(results, query)
+
+
+# Used when the agent invokes the tool with ainvoke()
+clinical_trials_tool.coroutine = aclinical_trials_search
@@ -1,9 +1,209 @@
 import requests
 import json
-from typing import Optional, Dict, List, Union
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, List, Union, Tuple, Any
 from urllib.parse import urlencode
 import time
 
+from utils.resilience import Dependency, DependencyUnavailable
+from utils.single_flight import SingleFlight
+
+# Default freshness per endpoint, in seconds. Study records change slowly,
+# search pages and statistics move a little faster, metadata almost never.
+DEFAULT_TTLS = {
+    'search_studies': 15 * 60,
+    'get_study_details': 6 * 60 * 60,
+    'get_studies_by_ids': 6 * 60 * 60,
+    'get_statistics': 60 * 60,
+    'get_study_fields': 24 * 60 * 60,
+}
+
+
+class IncompleteResults(Exception):
+    """A strict paginated fetch stopped at a failed page; `studies` holds the pages before it."""
+
+    def __init__(self, error: str, studies: List[Dict]):
+        super().__init__(error)
+        self.studies = studies
+
+
+class ResponseCache:
+    """
+    In-memory LRU cache with per-endpoint TTLs and optional SQLite persistence
+
+    Keys are built from the endpoint name and its request parameters. Error
+    and stale responses are never stored, so a transient failure is retried
+    next time. Expired entries are kept (until evicted) so get_stale() can
+    serve them while the API is down.
+    """
+
+    def __init__(self,
+                 max_entries: int = 512,
+                 ttls: Optional[Dict[str, float]] = None,
+                 db_path: Optional[str] = None):
+        """
+        Initialize the response cache
+
+        Args:
+            max_entries: Maximum number of responses kept in memory
+            ttls: Per-endpoint TTL overrides in seconds (merged over DEFAULT_TTLS)
+            db_path: Optional SQLite file used to persist entries across processes
+        """
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses '
+                '(key TEXT PRIMARY KEY, expires_at REAL, body TEXT)'
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(endpoint: str, params: Dict) -> str:
+        """Build a stable cache key from an endpoint name and its parameters"""
+        return endpoint + ':' + json.dumps(params, sort_keys=True, default=str)
+
+    def get(self, endpoint: str, params: Dict) -> Optional[Any]:
+        """Return a fresh cached response, or None on a miss"""
+        key = self.make_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if self._db is not None:
+                row = self._db.execute(
+                    'SELECT expires_at, body FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+                if row and row[0] > now:
+                    value = json.loads(row[1])
+                    self._store(key, row[0], value)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def get_stale(self, endpoint: str, params: Dict) -> Optional[Tuple[Any, float]]:
+        """Return (response, age in seconds) for any stored entry, expired or not, or None"""
+        key = self.make_key(endpoint, params)
+        ttl = self.ttls.get(endpoint, DEFAULT_TTLS['search_studies'])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                entry = self._db.execute(
+                    'SELECT expires_at, body FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+                if entry:
+                    entry = (entry[0], json.loads(entry[1]))
+        if entry is None:
+            return None
+        return entry[1], max(0.0, time.time() - (entry[0] - ttl))
+
+    def set(self, endpoint: str, params: Dict, value: Any) -> None:
+        """Store a response using the TTL configured for its endpoint"""
+        if isinstance(value, dict) and ('error' in value or 'stale_age_s' in value):
+            return
+        key = self.make_key(endpoint, params)
+        expires_at = time.time() + self.ttls.get(endpoint, DEFAULT_TTLS['search_studies'])
+        with self._lock:
+            self._store(key, expires_at, value)
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO responses (key, expires_at, body) VALUES (?, ?, ?)',
+                    (key, expires_at, json.dumps(value))
+                )
+                self._db.commit()
+
+    def _store(self, key: str, expires_at: float, value: Any) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached entry, in memory and on disk"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM responses')
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        """
+        Report cache effectiveness
+
+        Returns:
+            Dictionary with hits, misses, hit_rate and current in-memory size
+        """
+        # Under the lock, so hits, misses and size come from the same moment
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+            }
+
+
+def dependency_failure(result: Any) -> Optional[str]:
+    """Why a response means the API itself is failing (network errors, 429, 5xx), else None"""
+    if isinstance(result, dict) and 'error' in result:
+        status = result.get('status_code')
+        if status is None or status == 429 or status >= 500:
+            return str(result['error'])
+    return None
+
+
+def _stale_fallback(cache: Optional[ResponseCache], endpoint: str, key_params: Dict):
+    def fallback():
+        stale = cache.get_stale(endpoint, key_params) if cache is not None else None
+        if stale is None or not isinstance(stale[0], dict):
+            return None
+        return {**stale[0], 'stale_age_s': round(stale[1])}
+    return fallback
+
+
+def guarded(dependency: Dependency, cache: Optional[ResponseCache], endpoint: str,
+            key_params: Dict, url: str, fetch) -> Any:
+    """
+    Run fetch() through dependency (breaker, deadline, hedging)
+
+    When the API fails, the last cached response is served with a
+    'stale_age_s' field; without one an error dict marked 'unavailable'
+    is returned.
+    """
+    try:
+        return dependency.call(fetch, dependency_failure, _stale_fallback(cache, endpoint, key_params))
+    except DependencyUnavailable as e:
+        return {'error': str(e), 'status_code': None, 'url': url, 'unavailable': True}
+
+
+async def aguarded(dependency: Dependency, cache: Optional[ResponseCache], endpoint: str,
+                   key_params: Dict, url: str, fetch) -> Any:
+    """Async counterpart of guarded; fetch() returns an awaitable"""
+    try:
+        return await dependency.acall(fetch, dependency_failure, _stale_fallback(cache, endpoint, key_params))
+    except DependencyUnavailable as e:
+        return {'error': str(e), 'status_code': None, 'url': url, 'unavailable': True}
+
+
+# Identical searches in flight at the same time (from threads or the async
+# client) share one request; keyed like the response cache
+search_flight = SingleFlight("search_studies")
+
+
 class ClinicalTrialsAPI:
     """
     A comprehensive tool for interacting with the ClinicalTrials.gov API v2.0
@@ -12,21 +212,50 @@ class ClinicalTrialsAPI:
     and fetch various types of information from the ClinicalTrials.gov database.
     """
     
-    def __init__(self, base_url: str = "https://clinicaltrials.gov/api/v2"):
+    def __init__(self, base_url: str = "https://clinicaltrials.gov/api/v2",
+                 cache: Optional[ResponseCache] = None,
+                 timeout: float = 15.0,
+                 dependency: Optional[Dependency] = None):
         """
         Initialize the ClinicalTrials API client
         
         Args:
             base_url: Base URL for the ClinicalTrials.gov API (default: v2 API)
+            cache: Optional ResponseCache shared between client instances
+            timeout: Timeout in seconds applied to every request
+            dependency: Optional circuit breaker / deadline / hedging policy;
+                with it, failures fall back to stale cached responses
         Note: The classic API was retired in June 2024. This uses the new v2 API.
         """
         self.base_url = base_url
+        self.cache = cache
+        self.timeout = timeout
+        self.dependency = dependency
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'ClinicalTrials-API-Tool/1.0',
             'Accept': 'application/json'
         })
     
+    def _cached(self, endpoint: str, params: Dict, fetch) -> Dict:
+        """Serve a response from the cache, or call fetch() and store its result"""
+        key_params = {**params, 'base_url': self.base_url}
+        if self.dependency is not None:
+            unguarded = fetch
+            fetch = lambda: guarded(self.dependency, self.cache, endpoint, key_params, self.base_url, unguarded)
+        if self.cache is None:
+            return fetch()
+        cached = self.cache.get(endpoint, key_params)
+        if cached is not None:
+            return cached
+        result = fetch()
+        self.cache.set(endpoint, key_params, result)
+        return result
+    
+    def cache_stats(self) -> Dict:
+        """Return hit/miss counters of the attached cache (empty dict without a cache)"""
+        return self.cache.stats() if self.cache is not None else {}
+    
     def test_api_connection(self) -> Dict:
         """
         Test the API connection with the working parameter format
@@ -42,7 +271,7 @@ class ClinicalTrialsAPI:
         }
         
         try:
-            response = self.session.get(endpoint, params=test_params)
+            response = self.session.get(endpoint, params=test_params, timeout=self.timeout)
             return {
                 'status_code': response.status_code,
                 'url': response.url,
@@ -66,7 +295,9 @@ class ClinicalTrialsAPI:
                       page_size: int = 100,
                       page_token: Optional[str] = None,
                       format: str = "json",
-                      fields: Optional[List[str]] = None) -> Dict:
+                      fields: Optional[List[str]] = None,
+                      advanced_filter: Optional[str] = None,
+                      sort: Optional[str] = None) -> Dict:
         """
         Search for clinical studies using various criteria
         
@@ -82,6 +313,8 @@ class ClinicalTrialsAPI:
             page_token: Token for pagination
             format: Response format ('json')
             fields: Specific fields to return
+            advanced_filter: Essie expression, e.g. 'AREA[LastUpdatePostDate]RANGE[2024-01-01,MAX]'
+            sort: Sort order, e.g. 'LastUpdatePostDate:asc' (default: relevance)
             
         Returns:
             Dictionary containing search results
@@ -104,6 +337,10 @@ class ClinicalTrialsAPI:
             params['filter.phase'] = phase
         if study_type:
             params['filter.studyType'] = study_type
+        if advanced_filter:
+            params['filter.advanced'] = advanced_filter
+        if sort:
+            params['sort'] = sort
         
         params['pageSize'] = min(page_size, 1000)  # API limit
         if page_token:
@@ -113,12 +350,16 @@ class ClinicalTrialsAPI:
         if fields:
             params['fields'] = ','.join(fields)
         
-        try:
-            response = self.session.get(endpoint, params=params)
-            response.raise_for_status()
-            return response.json() if format == 'json' else response.text
-        except requests.exceptions.RequestException as e:
-            return {'error': str(e), 'status_code': getattr(e.response, 'status_code', None), 'url': response.url if 'response' in locals() else endpoint}
+        def fetch():
+            try:
+                response = self.session.get(endpoint, params=params, timeout=self.timeout)
+                response.raise_for_status()
+                return response.json() if format == 'json' else response.text
+            except requests.exceptions.RequestException as e:
+                return {'error': str(e), 'status_code': getattr(e.response, 'status_code', None), 'url': response.url if 'response' in locals() else endpoint}
+        
+        key = ResponseCache.make_key('search_studies', {**params, 'base_url': self.base_url})
+        return search_flight.do(key, self._cached, 'search_studies', params, fetch)
     
     def get_study_details(self, nct_id: str, format: str = "json", fields: Optional[List[str]] = None) -> Dict:
         """
@@ -138,12 +379,15 @@ class ClinicalTrialsAPI:
         if fields:
             params['fields'] = ','.join(fields)
         
-        try:
-            response = self.session.get(endpoint, params=params, timeout=15)
-            response.raise_for_status()
-            return response.json() if format == 'json' else response.text
-        except requests.exceptions.RequestException as e:
-            return {'error': str(e), 'status_code': getattr(e.response, 'status_code', None)}
+        def fetch():
+            try:
+                response = self.session.get(endpoint, params=params, timeout=self.timeout)
+                response.raise_for_status()
+                return response.json() if format == 'json' else response.text
+            except requests.exceptions.RequestException as e:
+                return {'error': str(e), 'status_code': getattr(e.response, 'status_code', None)}
+        
+        return self._cached('get_study_details', {**params, 'nct_id': nct_id}, fetch)
     
     def get_study_fields(self) -> Dict:
         """
@@ -154,12 +398,15 @@ class ClinicalTrialsAPI:
         """
         endpoint = f"{self.base_url}/studies/metadata"
         
-        try:
-            response = self.session.get(endpoint)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {'error': str(e), 'status_code': getattr(e.response, 'status_code', None)}
+        def fetch():
+            try:
+                response = self.session.get(endpoint, timeout=self.timeout)
+                response.raise_for_status()
+                return response.json()
+            except requests.exceptions.RequestException as e:
+                return {'error': str(e), 'status_code': getattr(e.response, 'status_code', None)}
+        
+        return self._cached('get_study_fields', {}, fetch)
     
     
     def get_studies_by_ids(self, nct_ids: List[str], format: str = "json", fields: Optional[List[str]] = None) -> Dict:
@@ -175,20 +422,24 @@ class ClinicalTrialsAPI:
             Dictionary containing study information
         """
         endpoint = f"{self.base_url}/studies"
+        # One comma-separated value, as the API documents (not a repeated param)
         params = {
-            'query.id': nct_ids,
+            'query.id': ','.join(nct_ids),
             'format': format
         }
         
         if fields:
             params['fields'] = ','.join(fields)
         
-        try:
-            response = self.session.get(endpoint, params=params)
-            response.raise_for_status()
-            return response.json() if format == 'json' else response.text
-        except requests.exceptions.RequestException as e:
-            return {'error': str(e), 'status_code': getattr(e.response, 'status_code', None)}
+        def fetch():
+            try:
+                response = self.session.get(endpoint, params=params, timeout=self.timeout)
+                response.raise_for_status()
+                return response.json() if format == 'json' else response.text
+            except requests.exceptions.RequestException as e:
+                return {'error': str(e), 'status_code': getattr(e.response, 'status_code', None)}
+        
+        return self._cached('get_studies_by_ids', params, fetch)
     
     def get_statistics(self, 
                       query_term: Optional[str] = None,
@@ -216,24 +467,77 @@ class ClinicalTrialsAPI:
         if intervention:
             params['query.intr'] = intervention
         
-        try:
-            response = self.session.get(endpoint, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {'error': str(e), 'status_code': getattr(e.response, 'status_code', None)}
+        def fetch():
+            try:
+                response = self.session.get(endpoint, params=params, timeout=self.timeout)
+                response.raise_for_status()
+                return response.json()
+            except requests.exceptions.RequestException as e:
+                return {'error': str(e), 'status_code': getattr(e.response, 'status_code', None)}
+        
+        return self._cached('get_statistics', params, fetch)
     
-    def paginate_all_results(self, search_params: Dict, max_results: Optional[int] = None) -> List[Dict]:
+    def async_client(self, **kwargs):
+        """
+        Create an AsyncClinicalTrialsAPI sharing this client's base URL, cache, timeout and dependency
+        
+        Args:
+            **kwargs: Extra AsyncClinicalTrialsAPI options (rate, burst, max_connections, ...)
+        """
+        from tools.clinical_trials_async import AsyncClinicalTrialsAPI
+        options = {'base_url': self.base_url, 'cache': self.cache, 'timeout': self.timeout,
+                   'dependency': self.dependency}
+        options.update(kwargs)
+        return AsyncClinicalTrialsAPI(**options)
+    
+    def get_many_study_details(self, nct_ids: List[str], format: str = "json",
+                               fields: Optional[List[str]] = None, **async_options) -> Dict[str, Dict]:
+        """
+        Fetch several studies concurrently through the async client
+        
+        Args:
+            nct_ids: List of NCT identifiers
+            format: Response format
+            fields: Specific fields to return
+            **async_options: Options passed to AsyncClinicalTrialsAPI
+            
+        Returns:
+            Dictionary mapping each NCT ID to its study details (or error dict)
+        """
+        from tools.clinical_trials_async import run_sync
+        
+        async def fetch_all():
+            async with self.async_client(**async_options) as client:
+                return await client.get_many_study_details(nct_ids, format=format, fields=fields)
+        
+        return run_sync(fetch_all())
+    
+    def paginate_all_results(self, search_params: Dict, max_results: Optional[int] = None,
+                             prefetch: bool = False, strict: bool = False) -> List[Dict]:
         """
         Helper function to get all results across multiple pages
         
         Args:
             search_params: Parameters for the search_studies method
             max_results: Maximum number of results to retrieve (None for all)
+            prefetch: Use the async client, requesting the next page while the
+                current one is processed (rate limited by its token bucket)
+            strict: Raise IncompleteResults when a page fails instead of
+                returning the pages fetched so far
             
         Returns:
             List of all study records
         """
+        if prefetch:
+            from tools.clinical_trials_async import run_sync
+            
+            async def fetch_pages():
+                async with self.async_client() as client:
+                    return await client.paginate_all_results(search_params, max_results=max_results,
+                                                             strict=strict)
+            
+            return run_sync(fetch_pages())
+        
         all_studies = []
         page_token = None
         total_retrieved = 0
@@ -248,6 +552,8 @@ class ClinicalTrialsAPI:
             response = self.search_studies(**current_params)
             
             if 'error' in response:
+                if strict:
+                    raise IncompleteResults(response['error'], all_studies)
                 break
             
             studies = response.get('studies', [])
@@ -270,9 +576,9 @@ class ClinicalTrialsAPI:
         return all_studies
 
 # Example usage and helper functions
-def create_clinical_trials_tool():
+def create_clinical_trials_tool(cache: Optional[ResponseCache] = None):
     """Factory function to create a ClinicalTrials API instance"""
-    return ClinicalTrialsAPI()
+    return ClinicalTrialsAPI(cache=cache)
 
 def search_covid_trials():
     """Example: Search for COVID-19 related trials"""
@@ -0,0 +1,327 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Optional, Dict, List, Any
+
+import httpx
+
+from tools.clinical_trials_api import IncompleteResults, ResponseCache, aguarded, search_flight
+from utils.resilience import Dependency
+
+
+class TokenBucket:
+    """
+    Asyncio token-bucket rate limiter
+
+    Allows bursts of up to `capacity` requests and refills at `rate` tokens
+    per second, so sustained traffic never exceeds the configured rate.
+    """
+
+    def __init__(self, rate: float = 10.0, capacity: int = 10):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and consume it"""
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+
+class AsyncClinicalTrialsAPI:
+    """
+    Asyncio client for the ClinicalTrials.gov API v2.0
+
+    Mirrors the read methods of ClinicalTrialsAPI, but shares one pooled
+    httpx connection pool, throttles through a token bucket, applies a
+    timeout to every request and retries transient failures with jittered
+    exponential backoff. Errors are returned as {'error': ...} dictionaries,
+    the same as the sync client.
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self,
+                 base_url: str = "https://clinicaltrials.gov/api/v2",
+                 cache: Optional[ResponseCache] = None,
+                 timeout: float = 15.0,
+                 max_connections: int = 10,
+                 rate: float = 10.0,
+                 burst: int = 10,
+                 max_retries: int = 3,
+                 backoff_base: float = 0.5,
+                 dependency: Optional[Dependency] = None):
+        """
+        Initialize the async ClinicalTrials API client
+
+        Args:
+            base_url: Base URL for the ClinicalTrials.gov API (default: v2 API)
+            cache: Optional ResponseCache, can be shared with the sync client
+            timeout: Per-request timeout in seconds
+            max_connections: Size of the shared connection pool
+            rate: Sustained request rate in requests per second
+            burst: Maximum burst size of the rate limiter
+            max_retries: Retries after the first attempt for transient errors
+            backoff_base: Base delay in seconds for exponential backoff
+            dependency: Optional circuit breaker / deadline / hedging policy
+                around the retries; failures fall back to stale cached responses
+        """
+        self.base_url = base_url
+        self.cache = cache
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.dependency = dependency
+        self.limiter = TokenBucket(rate=rate, capacity=burst)
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            headers={
+                'User-Agent': 'ClinicalTrials-API-Tool/1.0',
+                'Accept': 'application/json'
+            },
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the underlying connection pool"""
+        await self.client.aclose()
+
+    async def _get(self, cache_name: str, path: str, params: Dict, json_response: bool = True,
+                   cache_params: Optional[Dict] = None) -> Any:
+        """
+        Rate-limited GET with timeout, retries and optional caching
+
+        Cache entries are keyed exactly like ClinicalTrialsAPI._cached keys
+        them (cache_params, default params, plus base_url), so the sync and
+        async clients share one ResponseCache.
+        """
+        key_params = {**(params if cache_params is None else cache_params), 'base_url': self.base_url}
+        if self.cache is not None:
+            cached = self.cache.get(cache_name, key_params)
+            if cached is not None:
+                return cached
+
+        url = f"{self.base_url}{path}"
+        if self.dependency is not None:
+            result = await aguarded(self.dependency, self.cache, cache_name, key_params, url,
+                                    lambda: self._fetch(url, params, json_response))
+        else:
+            result = await self._fetch(url, params, json_response)
+
+        if self.cache is not None:
+            self.cache.set(cache_name, key_params, result)
+        return result
+
+    async def _fetch(self, url: str, params: Dict, json_response: bool) -> Any:
+        """GET with rate limiting and retries; failures come back as error dicts"""
+        result: Any = None
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            try:
+                response = await self.client.get(url, params=params)
+                if response.status_code in self.RETRY_STATUS and attempt < self.max_retries:
+                    await self._backoff(attempt)
+                    continue
+                response.raise_for_status()
+                result = response.json() if json_response else response.text
+                break
+            except httpx.HTTPStatusError as e:
+                result = {'error': str(e), 'status_code': e.response.status_code, 'url': str(e.request.url)}
+                break
+            except httpx.HTTPError as e:
+                result = {'error': str(e) or type(e).__name__, 'status_code': None, 'url': url}
+                if attempt < self.max_retries:
+                    await self._backoff(attempt)
+        return result
+
+    async def _backoff(self, attempt: int) -> None:
+        # Full jitter: sleep a random amount up to the exponential ceiling
+        await asyncio.sleep(random.uniform(0, self.backoff_base * (2 ** attempt)))
+
+    async def search_studies(self,
+                             query_term: Optional[str] = None,
+                             condition: Optional[str] = None,
+                             intervention: Optional[str] = None,
+                             location: Optional[str] = None,
+                             status: Optional[str] = None,
+                             phase: Optional[str] = None,
+                             study_type: Optional[str] = None,
+                             page_size: int = 100,
+                             page_token: Optional[str] = None,
+                             format: str = "json",
+                             fields: Optional[List[str]] = None,
+                             advanced_filter: Optional[str] = None,
+                             sort: Optional[str] = None) -> Dict:
+        """Async counterpart of ClinicalTrialsAPI.search_studies"""
+        params = {}
+        if query_term:
+            params['query.term'] = query_term
+        if condition:
+            params['query.cond'] = condition
+        if intervention:
+            params['query.intr'] = intervention
+        if location:
+            params['query.locn'] = location
+        if status:
+            params['filter.overallStatus'] = status
+        if phase:
+            params['filter.phase'] = phase
+        if study_type:
+            params['filter.studyType'] = study_type
+        if advanced_filter:
+            params['filter.advanced'] = advanced_filter
+        if sort:
+            params['sort'] = sort
+
+        params['pageSize'] = min(page_size, 1000)  # API limit
+        if page_token:
+            params['pageToken'] = page_token
+        params['format'] = format
+
+        if fields:
+            params['fields'] = ','.join(fields)
+
+        key = ResponseCache.make_key('search_studies', {**params, 'base_url': self.base_url})
+        return await search_flight.ado(key, self._get, 'search_studies', '/studies', params,
+                                       json_response=format == 'json')
+
+    async def get_study_details(self, nct_id: str, format: str = "json", fields: Optional[List[str]] = None) -> Dict:
+        """Async counterpart of ClinicalTrialsAPI.get_study_details"""
+        params = {'format': format}
+        if fields:
+            params['fields'] = ','.join(fields)
+        return await self._get('get_study_details', f'/studies/{nct_id}', params, json_response=format == 'json',
+                               cache_params={**params, 'nct_id': nct_id})
+
+    async def get_many_study_details(self, nct_ids: List[str], format: str = "json",
+                                     fields: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Fetch several studies concurrently
+
+        Args:
+            nct_ids: List of NCT identifiers
+            format: Response format
+            fields: Specific fields to return
+
+        Returns:
+            Dictionary mapping each NCT ID to its study details (or error dict)
+        """
+        results = await asyncio.gather(
+            *(self.get_study_details(nct_id, format=format, fields=fields) for nct_id in nct_ids)
+        )
+        return dict(zip(nct_ids, results))
+
+    async def get_studies_by_ids(self, nct_ids: List[str], format: str = "json", fields: Optional[List[str]] = None) -> Dict:
+        """Async counterpart of ClinicalTrialsAPI.get_studies_by_ids"""
+        params = {'query.id': ','.join(nct_ids), 'format': format}
+        if fields:
+            params['fields'] = ','.join(fields)
+        return await self._get('get_studies_by_ids', '/studies', params, json_response=format == 'json')
+
+    async def get_statistics(self,
+                             query_term: Optional[str] = None,
+                             condition: Optional[str] = None,
+                             intervention: Optional[str] = None) -> Dict:
+        """Async counterpart of ClinicalTrialsAPI.get_statistics"""
+        params = {}
+        if query_term:
+            params['query.term'] = query_term
+        elif condition:
+            params['query.term'] = condition
+        if intervention:
+            params['query.intr'] = intervention
+        return await self._get('get_statistics', '/stats', params)
+
+    async def get_study_fields(self) -> Dict:
+        """Async counterpart of ClinicalTrialsAPI.get_study_fields"""
+        return await self._get('get_study_fields', '/studies/metadata', {})
+
+    async def paginate_all_results(self, search_params: Dict, max_results: Optional[int] = None,
+                                   strict: bool = False) -> List[Dict]:
+        """
+        Get all results across multiple pages, prefetching the next page
+
+        As soon as a page arrives its nextPageToken is used to start the
+        following request, so the network round-trip overlaps with
+        processing of the current page. Pacing is left to the rate limiter.
+
+        Args:
+            search_params: Parameters for the search_studies method
+            max_results: Maximum number of results to retrieve (None for all)
+            strict: Raise IncompleteResults when a page fails instead of
+                returning the pages fetched so far
+
+        Returns:
+            List of all study records
+        """
+        all_studies = []
+        pending = asyncio.ensure_future(self.search_studies(**search_params))
+
+        while pending is not None:
+            response = await pending
+            pending = None
+
+            if 'error' in response:
+                if strict:
+                    raise IncompleteResults(response['error'], all_studies)
+                break
+
+            page_token = response.get('nextPageToken')
+            studies = response.get('studies', [])
+            remaining = None if max_results is None else max_results - len(all_studies) - len(studies)
+            if page_token and (remaining is None or remaining > 0):
+                pending = asyncio.ensure_future(
+                    self.search_studies(**{**search_params, 'page_token': page_token})
+                )
+
+            all_studies.extend(studies)
+
+        if max_results:
+            all_studies = all_studies[:max_results]
+        return all_studies
+
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code
+
+    Uses asyncio.run when no loop is active in this thread; otherwise (e.g.
+    inside Streamlit or a running agent loop) runs it on a helper thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result: Dict[str, Any] = {}
+
+    def runner():
+        try:
+            result['value'] = asyncio.run(coro)
+        except BaseException as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return result['value']
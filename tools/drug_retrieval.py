@@ -1,15 +1,136 @@
+import os
 from typing import List
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 
-# Load embedding + vector store
-embedding = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-vectordb = Chroma(persist_directory="chroma_db", embedding_function=embedding)
+from tools.hybrid_index import SECTION_ORDER, reciprocal_rank_fusion
+from tools.retrieval_cache import RetrievalCache
+from utils import resources
+from utils.resources import get_hybrid_index, get_vectordb
+from utils.retrieval_service import remote_call, remote_retrieve, remote_version
+from utils.runtime_profile import setting
+from utils.single_flight import SingleFlight
+from utils.tracing import span
 
-def retrieve_drug_info(query: str, k: int = 2, threshold: float = 0.0) -> List[Document]:
-    retriever = vectordb.as_retriever(
-        search_type="similarity_score_threshold",
-        search_kwargs={"k": k, "score_threshold": threshold}
-    )
-    return retriever.invoke(query)
+# "hybrid" (default): exact drug-name lookup, else BM25 + vector fused by rank.
+# "vector": dense similarity only.
+# "lexical": drug-name lookup and BM25 only; never loads the embedding model.
+RETRIEVAL_MODE = setting("RETRIEVAL_MODE", "hybrid")
+# Misspelled drug names within this similarity ratio still hit the name table
+FUZZY_CUTOFF = float(os.getenv("RETRIEVAL_FUZZY_CUTOFF", "0.85"))
+# Candidates taken from each ranker before fusion
+FUSION_CANDIDATES = 10
+# Set in serve.py workers: retrieval runs in the shared service instead of in-process
+RETRIEVAL_SERVICE_URL = os.getenv("RETRIEVAL_SERVICE_URL")
+
+# Query embedding + top-k result cache. RETRIEVAL_CACHE_SIMILARITY (e.g. 0.95)
+# lets near-duplicate questions reuse earlier results.
+_similarity = os.getenv("RETRIEVAL_CACHE_SIMILARITY")
+retrieval_cache = RetrievalCache(
+    get_vectordb,
+    similarity_threshold=float(_similarity) if _similarity else None,
+    watch_files=lambda: [resources.hybrid_index_path()],
+    on_invalidate=lambda: (resources.reset("hybrid_index"), resources.reload_if_swapped()),
+)
+
+
+def expand_to_parents(chunks: List[Document]) -> List[Document]:
+    """Replace section chunks by their full monographs, in retrieval order.
+
+    Documents without a parent_id (indexes built before chunking) are
+    returned unchanged.
+    """
+    collection = get_vectordb()._collection
+    parents, seen = [], set()
+    for chunk in chunks:
+        parent_id = chunk.metadata.get("parent_id")
+        if parent_id is None:
+            parents.append(chunk)
+            continue
+        if parent_id in seen:
+            continue
+        seen.add(parent_id)
+        stored = collection.get(where={"parent_id": parent_id}, include=["documents", "metadatas"])
+        parts = sorted(zip(stored["metadatas"], stored["documents"]),
+                       key=lambda p: (SECTION_ORDER.get(p[0].get("section"), 99), p[0].get("chunk_index", 0)))
+        header = f"Drug: {chunk.metadata.get('drug_name')}\n"
+        body = "\n".join(text[len(header):] if text.startswith(header) else text for _, text in parts)
+        parents.append(Document(
+            id=parent_id,
+            page_content=f"{header}{body}\nSource: {chunk.metadata.get('source')}",
+            metadata={"source": chunk.metadata.get("source"), "drug_name": chunk.metadata.get("drug_name"),
+                      "parent_id": parent_id},
+        ))
+    return parents
+
+
+def hybrid_search(query: str, k: int, threshold: float) -> List[Document]:
+    retrieval_cache.check_fresh()
+    index = get_hybrid_index()
+
+    # Common case: the question names a known drug. Rank that drug's chunks
+    # lexically and never touch the embedding model.
+    with span("name lookup", "lexical") as attributes:
+        drugs, _ = index.match_names(query)
+        attributes["matched"] = drugs
+        if drugs:
+            return index.search_drugs(query, drugs, k)
+
+    # Misspelled names are corrected for BM25; the dense ranker sees the raw query
+    fuzzy_drugs, fuzzy_terms = index.match_names(query, fuzzy_cutoff=FUZZY_CUTOFF)
+    with span("bm25", "lexical"):
+        lexical = index.search(query, FUSION_CANDIDATES, extra_terms=[t for term in fuzzy_terms for t in term.split()])
+    rankings = [lexical]
+    if RETRIEVAL_MODE != "lexical":
+        rankings.insert(0, retrieval_cache.search(query, k=FUSION_CANDIDATES, threshold=threshold))
+    if fuzzy_drugs:
+        rankings.insert(0, index.search_drugs(query, fuzzy_drugs, FUSION_CANDIDATES))
+    return reciprocal_rank_fusion(rankings, k)
+
+
+def match_drugs(query: str) -> List[str]:
+    """Known drug names mentioned in query (exact names first, else close misspellings)."""
+    if RETRIEVAL_SERVICE_URL:
+        return remote_call(RETRIEVAL_SERVICE_URL, "/match", {"query": query})["drugs"]
+    index = get_hybrid_index()
+    drugs, _ = index.match_names(query)
+    return drugs or index.match_names(query, fuzzy_cutoff=FUZZY_CUTOFF)[0]
+
+
+def drug_section(drug_name: str, section: str) -> str:
+    """One section (Uses, Side Effects, Precautions) of a drug's monograph."""
+    if RETRIEVAL_SERVICE_URL:
+        return remote_call(RETRIEVAL_SERVICE_URL, "/section", {"drug": drug_name, "section": section})["text"]
+    return get_hybrid_index().section_text(drug_name, section)
+
+
+def knowledge_version() -> str:
+    """Identifies the current state of the local index (changes on re-ingest)."""
+    if RETRIEVAL_SERVICE_URL:
+        return remote_version(RETRIEVAL_SERVICE_URL)
+    return "-".join(str(part) for part in retrieval_cache.fingerprint())
+
+
+# Concurrent identical lookups (e.g. a trending drug) share one execution
+retrieval_flight = SingleFlight("retrieve_drug_info")
+
+
+def retrieve_drug_info(query: str, k: int = 3, threshold: float = 0.0,
+                       expand_parents: bool = False) -> List[Document]:
+    """Top-k section chunks for query (each tagged with drug_name and section).
+
+    With expand_parents=True the matching monographs are returned whole instead.
+    """
+    return list(retrieval_flight.do((query.strip(), k, threshold, expand_parents),
+                                    _retrieve, query, k, threshold, expand_parents))
+
+
+def _retrieve(query: str, k: int, threshold: float, expand_parents: bool) -> List[Document]:
+    if RETRIEVAL_SERVICE_URL:
+        return remote_retrieve(RETRIEVAL_SERVICE_URL, query, k=k, threshold=threshold,
+                               expand_parents=expand_parents)
+    # Embedding model + vector store are loaded once per process, on first use
+    if RETRIEVAL_MODE == "vector":
+        chunks = retrieval_cache.search(query, k=k, threshold=threshold)
+    else:
+        chunks = hybrid_search(query, k, threshold)
+    return expand_to_parents(chunks) if expand_parents else chunks
@@ -0,0 +1,228 @@
+import difflib
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from tools.retrieval_cache import STOPWORDS
+
+INDEX_FILENAME = "hybrid_index.json"
+
+# Words in MedlinePlus titles that say how a drug is given, not what it is
+FORM_WORDS = {
+    "and", "oral", "inhalation", "injection", "tablets", "tablet", "capsules",
+    "extended", "release", "delayed", "solution", "suspension", "topical",
+    "nasal", "spray", "ophthalmic", "powder", "sodium", "hydrochloride",
+}
+
+MAX_NAME_WORDS = 4
+
+SECTION_ORDER = {"Uses": 0, "Side Effects": 1, "Precautions": 2}
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS]
+
+
+def drug_name_of(doc: Document) -> Optional[str]:
+    """drug_name metadata, or the "Drug: ..." header of pre-chunking documents."""
+    name = doc.metadata.get("drug_name")
+    if not name and doc.page_content.startswith("Drug: "):
+        name = doc.page_content.split("\n", 1)[0][len("Drug: "):].strip()
+    return name or None
+
+
+def name_keys(drug_name: str) -> List[str]:
+    """Lookup keys for a drug title: the full name, each active ingredient of
+    a combination, and each distinctive word (form words excluded)."""
+    full = " ".join(re.findall(r"[a-z0-9]+", drug_name.lower()))
+    keys = {full}
+    for part in re.split(r"\s+and\s+|,\s*|/", drug_name.lower()):
+        part = " ".join(w for w in re.findall(r"[a-z0-9]+", part) if w not in FORM_WORDS)
+        if part:
+            keys.add(part)
+    keys.update(w for w in full.split() if w not in FORM_WORDS and len(w) >= 4)
+    return sorted(keys)
+
+
+class HybridIndex:
+    """
+    In-process lexical side of hybrid retrieval
+
+    Holds every indexed chunk with an Okapi BM25 inverted index over its
+    text, plus a name table mapping drug names and synonyms to their chunks.
+    It is built at ingest time and saved as JSON next to the Chroma store;
+    postings are rebuilt on load, which is fast at MedlinePlus scale.
+    """
+
+    def __init__(self, docs: Sequence[Document], synonyms: Optional[Dict[str, List[str]]] = None,
+                 k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            docs: Indexed chunks; drug_name metadata feeds the name table
+            synonyms: Extra names per drug_name (e.g. brand names)
+            k1: BM25 term-frequency saturation
+            b: BM25 length normalization
+        """
+        self.docs = list(docs)
+        self.synonyms = synonyms or {}
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_lengths: List[int] = []
+        self.names: Dict[str, set] = defaultdict(set)
+
+        for i, doc in enumerate(self.docs):
+            terms = tokenize(doc.page_content)
+            self.doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings[term][i] = tf
+            drug_name = drug_name_of(doc)
+            if drug_name:
+                for key in name_keys(drug_name):
+                    self.names[key].add(drug_name)
+                for synonym in self.synonyms.get(drug_name, []):
+                    self.names[" ".join(tokenize(synonym))].add(drug_name)
+        self.avg_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+        self._by_drug: Dict[str, List[int]] = defaultdict(list)
+        for i, doc in enumerate(self.docs):
+            self._by_drug[drug_name_of(doc)].append(i)
+        # Keep each drug's chunks in monograph order
+        for chunk_ids in self._by_drug.values():
+            chunk_ids.sort(key=lambda i: (SECTION_ORDER.get(self.docs[i].metadata.get("section"), 99),
+                                          self.docs[i].metadata.get("chunk_index", 0)))
+
+    @classmethod
+    def from_collection(cls, collection, synonyms: Optional[Dict[str, List[str]]] = None) -> "HybridIndex":
+        """Build from every document stored in a Chroma collection."""
+        stored = collection.get(include=["documents", "metadatas"])
+        docs = [Document(id=doc_id, page_content=text, metadata=metadata or {})
+                for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])]
+        return cls(docs, synonyms)
+
+    def save(self, path: str) -> None:
+        payload = {
+            "synonyms": self.synonyms,
+            "docs": [{"id": d.id, "text": d.page_content, "metadata": d.metadata} for d in self.docs],
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "HybridIndex":
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        docs = [Document(id=d["id"], page_content=d["text"], metadata=d["metadata"]) for d in payload["docs"]]
+        return cls(docs, payload.get("synonyms"))
+
+    def match_names(self, query: str, fuzzy_cutoff: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """
+        Find drugs named in the query
+
+        Args:
+            query: User question
+            fuzzy_cutoff: If set and nothing matches exactly, accept names
+                whose similarity ratio to a query word is at least this
+
+        Returns:
+            (matched drug names, query n-grams that matched)
+        """
+        words = re.findall(r"[a-z0-9]+", query.lower())
+        matched, spans = [], []
+        for n in range(min(MAX_NAME_WORDS, len(words)), 0, -1):
+            for i in range(len(words) - n + 1):
+                gram = " ".join(words[i:i + n])
+                for drug in sorted(self.names.get(gram, ())):
+                    if drug not in matched:
+                        matched.append(drug)
+                        spans.append(gram)
+        if matched or fuzzy_cutoff is None:
+            return matched, spans
+        single_word_keys = [key for key in self.names if " " not in key]
+        for word in words:
+            if len(word) < 4 or word in STOPWORDS:
+                continue
+            for key in difflib.get_close_matches(word, single_word_keys, n=1, cutoff=fuzzy_cutoff):
+                for drug in sorted(self.names[key]):
+                    if drug not in matched:
+                        matched.append(drug)
+                        spans.append(key)
+        return matched, spans
+
+    def bm25_scores(self, terms: Iterable[str], candidates: Optional[Iterable[int]] = None) -> Dict[int, float]:
+        allowed = set(candidates) if candidates is not None else None
+        n_docs = len(self.docs)
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings.items():
+                if allowed is not None and i not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[i] / (self.avg_length or 1))
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int, extra_terms: Sequence[str] = ()) -> List[Document]:
+        """Top-k chunks by BM25 over the whole index."""
+        scores = self.bm25_scores(list(tokenize(query)) + list(extra_terms))
+        ranked = sorted(scores, key=lambda i: -scores[i])[:k]
+        return [self.docs[i] for i in ranked]
+
+    def search_drugs(self, query: str, drug_names: Sequence[str], k: int) -> List[Document]:
+        """Top-k chunks of the given drugs, ranked by BM25 on the rest of the query.
+
+        Chunks the query terms do not discriminate keep their monograph order.
+        """
+        name_terms = {t for drug in drug_names for t in tokenize(drug)}
+        terms = [t for t in tokenize(query) if t not in name_terms]
+        results = []
+        per_drug = max(1, k // max(1, len(drug_names)))
+        for drug in drug_names:
+            candidates = self._by_drug.get(drug, [])
+            scores = self.bm25_scores(terms, candidates)
+            order = {i: pos for pos, i in enumerate(candidates)}
+            ranked = sorted(candidates, key=lambda i: (-scores.get(i, 0.0), order[i]))
+            results.extend(self.docs[i] for i in ranked[:per_drug])
+        return results[:k]
+
+    def section_text(self, drug_name: str, section: str) -> str:
+        """Full text of one section of a drug's monograph ("" if not indexed).
+
+        Whole-monograph documents (indexes built before chunking) are split
+        on their "Section: ..." lines.
+        """
+        parts = []
+        prefix = f"{section}: "
+        for i in self._by_drug.get(drug_name, []):
+            doc = self.docs[i]
+            lines = doc.page_content.split("\n")
+            if lines and lines[0].startswith("Drug: "):
+                lines = lines[1:]
+            if doc.metadata.get("section") == section:
+                text = "\n".join(lines)
+                parts.append(text[len(prefix):] if text.startswith(prefix) else text)
+            elif doc.metadata.get("section") is None:
+                parts.extend(line[len(prefix):] for line in lines if line.startswith(prefix))
+        return "\n".join(parts).strip()
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Document]], k: int, c: int = 60) -> List[Document]:
+    """Fuse ranked lists by summing 1 / (c + rank); documents are matched on id."""
+    scores: Dict[str, float] = defaultdict(float)
+    first_seen: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = doc.id or doc.page_content
+            scores[key] += 1.0 / (c + rank + 1)
+            first_seen.setdefault(key, doc)
+    ordered = sorted(scores, key=lambda key: -scores[key])[:k]
+    return [first_seen[key] for key in ordered]
@@ -0,0 +1,302 @@
+"""Exact-search vector store in a memory-mapped NumPy matrix.
+
+The MedlinePlus corpus is a few hundred chunks, small enough that one
+matrix product over every vector is faster than Chroma's SQLite + HNSW
+round trip, and exact. A store directory holds:
+
+    embeddings.npy   (n, dim) float32 or float16, opened with mmap_mode="r"
+    records.json     ids, documents and metadatas, row-aligned with the matrix
+    manifest.json    dtype, dimension and count; written last on every change
+
+float16 halves the file, not the memory: searches run on a float32 copy
+made once per reload rather than converting the matrix on every query.
+
+`NumpyVectorStore` stands in for `langchain_chroma.Chroma` (select it with
+VECTOR_STORE=numpy): its `_collection` answers the subset of the Chroma
+collection API that ingestion, parent expansion and the hybrid index use.
+Distances are squared L2 like Chroma's default space, so relevance
+thresholds carry over unchanged.
+
+    uv run python -m tools.numpy_store export --from chroma_db --to numpy_store --dtype float16
+"""
+import argparse
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+MATRIX_FILE = "embeddings.npy"
+RECORDS_FILE = "records.json"
+MANIFEST_FILE = "manifest.json"
+DTYPES = ("float32", "float16")
+
+
+def _matches(metadata: Dict, where: Optional[Dict]) -> bool:
+    # Chroma-style filters: {"field": value} or {"field": {"$in": [...]}}
+    for field, condition in (where or {}).items():
+        value = metadata.get(field)
+        if isinstance(condition, dict):
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+@dataclass(frozen=True)
+class Rows:
+    """One consistent view of a store; a reload replaces it whole, never piecemeal."""
+
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict]
+    positions: Dict[str, int]
+    matrix: np.ndarray  # as stored (memory-mapped when loaded from disk)
+    vectors: np.ndarray  # float32 for search: the matrix itself or a copy of a float16 one
+    sq_norms: np.ndarray
+    mtime: Optional[float] = None
+
+    @classmethod
+    def build(cls, ids: List[str], documents: List[str], metadatas: List[Dict], matrix: np.ndarray,
+              mtime: Optional[float] = None) -> "Rows":
+        vectors = np.asarray(matrix, dtype=np.float32)
+        sq_norms = (vectors ** 2).sum(axis=1) if len(vectors) else np.zeros(0, dtype=np.float32)
+        return cls(ids, documents, metadatas, {doc_id: i for i, doc_id in enumerate(ids)},
+                   matrix, vectors, sq_norms, mtime)
+
+
+class NumpyCollection:
+    """Rows of one store directory, with a Chroma-collection-like interface."""
+
+    def __init__(self, path: str, dtype: str = "float32"):
+        """
+        Args:
+            path: Store directory (created on first write)
+            dtype: Storage type of new stores; existing ones keep theirs
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}, got {dtype!r}")
+        self.path = path
+        self.dtype = dtype
+        self._rows = Rows.build([], [], [], np.zeros((0, 0), dtype=dtype))
+        self._refresh()
+
+    # Views of the current rows; code that reads several should take one rows() snapshot
+    ids = property(lambda self: self._rows.ids)
+    documents = property(lambda self: self._rows.documents)
+    metadatas = property(lambda self: self._rows.metadatas)
+    matrix = property(lambda self: self._rows.matrix)
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, MANIFEST_FILE)
+
+    def _refresh(self, force: bool = False) -> Rows:
+        """(Re)load when another process rewrote the store; returns the current rows."""
+        rows = self._rows
+        manifest_path = self._manifest_path()
+        mtime = os.path.getmtime(manifest_path) if os.path.exists(manifest_path) else None
+        if mtime is None or (mtime == rows.mtime and not force):
+            return rows
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        with open(os.path.join(self.path, RECORDS_FILE), encoding="utf-8") as f:
+            records = json.load(f)
+        rows = Rows.build(records["ids"], records["documents"], records["metadatas"],
+                          np.load(os.path.join(self.path, MATRIX_FILE), mmap_mode="r"), mtime)
+        self.dtype = manifest["dtype"]
+        # Single assignment: concurrent readers see the old rows or the new ones
+        self._rows = rows
+        return rows
+
+    def rows(self) -> Rows:
+        """The current rows, reloaded first if the store changed on disk."""
+        return self._refresh()
+
+    def _write(self, matrix: np.ndarray, ids: List[str], documents: List[str], metadatas: List[Dict]) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        matrix = np.ascontiguousarray(matrix, dtype=self.dtype)
+        # Each file is replaced atomically and the manifest goes last, so a
+        # reader sees either the old store or the new one
+        tmp = os.path.join(self.path, f"{MATRIX_FILE}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, matrix)
+        os.replace(tmp, os.path.join(self.path, MATRIX_FILE))
+        for name, payload in ((RECORDS_FILE, {"ids": ids, "documents": documents, "metadatas": metadatas}),
+                              (MANIFEST_FILE, {"dtype": self.dtype, "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+                                               "count": len(ids)})):
+            tmp = os.path.join(self.path, f"{name}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp, os.path.join(self.path, name))
+        self._refresh(force=True)
+
+    def count(self) -> int:
+        return len(self._refresh().ids)
+
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict] = None,
+            include: Sequence[str] = ("documents", "metadatas"), **kwargs) -> Dict[str, Any]:
+        rows = self._refresh()
+        if ids is not None:
+            positions = [rows.positions[i] for i in ids if i in rows.positions]
+        else:
+            positions = list(range(len(rows.ids)))
+        positions = [i for i in positions if _matches(rows.metadatas[i], where)]
+        result = {"ids": [rows.ids[i] for i in positions]}
+        if "documents" in include:
+            result["documents"] = [rows.documents[i] for i in positions]
+        if "metadatas" in include:
+            result["metadatas"] = [rows.metadatas[i] for i in positions]
+        if "embeddings" in include:
+            result["embeddings"] = rows.vectors[positions]
+        return result
+
+    def upsert(self, ids: Sequence[str], embeddings, documents: Sequence[str],
+               metadatas: Optional[Sequence[Dict]] = None) -> None:
+        if not len(ids):
+            return
+        rows = self._refresh()
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        # A writable float32 copy; the loaded matrix is a read-only memory map
+        matrix = np.array(rows.vectors) if len(rows.ids) else np.zeros((0, vectors.shape[1]), dtype=np.float32)
+        new_ids, new_docs, new_meta = list(rows.ids), list(rows.documents), list(rows.metadatas)
+        positions = dict(rows.positions)
+        appended = []
+        for row, doc_id in enumerate(ids):
+            metadata = dict(metadatas[row]) if metadatas else {}
+            if doc_id in positions:
+                i = positions[doc_id]
+                matrix[i] = vectors[row]
+                new_docs[i], new_meta[i] = documents[row], metadata
+            else:
+                positions[doc_id] = len(new_ids)
+                new_ids.append(doc_id)
+                new_docs.append(documents[row])
+                new_meta.append(metadata)
+                appended.append(row)
+        if appended:
+            matrix = np.vstack([matrix, vectors[appended]])
+        self._write(matrix, new_ids, new_docs, new_meta)
+
+    add = upsert
+
+    def delete(self, ids: Sequence[str]) -> None:
+        rows = self._refresh()
+        drop = {rows.positions[i] for i in ids if i in rows.positions}
+        if not drop:
+            return
+        keep = [i for i in range(len(rows.ids)) if i not in drop]
+        self._write(rows.vectors[keep], [rows.ids[i] for i in keep],
+                    [rows.documents[i] for i in keep], [rows.metadatas[i] for i in keep])
+
+    def search(self, queries: np.ndarray, k: int, rows: Optional[Rows] = None) -> List[List[Tuple[int, float]]]:
+        """Exact top-k (row, squared L2 distance) for each row of queries, over `rows` or the current rows."""
+        if rows is None:
+            rows = self._refresh()
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, len(rows.ids))
+        if k == 0:
+            return [[] for _ in queries]
+        # |q - v|^2 = |q|^2 + |v|^2 - 2 q.v, all rows in one matrix product
+        distances = (queries ** 2).sum(axis=1, keepdims=True) + rows.sq_norms - 2 * (queries @ rows.vectors.T)
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(distances[row, candidates])]
+            results.append([(int(i), max(0.0, float(distances[row, i]))) for i in ordered])
+        return results
+
+
+class NumpyVectorStore(VectorStore):
+    """LangChain vector store over a NumpyCollection (exact search)."""
+
+    def __init__(self, persist_directory: str, embedding_function: Embeddings, dtype: str = "float32"):
+        self._persist_directory = persist_directory
+        self._embedding_function = embedding_function
+        self._collection = NumpyCollection(persist_directory, dtype)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    @staticmethod
+    def _document(rows: Rows, i: int) -> Document:
+        return Document(id=rows.ids[i], page_content=rows.documents[i], metadata=rows.metadatas[i])
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[Dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self._collection.upsert(ids, self._embedding_function.embed_documents(texts), texts, metadatas)
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs) -> None:
+        self._collection.delete(ids or [])
+
+    def similarity_search_by_vectors_with_scores(self, embeddings: Sequence[Sequence[float]],
+                                                 k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """Top-k (document, distance) for a batch of query vectors in one matrix product."""
+        rows = self._collection.rows()
+        hits = self._collection.search(embeddings, k, rows)
+        return [[(self._document(rows, i), d) for i, d in row_hits] for row_hits in hits]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: Sequence[float], k: int = 4,
+                                                          **kwargs) -> List[Tuple[Document, float]]:
+        # Named after Chroma's method, which also returns distances despite the name
+        return self.similarity_search_by_vectors_with_scores([embedding], k)[0]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(self._embedding_function.embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[Dict]] = None,
+                   ids: Optional[List[str]] = None, persist_directory: str = "numpy_store",
+                   dtype: str = "float32", **kwargs) -> "NumpyVectorStore":
+        store = cls(persist_directory, embedding, dtype)
+        store.add_texts(texts, metadatas, ids)
+        return store
+
+
+def export_collection(collection, path: str, dtype: str = "float32") -> NumpyCollection:
+    """Copy every record of a Chroma collection (vectors included) into a NumPy store."""
+    from tools.hybrid_index import INDEX_FILENAME, HybridIndex
+
+    stored = collection.get(include=["documents", "metadatas", "embeddings"])
+    target = NumpyCollection(path, dtype)
+    target.upsert(stored["ids"], stored["embeddings"], stored["documents"],
+                  [m or {} for m in stored["metadatas"]])
+    HybridIndex.from_collection(target).save(os.path.join(path, INDEX_FILENAME))
+    return target
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NumPy exact-search vector store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="copy a Chroma store (no re-embedding)")
+    export.add_argument("--from", dest="source", default="chroma_db", help="Chroma persist directory")
+    export.add_argument("--to", dest="target", default="numpy_store")
+    export.add_argument("--dtype", choices=DTYPES, default="float32")
+    args = parser.parse_args()
+
+    import chromadb
+    source = chromadb.PersistentClient(path=os.path.realpath(args.source)).get_collection("langchain")
+    exported = export_collection(source, args.target, args.dtype)
+    size = sum(os.path.getsize(os.path.join(args.target, f)) for f in os.listdir(args.target))
+    print(f"✅ Exported {exported.count()} records from '{args.source}' to '{args.target}' "
+          f"({args.dtype}, {size / 1e6:.2f} MB)")
@@ -0,0 +1,209 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from utils.tracing import span
+
+# Words that do not change what a drug question retrieves
+STOPWORDS = {
+    "a", "an", "and", "are", "about", "can", "do", "does", "for", "how", "i",
+    "in", "is", "it", "me", "my", "of", "on", "or", "should", "tell", "the",
+    "to", "what", "whats", "when", "which", "with", "you",
+}
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and stopwords, and sort the remaining terms.
+
+    "metformin side effects" and "What are the side effects of metformin?"
+    both become "effects metformin side".
+    """
+    terms = re.findall(r"[a-z0-9]+", query.lower())
+    kept = [t for t in terms if t not in STOPWORDS] or terms
+    return " ".join(sorted(set(kept)))
+
+
+class RetrievalCache:
+    """
+    Two-level cache in front of the Chroma retriever
+
+    Level 1 maps query text to its embedding, so sentence-transformers runs
+    once per distinct query. Level 2 maps the normalized query (plus k and
+    threshold) to its top-k documents; with `similarity_threshold` set, a
+    query whose embedding is close enough to a cached one reuses its results.
+    Both levels are bounded LRUs. Everything is dropped when the collection
+    fingerprint (chunk ids + content hashes, plus watched file mtimes) changes.
+    """
+
+    def __init__(self,
+                 vectordb_factory: Callable,
+                 max_embeddings: int = 1024,
+                 max_results: int = 256,
+                 similarity_threshold: Optional[float] = None,
+                 check_interval: float = 30.0,
+                 watch_files: Optional[Callable[[], List[str]]] = None,
+                 on_invalidate: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            vectordb_factory: Callable returning the (shared) Chroma store
+            max_embeddings: Capacity of the query -> embedding level
+            max_results: Capacity of the normalized query -> documents level
+            similarity_threshold: Cosine similarity above which a cached result
+                is reused for a different query (None disables it)
+            check_interval: Seconds between collection fingerprint checks
+            watch_files: Callable returning extra files whose mtimes are part
+                of the fingerprint (e.g. indexes derived from the collection)
+            on_invalidate: Called whenever cached results are dropped
+        """
+        self.vectordb_factory = vectordb_factory
+        self.max_embeddings = max_embeddings
+        self.max_results = max_results
+        self.similarity_threshold = similarity_threshold
+        self.check_interval = check_interval
+        self.watch_files = watch_files
+        self.on_invalidate = on_invalidate
+        self._embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._results: "OrderedDict[Tuple, Tuple[np.ndarray, List[Document]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self.counters = {"embedding_hits": 0, "embedding_misses": 0,
+                         "result_hits": 0, "semantic_hits": 0, "result_misses": 0,
+                         "invalidations": 0}
+
+    def _collection_fingerprint(self, vectordb) -> Tuple:
+        # Ingestion stamps every chunk with a content_hash, so an upsert that
+        # keeps the count (or a swap to a rebuilt store) still changes this
+        stored = vectordb._collection.get(include=["metadatas"])
+        digest = hashlib.sha1()
+        for doc_id, metadata in sorted(zip(stored["ids"], stored["metadatas"])):
+            digest.update(f"{doc_id}:{(metadata or {}).get('content_hash', '')}\n".encode("utf-8"))
+        files = self.watch_files() if self.watch_files is not None else []
+        mtimes = tuple(os.path.getmtime(f) if os.path.exists(f) else None for f in files)
+        return (len(stored["ids"]), digest.hexdigest()) + mtimes
+
+    def _check_fresh(self, vectordb) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval and self._fingerprint is not None:
+            return
+        self._checked_at = now
+        fingerprint = self._collection_fingerprint(vectordb)
+        if self._fingerprint is not None and fingerprint != self._fingerprint:
+            self.invalidate()
+        self._fingerprint = fingerprint
+
+    def invalidate(self) -> None:
+        """Drop cached results (embeddings stay valid: they depend only on the model)."""
+        with self._lock:
+            self._results.clear()
+            self._checked_at = 0.0
+            self.counters["invalidations"] += 1
+        if self.on_invalidate is not None:
+            self.on_invalidate()
+
+    def embed(self, query: str, embedding_fn: Callable[[str], List[float]]) -> np.ndarray:
+        """Return the embedding of query, computing it at most once."""
+        key = query.strip()
+        with self._lock:
+            vector = self._embeddings.get(key)
+            if vector is not None:
+                self._embeddings.move_to_end(key)
+                self.counters["embedding_hits"] += 1
+                return vector
+        with span("embedding", "embedding", input_chars=len(key)):
+            vector = np.asarray(embedding_fn(key), dtype=np.float32)
+        with self._lock:
+            self.counters["embedding_misses"] += 1
+            self._embeddings[key] = vector
+            while len(self._embeddings) > self.max_embeddings:
+                self._embeddings.popitem(last=False)
+        return vector
+
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _lookup(self, key: Tuple) -> Optional[List[Document]]:
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                return None
+            self._results.move_to_end(key)
+            self.counters["result_hits"] += 1
+            return list(entry[1])
+
+    def _lookup_similar(self, key: Tuple, unit: np.ndarray) -> Optional[List[Document]]:
+        with self._lock:
+            best_key, best_sim = None, self.similarity_threshold
+            for other_key, (other_vector, _) in self._results.items():
+                if other_key[1:] != key[1:]:
+                    continue
+                sim = float(np.dot(unit, other_vector))
+                if sim >= best_sim:
+                    best_key, best_sim = other_key, sim
+            if best_key is None:
+                return None
+            self._results.move_to_end(best_key)
+            self.counters["semantic_hits"] += 1
+            return list(self._results[best_key][1])
+
+    def check_fresh(self) -> None:
+        """Invalidate if the collection changed (rate limited by check_interval)."""
+        self._check_fresh(self.vectordb_factory())
+
+    def fingerprint(self) -> Tuple:
+        """Current collection fingerprint (chunk count, content digest, watched file mtimes)."""
+        self.check_fresh()
+        return self._fingerprint
+
+    def search(self, query: str, k: int = 2, threshold: float = 0.0) -> List[Document]:
+        """Top-k documents for query whose relevance score is >= threshold."""
+        self._check_fresh(self.vectordb_factory())
+        # Fetched again: invalidation may have reopened a swapped store
+        vectordb = self.vectordb_factory()
+
+        key = (normalize_query(query), k, threshold)
+        # An exact hit needs no embedding; only the similarity fallback and a miss do
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        vector = self.embed(query, vectordb.embeddings.embed_query)
+        unit = self._unit(vector)
+        if self.similarity_threshold is not None:
+            cached = self._lookup_similar(key, unit)
+            if cached is not None:
+                return cached
+
+        with span("chroma search", "vector", k=k) as attributes:
+            scored = vectordb.similarity_search_by_vector_with_relevance_scores(vector.tolist(), k=k)
+            attributes["results"] = len(scored)
+        relevance = vectordb._select_relevance_score_fn()
+        docs = [doc for doc, distance in scored if relevance(distance) >= threshold]
+
+        with self._lock:
+            self.counters["result_misses"] += 1
+            self._results[key] = (unit, docs)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return list(docs)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current sizes of both levels."""
+        with self._lock:
+            lookups = (self.counters["result_hits"] + self.counters["semantic_hits"]
+                       + self.counters["result_misses"])
+            hits = self.counters["result_hits"] + self.counters["semantic_hits"]
+            return {
+                **self.counters,
+                "result_hit_rate": hits / lookups if lookups else 0.0,
+                "embeddings_cached": len(self._embeddings),
+                "results_cached": len(self._results),
+            }
@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from tools.clinical_trials_api import ClinicalTrialsAPI, IncompleteResults
+
+# Field projection requested from /studies: only what the tool shows or searches
+MIRROR_FIELDS = [
+    "NCTId", "BriefTitle", "OverallStatus", "Phase", "Condition",
+    "InterventionName", "LastUpdatePostDate",
+]
+
+# Words that say "find trials" rather than what the trials are about
+QUERY_NOISE = {
+    "a", "an", "and", "any", "are", "clinical", "enrolling", "for", "in", "not", "of", "on", "ongoing",
+    "or", "recruiting", "studies", "study", "the", "there", "trial", "trials", "what", "with", "yet",
+}
+
+# Status words in a question and the overallStatus filter they mean; first match wins
+STATUS_PHRASES = [
+    (r"\bnot yet recruiting\b", "NOT_YET_RECRUITING"),
+    (r"\bnot recruiting\b", "ACTIVE_NOT_RECRUITING"),
+    (r"\b(?:recruiting|enrolling)\b", "RECRUITING"),
+    (r"\bongoing\b", "RECRUITING,ACTIVE_NOT_RECRUITING,ENROLLING_BY_INVITATION"),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS studies (
+    nct_id TEXT PRIMARY KEY,
+    title TEXT,
+    status TEXT,
+    phases TEXT,
+    conditions TEXT,
+    interventions TEXT,
+    last_update TEXT,
+    body TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS studies_fts USING fts5(
+    nct_id UNINDEXED, title, conditions, interventions,
+    content='studies', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS studies_ai AFTER INSERT ON studies BEGIN
+    INSERT INTO studies_fts(rowid, nct_id, title, conditions, interventions)
+    VALUES (new.rowid, new.nct_id, new.title, new.conditions, new.interventions);
+END;
+CREATE TRIGGER IF NOT EXISTS studies_ad AFTER DELETE ON studies BEGIN
+    INSERT INTO studies_fts(studies_fts, rowid, nct_id, title, conditions, interventions)
+    VALUES ('delete', old.rowid, old.nct_id, old.title, old.conditions, old.interventions);
+END;
+CREATE TRIGGER IF NOT EXISTS studies_au AFTER UPDATE ON studies BEGIN
+    INSERT INTO studies_fts(studies_fts, rowid, nct_id, title, conditions, interventions)
+    VALUES ('delete', old.rowid, old.nct_id, old.title, old.conditions, old.interventions);
+    INSERT INTO studies_fts(rowid, nct_id, title, conditions, interventions)
+    VALUES (new.rowid, new.nct_id, new.title, new.conditions, new.interventions);
+END;
+CREATE TABLE IF NOT EXISTS sync_state (
+    sync_key TEXT PRIMARY KEY,
+    last_update TEXT,
+    synced_at REAL,
+    studies INTEGER
+);
+"""
+
+
+def _study_row(study: Dict) -> Optional[tuple]:
+    protocol = study.get("protocolSection", {})
+    ident = protocol.get("identificationModule", {})
+    nct_id = ident.get("nctId")
+    if not nct_id:
+        return None
+    status = protocol.get("statusModule", {})
+    return (
+        nct_id,
+        ident.get("briefTitle", ""),
+        status.get("overallStatus", ""),
+        " ".join(protocol.get("designModule", {}).get("phases", [])),
+        " ".join(protocol.get("conditionsModule", {}).get("conditions", [])),
+        " ".join(i.get("name", "") for i in protocol.get("armsInterventionsModule", {}).get("interventions", [])),
+        status.get("lastUpdatePostDateStruct", {}).get("date", ""),
+        json.dumps(study),
+    )
+
+
+class TrialsMirror:
+    """
+    Local SQLite (FTS5) mirror of ClinicalTrials.gov study records
+
+    Holds the field-projected records of the studies we care about, keyed by
+    NCT ID, with a full-text index over title, conditions and interventions.
+    `sync` refreshes incrementally by LastUpdatePostDate per sync key;
+    `search` answers in the same {'studies': [...]} shape as search_studies.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: SQLite file holding the mirror (created if missing)
+        """
+        self.db_path = db_path
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def upsert_studies(self, studies: Iterable[Dict]) -> int:
+        rows = [row for row in map(_study_row, studies) if row]
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO studies (nct_id, title, status, phases, conditions, interventions, last_update, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(nct_id) DO UPDATE SET title=excluded.title, status=excluded.status, "
+                "phases=excluded.phases, conditions=excluded.conditions, interventions=excluded.interventions, "
+                "last_update=excluded.last_update, body=excluded.body",
+                rows,
+            )
+            self._db.commit()
+        return len(rows)
+
+    def load_dump(self, path: str) -> int:
+        """Import a recorded dump: a JSON list of studies or a /studies response."""
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        studies = payload.get("studies", []) if isinstance(payload, dict) else payload
+        return self.upsert_studies(studies)
+
+    def sync(self, api: ClinicalTrialsAPI, query_term: Optional[str] = None, condition: Optional[str] = None,
+             max_results: Optional[int] = None, full: bool = False) -> Dict:
+        """
+        Mirror the studies matching a query, fetching only records updated since the last sync
+
+        Records are requested oldest update first, so a run cut short by
+        max_results still covers everything up to its newest record. A run
+        that hits a failed page keeps what it fetched but not the watermark.
+
+        Args:
+            api: Client used for the paginated, field-projected /studies calls
+            query_term: Free text search term
+            condition: Medical condition
+            max_results: Optional cap on records fetched in this run
+            full: Ignore the stored watermark and re-fetch everything
+
+        Returns:
+            Dictionary with the sync key, watermark used, records written and
+            whether the fetch completed
+        """
+        sync_key = json.dumps({"term": query_term, "cond": condition}, sort_keys=True)
+        row = self._db.execute("SELECT last_update FROM sync_state WHERE sync_key = ?", (sync_key,)).fetchone()
+        since = None if full or not row else row[0]
+
+        search_params = {"query_term": query_term, "condition": condition,
+                         "page_size": 1000, "fields": MIRROR_FIELDS, "sort": "LastUpdatePostDate:asc"}
+        if since:
+            search_params["advanced_filter"] = f"AREA[LastUpdatePostDate]RANGE[{since},MAX]"
+        error = None
+        try:
+            studies = api.paginate_all_results(search_params, max_results=max_results, strict=True)
+        except IncompleteResults as e:
+            studies, error = e.studies, str(e)
+        written = self.upsert_studies(studies)
+
+        dates = [s.get("protocolSection", {}).get("statusModule", {})
+                 .get("lastUpdatePostDateStruct", {}).get("date", "") for s in studies]
+        watermark = since if error else max([d for d in dates if d] + ([since] if since else []), default=None)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state (sync_key, last_update, synced_at, studies) VALUES (?, ?, ?, ?)",
+                (sync_key, watermark, time.time(), written),
+            )
+            self._db.commit()
+        result = {"sync_key": sync_key, "since": since, "written": written, "watermark": watermark,
+                  "complete": error is None}
+        if error:
+            result["error"] = error
+        return result
+
+    @staticmethod
+    def fts_query(query: str) -> Optional[str]:
+        terms = [t for t in re.findall(r"[a-z0-9]+", query.lower()) if t not in QUERY_NOISE and len(t) > 1]
+        # Every remaining term must match; anything looser falls through to the live API
+        return " ".join(f'"{t}"' for t in terms) or None
+
+    @staticmethod
+    def query_status(query: str) -> Optional[str]:
+        """The filter.overallStatus value a question asks for, e.g. "recruiting" -> RECRUITING."""
+        text = query.lower()
+        return next((status for pattern, status in STATUS_PHRASES if re.search(pattern, text)), None)
+
+    def search(self, query: str, limit: int = 5, status: Optional[str] = None) -> Dict:
+        """
+        Full-text search, best BM25 match first, in /studies response shape
+
+        status is a comma-separated overallStatus list; when not given it is
+        taken from the question's wording (see query_status).
+        """
+        status = status or self.query_status(query)
+        match = self.fts_query(query)
+        if match is None:
+            return {"studies": []}
+        sql = ("SELECT s.body FROM studies_fts JOIN studies s ON s.rowid = studies_fts.rowid "
+               "WHERE studies_fts MATCH ?")
+        params: List = [match]
+        if status:
+            statuses = status.split(",")
+            sql += f" AND s.status IN ({', '.join('?' * len(statuses))})"
+            params.extend(statuses)
+        sql += " ORDER BY bm25(studies_fts) LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return {"studies": [json.loads(body) for (body,) in rows], "source": "mirror"}
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM studies").fetchone()[0]
+
+
+def open_default_mirror() -> Optional[TrialsMirror]:
+    """The mirror at CT_MIRROR_PATH, if that file exists."""
+    path = os.getenv("CT_MIRROR_PATH", "data/ct_mirror.sqlite3")
+    return TrialsMirror(path) if os.path.exists(path) else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mirror of ClinicalTrials.gov studies")
+    parser.add_argument("--db", default=os.getenv("CT_MIRROR_PATH", "data/ct_mirror.sqlite3"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync_cmd = sub.add_parser("sync", help="mirror studies for search terms (incremental)")
+    sync_cmd.add_argument("--term", action="append", default=[], help="query term, repeatable")
+    sync_cmd.add_argument("--condition", action="append", default=[], help="condition, repeatable")
+    sync_cmd.add_argument("--max-results", type=int)
+    sync_cmd.add_argument("--full", action="store_true", help="ignore watermarks and re-fetch")
+    sync_cmd.add_argument("--base-url", default="https://clinicaltrials.gov/api/v2")
+    dump_cmd = sub.add_parser("load-dump", help="import a recorded JSON dump")
+    dump_cmd.add_argument("path")
+    search_cmd = sub.add_parser("search", help="query the local index")
+    search_cmd.add_argument("query")
+    search_cmd.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+
+    mirror = TrialsMirror(args.db)
+    if args.command == "sync":
+        api = ClinicalTrialsAPI(base_url=args.base_url)
+        for term in args.term:
+            print(mirror.sync(api, query_term=term, max_results=args.max_results, full=args.full))
+        for condition in args.condition:
+            print(mirror.sync(api, condition=condition, max_results=args.max_results, full=args.full))
+        print(f"📚 Studies in mirror: {mirror.count()}")
+    elif args.command == "load-dump":
+        print(f"Imported {mirror.load_dump(args.path)} studies; mirror now holds {mirror.count()}")
+    else:
+        for study in mirror.search(args.query, limit=args.limit)["studies"]:
+            ident = study["protocolSection"]["identificationModule"]
+            print(f"{ident['nctId']}  {ident.get('briefTitle', '')}")
@@ -0,0 +1,50 @@
+"""Web search fallback tool (DuckDuckGo) with failure handling.
+
+Identical queries in flight share one request (SingleFlight). The request
+goes through `web_dependency` (circuit breaker, WEB_DEADLINE_S deadline,
+hedged after WEB_HEDGE_AFTER_S); when it fails, the last good results for
+that query are served, marked as such, or the tool reports itself
+unavailable.
+"""
+import os
+from typing import Callable
+
+from langchain_community.tools import DuckDuckGoSearchRun
+
+from tools.clinical_trials_api import ResponseCache
+from utils.resilience import Dependency
+from utils.single_flight import SingleFlight
+
+web_search_flight = SingleFlight("WebSearch")
+web_dependency = Dependency(
+    "WebSearch",
+    timeout_s=float(os.getenv("WEB_DEADLINE_S", "8")),
+    hedge_after_s=float(os.getenv("WEB_HEDGE_AFTER_S", "3")),
+)
+# Last good results per query; only read while the search is failing
+last_results = ResponseCache(max_entries=256)
+
+
+def resilient_search(search: Callable[[str], str], query: str) -> str:
+    """search(query) coalesced with identical in-flight queries and guarded by web_dependency"""
+    params = {"query": query.strip()}
+
+    def fetch() -> str:
+        result = search(query)
+        last_results.set("web_search", params, result)
+        return result
+
+    def fallback():
+        stale = last_results.get_stale("web_search", params)
+        if stale is None:
+            return None
+        return f"(Web search is not responding; results from {int(stale[1] // 60)} minutes ago)\n{stale[0]}"
+
+    return web_search_flight.do(params["query"], web_dependency.call, fetch, None, fallback)
+
+
+class ResilientSearchRun(DuckDuckGoSearchRun):
+    """DuckDuckGo search behind resilient_search."""
+
+    def _run(self, query: str, run_manager=None) -> str:
+        return resilient_search(lambda q: super(ResilientSearchRun, self)._run(q, run_manager), query)
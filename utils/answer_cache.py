@@ -0,0 +1,117 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+# Answers built only from the local MedlinePlus index change when the index
+# does (which is part of the key); live tools go stale much faster.
+LOCAL_TOOLS = {"DrugInfo"}
+DEFAULT_LOCAL_TTL = float(os.getenv("ANSWER_CACHE_LOCAL_TTL", str(7 * 24 * 60 * 60)))
+DEFAULT_LIVE_TTL = float(os.getenv("ANSWER_CACHE_LIVE_TTL", str(30 * 60)))
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace; word order is kept."""
+    return " ".join(re.findall(r"[a-z0-9]+", question.lower()))
+
+
+class AnswerCache:
+    """
+    Cache of final agent answers keyed by (normalized question, model, index version)
+
+    Entries expire after `local_ttl` when only local tools were used and after
+    `live_ttl` when ClinicalTrialsSearch or WebSearch contributed. Bounded LRU
+    in memory, optionally persisted to SQLite. Tracks the LLM tokens the
+    original run spent so hits can report tokens saved.
+    """
+
+    def __init__(self,
+                 max_entries: int = 1024,
+                 local_ttl: float = DEFAULT_LOCAL_TTL,
+                 live_ttl: float = DEFAULT_LIVE_TTL,
+                 db_path: Optional[str] = None):
+        """
+        Args:
+            max_entries: Maximum number of answers kept in memory
+            local_ttl: TTL in seconds for answers that used only local tools
+            live_ttl: TTL in seconds for answers that used live tools
+            db_path: Optional SQLite file to persist answers across restarts
+        """
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.live_ttl = live_ttl
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self._entries: "OrderedDict[str, tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS answers '
+                '(key TEXT PRIMARY KEY, expires_at REAL, body TEXT)'
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(question: str, model_name: str, index_version: str) -> str:
+        return json.dumps([normalize_question(question), model_name or "", index_version])
+
+    def ttl_for(self, tools_used: Iterable[str]) -> float:
+        return self.local_ttl if set(tools_used) <= LOCAL_TOOLS else self.live_ttl
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a fresh cached entry ({answer, tools, tokens, created_at}) or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute('SELECT expires_at, body FROM answers WHERE key = ?', (key,)).fetchone()
+                if row:
+                    entry = (row[0], json.loads(row[1]))
+                    self._entries[key] = entry
+            if entry is None or entry[0] <= now:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.tokens_saved += entry[1].get("tokens", 0)
+            return entry[1]
+
+    def put(self, key: str, answer: str, tools_used: Iterable[str], tokens: int = 0) -> None:
+        tools_used = sorted(set(tools_used))
+        expires_at = time.time() + self.ttl_for(tools_used)
+        value = {"answer": answer, "tools": tools_used, "tokens": tokens, "created_at": time.time()}
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO answers (key, expires_at, body) VALUES (?, ?, ?)',
+                                 (key, expires_at, json.dumps(value)))
+                self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM answers')
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "llm_tokens_saved": self.tokens_saved,
+                "size": len(self._entries),
+            }
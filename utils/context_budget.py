@@ -0,0 +1,149 @@
+"""Token budget for tool observations before they reach the model.
+
+Every ReAct step resends the whole conversation, so a long monograph or web
+page returned early is paid for on every later turn. The middleware trims
+each observation to `observation_tokens`, keeping the sentences that best
+match the question and tool input, drops sentences the conversation has
+already seen, and stops adding context once the observations of one
+conversation reach `conversation_tokens`. Tokens removed are recorded on
+the ToolMessage, in the active trace and in the Prometheus metrics.
+"""
+import os
+import re
+from typing import Dict, List, Set, Tuple
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import HumanMessage, ToolMessage
+
+from tools.hybrid_index import tokenize
+from utils.tokens import estimate_tokens
+from utils.tracing import span
+
+CONTEXT_OBSERVATION_TOKENS = int(os.getenv("CONTEXT_OBSERVATION_TOKENS", "400"))
+CONTEXT_CONVERSATION_TOKENS = int(os.getenv("CONTEXT_CONVERSATION_TOKENS", "1500"))
+# Below this many tokens left, an observation is replaced by a short notice
+MIN_OBSERVATION_TOKENS = 40
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _terms(text: str) -> Set[str]:
+    # Crude plural folding so "effects" matches "effect"
+    return {t[:-1] if len(t) > 3 and t.endswith("s") else t for t in tokenize(text)}
+
+
+def _fingerprint(sentence: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", sentence.lower()))
+
+
+def _units(text: str) -> List[Tuple[int, int, str]]:
+    """(block, line, sentence) for every sentence; blocks are separated by blank lines."""
+    units = []
+    for b, block in enumerate(re.split(r"\n\s*\n", text.strip())):
+        for l, line in enumerate(block.splitlines()):
+            units.extend((b, l, s) for s in _SENTENCE_END.split(line.strip()) if s)
+    return units
+
+
+def _assemble(units: List[Tuple[int, int, str]]) -> str:
+    blocks: Dict[int, Dict[int, List[str]]] = {}
+    for b, l, sentence in units:
+        blocks.setdefault(b, {}).setdefault(l, []).append(sentence)
+    return "\n\n".join("\n".join(" ".join(lines[l]) for l in sorted(lines))
+                       for _, lines in sorted(blocks.items()))
+
+
+def seen_sentences(messages) -> Set[str]:
+    return {_fingerprint(s) for m in messages if isinstance(m, ToolMessage)
+            for _, _, s in _units(str(m.content))}
+
+
+def trim_observation(text: str, query: str, max_tokens: int, seen: Set[str] = frozenset()) -> str:
+    """
+    Keep the sentences of text most relevant to query, within max_tokens
+
+    Sentences already in `seen` are dropped. "Drug: ..." header lines are
+    always kept, and a sentence also scores for query terms in the section
+    label of its line (e.g. "Side Effects:"). Kept sentences stay in their
+    original order.
+    """
+    query_terms = _terms(query)
+    units = _units(text)
+    header_terms: Dict[Tuple[int, int], Set[str]] = {}
+    for b, l, sentence in units:
+        if (b, l) not in header_terms:
+            label = sentence.split(":", 1)[0] if ":" in sentence[:40] else ""
+            header_terms[(b, l)] = _terms(label)
+    units = [u for u in units if _fingerprint(u[2]) not in seen]
+
+    def score(index: int) -> float:
+        b, l, sentence = units[index]
+        if sentence.startswith("Drug:"):
+            return float("inf")
+        own = len(query_terms & _terms(sentence))
+        section = len(query_terms & header_terms[(b, l)])
+        # Ties go to earlier sentences
+        return own + 2 * section - index * 1e-6
+
+    kept, used = set(), 0
+    for index in sorted(range(len(units)), key=score, reverse=True):
+        cost = estimate_tokens(units[index][2])
+        if used + cost > max_tokens:
+            continue
+        kept.add(index)
+        used += cost
+    return _assemble([units[i] for i in sorted(kept)])
+
+
+class ContextBudgetMiddleware(AgentMiddleware):
+    """Per-observation and per-conversation token caps for tool results."""
+
+    def __init__(self,
+                 observation_tokens: int = CONTEXT_OBSERVATION_TOKENS,
+                 conversation_tokens: int = CONTEXT_CONVERSATION_TOKENS):
+        """
+        Args:
+            observation_tokens: Maximum tokens kept from one tool result
+            conversation_tokens: Maximum tokens of tool results in one conversation
+        """
+        super().__init__()
+        self.observation_tokens = observation_tokens
+        self.conversation_tokens = conversation_tokens
+
+    def _budget(self, request, message):
+        if not isinstance(message, ToolMessage) or message.status == "error":
+            return message
+        text = str(message.content)
+        tokens_in = estimate_tokens(text)
+        messages = request.state.get("messages", []) if isinstance(request.state, dict) else []
+        spent = sum(estimate_tokens(str(m.content)) for m in messages if isinstance(m, ToolMessage))
+        budget = min(self.observation_tokens, self.conversation_tokens - spent)
+
+        with span("context budget", "budget", tool=message.name) as attributes:
+            if budget < MIN_OBSERVATION_TOKENS:
+                trimmed = (f"{message.name} returned more results, but the context budget for this question "
+                           f"is used up. Answer with the information already gathered.")
+            else:
+                question = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+                query = " ".join([question, *map(str, request.tool_call.get("args", {}).values())])
+                trimmed = trim_observation(text, query, budget, seen_sentences(messages))
+                if not trimmed:
+                    trimmed = f"Same results as an earlier {message.name} call; see above."
+            tokens_out = estimate_tokens(trimmed)
+            attributes.update(tokens_in=tokens_in, tokens_out=tokens_out,
+                              tokens_saved=max(0, tokens_in - tokens_out))
+
+        if tokens_out >= tokens_in:
+            return message
+        return message.model_copy(update={
+            "content": trimmed,
+            "response_metadata": {**message.response_metadata,
+                                  "context_budget": {"tokens_in": tokens_in, "tokens_out": tokens_out,
+                                                     "tokens_saved": tokens_in - tokens_out}},
+        })
+
+    def wrap_tool_call(self, request, handler):
+        return self._budget(request, handler(request))
+
+    async def awrap_tool_call(self, request, handler):
+        return self._budget(request, await handler(request))
@@ -0,0 +1,157 @@
+"""Embedding backends for the sentence-transformers model.
+
+`torch` runs the model through sentence-transformers (HuggingFaceEmbeddings),
+as before. `onnx` and `onnx-int8` run the exported ONNX graph of the same
+model with ONNX Runtime and the Rust tokenizer, so torch is never imported;
+`onnx-int8` uses the dynamically quantized graph. All backends produce the
+same 384-d, L2-normalized vectors, so an index built with one can be
+queried with another (see benchmarks/embeddings.py for the recall cost).
+"""
+import os
+from typing import Callable, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.runtime_profile import setting
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBEDDING_BACKEND = setting("EMBEDDING_BACKEND", "torch")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 = library default
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+
+# Graphs published in the sentence-transformers model repos
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",
+    "onnx-int8": "onnx/model_quint8_avx2.onnx",
+}
+
+
+def _model_file(model_name: str, filename: str) -> str:
+    """Path of a model file, from a local model directory or the Hugging Face cache."""
+    if os.path.isdir(model_name):
+        return os.path.join(model_name, filename)
+    from huggingface_hub import hf_hub_download
+    repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    return hf_hub_download(repo_id, filename)
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Mean-pooled, normalized sentence embeddings from an ONNX transformer graph
+
+    Texts are sorted by length and encoded in batches of `batch_size`, so a
+    batch is padded only to its own longest text.
+    """
+
+    def __init__(self,
+                 model_name: str,
+                 onnx_file: str = ONNX_FILES["onnx"],
+                 threads: int = 0,
+                 batch_size: int = 32,
+                 max_length: int = 256):
+        """
+        Args:
+            model_name: Hub model id (e.g. all-MiniLM-L6-v2) or a local directory
+            onnx_file: Graph to load, relative to the model
+            threads: ONNX Runtime intra-op threads (0 = one per core)
+            batch_size: Texts per inference call
+            max_length: Token limit per text (the model's max_seq_length)
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx embedding backends need onnxruntime: pip install onnxruntime") from e
+        from tokenizers import Tokenizer
+
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(_model_file(model_name, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(_model_file(model_name, onnx_file), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        mask = feeds["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        encoded = np.concatenate([
+            self._encode([texts[i] for i in order[start:start + self.batch_size]])
+            for start in range(0, len(order), self.batch_size)
+        ])
+        vectors = np.empty_like(encoded)
+        vectors[order] = encoded
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+
+class LazyEmbeddings(Embeddings):
+    """Embeddings that load the real model on the first embed call.
+
+    Given to the vector stores so that opening one (freshness checks,
+    drug-name lookups) never imports torch / ONNX Runtime.
+    """
+
+    def __init__(self, loader: Callable[[], Embeddings]):
+        self.loader = loader
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.loader().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.loader().embed_query(text)
+
+
+def load_embeddings(model_name: str,
+                    backend: Optional[str] = None,
+                    threads: Optional[int] = None,
+                    batch_size: Optional[int] = None) -> Embeddings:
+    """
+    Build the embedding model for a backend
+
+    Args:
+        model_name: sentence-transformers model id or local directory
+        backend: torch, onnx or onnx-int8 (default EMBEDDING_BACKEND)
+        threads: CPU threads for inference (default EMBEDDING_THREADS)
+        batch_size: Texts per batch when embedding documents (default EMBEDDING_BATCH_SIZE)
+
+    Returns:
+        A LangChain Embeddings instance
+    """
+    backend = backend or EMBEDDING_BACKEND
+    threads = EMBEDDING_THREADS if threads is None else threads
+    batch_size = batch_size or EMBEDDING_BATCH_SIZE
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    if backend == "torch":
+        import torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+        # Streamlit's file watcher walks every module's __path__; torch.classes raises on it
+        torch.classes.__path__ = []
+        if threads:
+            torch.set_num_threads(threads)
+        return HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"batch_size": batch_size})
+
+    onnx_file = os.getenv("EMBEDDING_ONNX_FILE") or ONNX_FILES[backend]
+    return OnnxEmbeddings(model_name, onnx_file=onnx_file, threads=threads, batch_size=batch_size)
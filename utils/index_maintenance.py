@@ -0,0 +1,345 @@
+"""Maintenance and tuning for the Chroma vector store.
+
+    python -m utils.index_maintenance report  [--persist-dir chroma_db] [--queries benchmarks/queries.json]
+    python -m utils.index_maintenance rebuild [--m 16] [--ef-construction 200] [--ef-search 100] [--swap]
+    python -m utils.index_maintenance tune --ef-search 64
+
+`report` prints the on-disk size, the HNSW parameters, duplicate counts and
+recall@k / latency of the HNSW index against exact (brute-force) search.
+`rebuild` copies the stored vectors (nothing is re-embedded) into a fresh,
+deduplicated and compacted store with the given HNSW parameters, checks it,
+and with --swap points persist_dir at it. persist_dir becomes a symlink to
+a versioned sibling directory ("chroma_db.20260101-120000"), replaced with
+an atomic rename; running apps notice the new hybrid index file and reopen
+the store (see `resources.reload_if_swapped`).
+
+Chroma keeps one system, with its SQLite connections, per path for the life
+of a process. Every command therefore opens stores in a short-lived child
+process, so nothing stays open once it returns (the rebuilt store can be
+vacuumed, and the calling process's own stores are untouched).
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tools.hybrid_index import INDEX_FILENAME, HybridIndex
+from utils.resources import CHROMA_DIR
+
+# langchain_chroma's default collection name
+COLLECTION_NAME = "langchain"
+ADD_BATCH_SIZE = 1000
+
+
+def _client(persist_dir: str):
+    import chromadb
+    return chromadb.PersistentClient(path=os.path.realpath(persist_dir))
+
+
+def _isolated(fn, *args):
+    """fn(*args) in a fresh child process; its Chroma clients close when it exits."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def directory_size(persist_dir: str) -> Dict[str, int]:
+    """Bytes per top-level entry (sqlite file, segment directories) of persist_dir."""
+    root = os.path.realpath(persist_dir)
+    sizes = {}
+    for entry in sorted(os.listdir(root)):
+        path = os.path.join(root, entry)
+        if os.path.isdir(path):
+            sizes[entry] = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+        else:
+            sizes[entry] = os.path.getsize(path)
+    return sizes
+
+
+def load_all(collection) -> Dict:
+    """ids, documents, metadatas and embeddings of every stored record."""
+    stored = collection.get(include=["documents", "metadatas", "embeddings"])
+    stored["embeddings"] = np.asarray(stored["embeddings"], dtype=np.float32)
+    stored["metadatas"] = [m or {} for m in stored["metadatas"]]
+    return stored
+
+
+def duplicate_groups(stored: Dict) -> List[List[int]]:
+    """Positions of records with identical text, one list per duplicated text.
+
+    The first position of each group is the record to keep: chunked records
+    (with drug_name metadata) win over whole-monograph ones, then the
+    lowest id for a stable choice.
+    """
+    by_hash = defaultdict(list)
+    for i, (text, metadata) in enumerate(zip(stored["documents"], stored["metadatas"])):
+        content_hash = metadata.get("content_hash") or hashlib.sha1(text.encode("utf-8")).hexdigest()
+        by_hash[content_hash].append(i)
+    groups = []
+    for positions in by_hash.values():
+        if len(positions) > 1:
+            positions.sort(key=lambda i: ("drug_name" not in stored["metadatas"][i], stored["ids"][i]))
+            groups.append(positions)
+    return groups
+
+
+def _distances(vectors: np.ndarray, queries: np.ndarray, space: str) -> np.ndarray:
+    if space == "cosine":
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        return 1.0 - queries @ vectors.T
+    if space == "ip":
+        return 1.0 - queries @ vectors.T
+    return (queries ** 2).sum(axis=1, keepdims=True) - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1)
+
+
+def measure_recall(collection, stored: Dict, queries: np.ndarray, k: int) -> Dict:
+    """recall@k and per-query latency of HNSW search against exact search."""
+    space = (collection.configuration.get("hnsw") or {}).get("space", "l2")
+    ids = np.asarray(stored["ids"])
+    k = min(k, len(ids))
+    if not len(queries) or not k:
+        return {"queries": 0, "k": k}
+
+    start = time.perf_counter()
+    distances = _distances(stored["embeddings"], queries, space)
+    exact = ids[np.argsort(distances, axis=1)[:, :k]]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    approximate = collection.query(query_embeddings=queries, n_results=k, include=[])["ids"]
+    hnsw_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    hits = sum(len(set(a) & set(e)) for a, e in zip(approximate, exact))
+    return {
+        "queries": len(queries),
+        "k": k,
+        "recall_at_k": round(hits / (k * len(queries)), 4),
+        "hnsw_ms_per_query": round(hnsw_ms, 3),
+        "exact_ms_per_query": round(exact_ms, 3),
+    }
+
+
+def query_vectors(stored: Dict, queries_path: Optional[str], sample: int, seed: int = 0) -> np.ndarray:
+    """Query set: the questions in queries_path embedded with the configured
+    model, or else `sample` stored vectors (no model needed)."""
+    if queries_path:
+        from utils.resources import get_embedding
+        with open(queries_path) as f:
+            corpus = json.load(f)
+        questions = [q["question"] if isinstance(q, dict) else q for q in corpus]
+        return np.asarray(get_embedding().embed_documents(questions), dtype=np.float32)
+    vectors = stored["embeddings"]
+    rng = np.random.default_rng(seed)
+    return vectors[rng.choice(len(vectors), size=min(sample, len(vectors)), replace=False)]
+
+
+def _report(persist_dir: str, queries_path: Optional[str], sample: int, k: int) -> Dict:
+    collection = _client(persist_dir).get_collection(COLLECTION_NAME)
+    stored = load_all(collection)
+    groups = duplicate_groups(stored)
+    sizes = directory_size(persist_dir)
+    return {
+        "persist_dir": persist_dir,
+        "resolved_dir": os.path.realpath(persist_dir),
+        "size_bytes": sum(sizes.values()),
+        "files": sizes,
+        "hnsw": collection.configuration.get("hnsw"),
+        "documents": len(stored["ids"]),
+        "chunked": sum("drug_name" in m for m in stored["metadatas"]),
+        "whole_monograph": sum("drug_name" not in m for m in stored["metadatas"]),
+        "duplicate_groups": len(groups),
+        "duplicate_records": sum(len(g) - 1 for g in groups),
+        "recall": measure_recall(collection, stored, query_vectors(stored, queries_path, sample), k),
+    }
+
+
+def report(persist_dir: str = CHROMA_DIR, queries_path: Optional[str] = None, sample: int = 200,
+           k: int = 5) -> Dict:
+    """Size, HNSW settings, duplicates and recall@k of the store at persist_dir."""
+    return _isolated(_report, persist_dir, queries_path, sample, k)
+
+
+def vacuum(persist_dir: str) -> None:
+    """Reclaim free pages of the store's SQLite file."""
+    with sqlite3.connect(os.path.join(persist_dir, "chroma.sqlite3")) as conn:
+        conn.execute("VACUUM")
+
+
+def rebuild(persist_dir: str = CHROMA_DIR, out_dir: Optional[str] = None, m: int = 16,
+            ef_construction: int = 200, ef_search: int = 100, space: Optional[str] = None,
+            dedupe: bool = True) -> Dict:
+    """
+    Copy the store into a fresh one with new HNSW parameters
+
+    Args:
+        persist_dir: Store to read (left untouched)
+        out_dir: Where to write; default a timestamped sibling of persist_dir
+        m: HNSW max_neighbors (graph degree)
+        ef_construction: Candidate list size while building
+        ef_search: Candidate list size while querying
+        space: Distance function; default keeps the current one
+        dedupe: Drop records whose text is stored more than once
+
+    Returns:
+        out_dir, record counts and the new store's size
+    """
+    out_dir = out_dir or f"{os.path.abspath(persist_dir).rstrip(os.sep)}.{time.strftime('%Y%m%d-%H%M%S')}"
+    if os.path.exists(out_dir):
+        raise FileExistsError(f"{out_dir} already exists")
+
+    count, expected, dropped = _isolated(_copy_store, persist_dir, out_dir, m, ef_construction, ef_search,
+                                         space, dedupe)
+    vacuum(out_dir)
+
+    if count != expected:
+        raise RuntimeError(f"rebuilt store has {count} records, expected {expected}")
+    return {"out_dir": out_dir, "documents": count, "duplicates_removed": dropped,
+            "size_bytes": sum(directory_size(out_dir).values())}
+
+
+def _copy_store(persist_dir: str, out_dir: str, m: int, ef_construction: int, ef_search: int,
+                space: Optional[str], dedupe: bool) -> Tuple[int, int, int]:
+    """(records written, records expected, duplicates dropped)"""
+    source = _client(persist_dir).get_collection(COLLECTION_NAME)
+    space = space or (source.configuration.get("hnsw") or {}).get("space", "l2")
+    stored = load_all(source)
+    dropped = {i for g in duplicate_groups(stored) for i in g[1:]} if dedupe else set()
+    keep = [i for i in range(len(stored["ids"])) if i not in dropped]
+
+    target = _client(out_dir).create_collection(COLLECTION_NAME, configuration={"hnsw": {
+        "space": space, "max_neighbors": m, "ef_construction": ef_construction, "ef_search": ef_search,
+    }})
+    for start in range(0, len(keep), ADD_BATCH_SIZE):
+        batch = keep[start:start + ADD_BATCH_SIZE]
+        target.add(
+            ids=[stored["ids"][i] for i in batch],
+            embeddings=stored["embeddings"][batch],
+            documents=[stored["documents"][i] for i in batch],
+            metadatas=[stored["metadatas"][i] for i in batch],
+        )
+    HybridIndex.from_collection(target).save(os.path.join(out_dir, INDEX_FILENAME))
+    return target.count(), len(keep), len(dropped)
+
+
+def swap(persist_dir: str, new_dir: str) -> Optional[str]:
+    """
+    Point persist_dir at new_dir with an atomic rename of a symlink
+
+    The first swap moves a real persist_dir aside to "<persist_dir>.orig"
+    and replaces it by a symlink; there is a moment between the two renames
+    where persist_dir does not exist. Every later swap is atomic.
+
+    Returns:
+        The directory persist_dir pointed to before, kept for rollback
+    """
+    persist_dir = os.path.abspath(persist_dir).rstrip(os.sep)
+    parent = os.path.dirname(persist_dir)
+    if os.path.dirname(os.path.abspath(new_dir)) != parent:
+        raise ValueError(f"{new_dir} must be a sibling of {persist_dir}")
+    previous = None
+    if os.path.islink(persist_dir):
+        previous = os.path.realpath(persist_dir)
+    elif os.path.isdir(persist_dir):
+        previous = f"{persist_dir}.orig"
+        os.rename(persist_dir, previous)
+    tmp_link = f"{persist_dir}.swap-{os.getpid()}"
+    os.symlink(os.path.basename(os.path.abspath(new_dir)), tmp_link)
+    os.replace(tmp_link, persist_dir)
+    # The hybrid index path resolves through the link; touching it makes running
+    # apps' freshness checks see the change even if the files have equal mtimes
+    index_path = os.path.join(persist_dir, INDEX_FILENAME)
+    if os.path.exists(index_path):
+        os.utime(index_path)
+    return previous
+
+
+def _set_ef_search(persist_dir: str, ef_search: int) -> Dict:
+    collection = _client(persist_dir).get_collection(COLLECTION_NAME)
+    collection.modify(configuration={"hnsw": {"ef_search": ef_search}})
+    return collection.configuration.get("hnsw")
+
+
+def set_ef_search(persist_dir: str, ef_search: int) -> Dict:
+    """Change ef_search in place; unlike M and ef_construction it needs no rebuild."""
+    return _isolated(_set_ef_search, persist_dir, ef_search)
+
+
+def _print_report(stats: Dict) -> None:
+    recall = stats["recall"]
+    print(f"📁 {stats['persist_dir']} -> {stats['resolved_dir']}")
+    print(f"💾 Size: {stats['size_bytes'] / 1e6:.1f} MB")
+    for entry, size in stats["files"].items():
+        print(f"   {entry:<40} {size / 1e6:>8.1f} MB")
+    print(f"⚙️ HNSW: {stats['hnsw']}")
+    print(f"📚 Documents: {stats['documents']} ({stats['chunked']} chunked, "
+          f"{stats['whole_monograph']} whole-monograph)")
+    print(f"🧬 Duplicates: {stats['duplicate_records']} extra records in {stats['duplicate_groups']} groups")
+    if recall.get("queries"):
+        print(f"🎯 recall@{recall['k']} vs exact search: {recall['recall_at_k']:.3f} over {recall['queries']} "
+              f"queries ({recall['hnsw_ms_per_query']:.2f} ms HNSW, {recall['exact_ms_per_query']:.2f} ms exact)")
+
+
+def main(argv=None) -> Dict:
+    parser = argparse.ArgumentParser(description="Chroma index maintenance")
+    parser.add_argument("--persist-dir", default=CHROMA_DIR)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report_parser = commands.add_parser("report", help="size, duplicates and recall@k vs exact search")
+    rebuild_parser = commands.add_parser("rebuild", help="deduplicate, compact and rebuild with new HNSW parameters")
+    for sub in (report_parser, rebuild_parser):
+        sub.add_argument("--queries", help="JSON list of questions to embed (default: sample stored vectors)")
+        sub.add_argument("--sample", type=int, default=200, help="stored vectors used as queries")
+        sub.add_argument("--k", type=int, default=5)
+    rebuild_parser.add_argument("--out-dir", help="default: timestamped sibling of --persist-dir")
+    rebuild_parser.add_argument("--m", type=int, default=16, help="HNSW max_neighbors")
+    rebuild_parser.add_argument("--ef-construction", type=int, default=200)
+    rebuild_parser.add_argument("--ef-search", type=int, default=100)
+    rebuild_parser.add_argument("--space", choices=["l2", "cosine", "ip"], help="default: keep the current one")
+    rebuild_parser.add_argument("--keep-duplicates", action="store_true")
+    rebuild_parser.add_argument("--min-recall", type=float, default=0.0,
+                                help="refuse to swap if the new index scores below this recall@k")
+    rebuild_parser.add_argument("--swap", action="store_true", help="point --persist-dir at the new store")
+    tune_parser = commands.add_parser("tune", help="change ef_search in place")
+    tune_parser.add_argument("--ef-search", type=int, required=True)
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        result = report(args.persist_dir, args.queries, args.sample, args.k)
+        if not args.json:
+            _print_report(result)
+    elif args.command == "rebuild":
+        result = rebuild(args.persist_dir, args.out_dir, args.m, args.ef_construction, args.ef_search,
+                         args.space, dedupe=not args.keep_duplicates)
+        result["report"] = report(result["out_dir"], args.queries, args.sample, args.k)
+        recall = result["report"]["recall"].get("recall_at_k", 1.0)
+        if not args.json:
+            print(f"🔨 Rebuilt into {result['out_dir']}: {result['documents']} documents, "
+                  f"{result['duplicates_removed']} duplicates removed\n")
+            _print_report(result["report"])
+        if args.swap:
+            if recall < args.min_recall:
+                raise SystemExit(f"❌ recall@{args.k} {recall:.3f} below --min-recall {args.min_recall}; not swapped")
+            result["previous_dir"] = swap(args.persist_dir, result["out_dir"])
+            if not args.json:
+                print(f"\n🔁 {args.persist_dir} now points to {result['out_dir']} "
+                      f"(previous store kept at {result['previous_dir']})")
+    else:
+        result = {"hnsw": set_ef_search(args.persist_dir, args.ef_search)}
+        if not args.json:
+            print(f"⚙️ HNSW: {result['hnsw']}")
+    if args.json:
+        print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
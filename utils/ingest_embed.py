@@ -1,34 +1,184 @@
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
 import pandas as pd
-from langchain_chroma import Chroma
-from langchain.docstore.document import Document
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.documents import Document
+
+from tools.hybrid_index import HybridIndex
+from utils import embeddings as embedding_config
+from utils.resources import default_store_dir, get_embedding, get_vectordb, hybrid_index_path
+from utils.tokens import split_by_tokens
+
+
+# CSV column -> section label, in monograph order
+SECTIONS = [("uses", "Uses"), ("side_effects", "Side Effects"), ("precautions", "Precautions")]
+
+# all-MiniLM-L6-v2 truncates input at 256 word pieces
+DEFAULT_MAX_TOKENS = 200
+
 
-def inject_medlineplus_to_chroma(csv_path="./data/medlineplus_drugs.csv", persist_dir="chroma_db"):
-    df = pd.read_csv(csv_path, sep=";")
+def row_to_documents(row: Dict, max_tokens: int = DEFAULT_MAX_TOKENS) -> List[Document]:
+    """Split one monograph into section chunks of at most max_tokens.
 
+    Every chunk carries drug_name, section, chunk_index and parent_id (derived
+    from the source URL) metadata, so retrieval can return just the relevant
+    chunks and optionally reassemble the whole monograph.
+    """
+    # The ids depend only on the source page, so a changed monograph replaces
+    # its previous version instead of being added next to it.
+    parent_id = hashlib.sha1(str(row["url"]).encode("utf-8")).hexdigest()[:20]
     docs = []
-    for _, row in df.iterrows():
-        text = (
-            f"Drug: {row['drug_name']}\n"
-            f"Uses: {row['uses']}\n"
-            f"Side Effects: {row['side_effects']}\n"
-            f"Precautions: {row['precautions']}\n"
-            f"Source: {row['url']}"
-        )
-        docs.append(Document(page_content=text, metadata={"source": row["url"]}))
-
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    vectordb = Chroma.from_documents(docs, embeddings, persist_directory=persist_dir)
-    vectordb.persist()
-    doc_count = len(vectordb)
+    for column, label in SECTIONS:
+        section_text = row.get(column)
+        if not isinstance(section_text, str) or not section_text.strip() or section_text == "Not found":
+            continue
+        for i, piece in enumerate(split_by_tokens(section_text, max_tokens)):
+            text = f"Drug: {row['drug_name']}\n{label}: {piece}"
+            docs.append(Document(
+                id=f"{parent_id}-{column}-{i}",
+                page_content=text,
+                metadata={
+                    "source": row["url"],
+                    "drug_name": row["drug_name"],
+                    "section": label,
+                    "chunk_index": i,
+                    "parent_id": parent_id,
+                    "content_hash": hashlib.sha1(text.encode("utf-8")).hexdigest(),
+                },
+            ))
+    return docs
+
+
+def iter_document_batches(csv_path: str, chunk_size: int, batch_size: int,
+                          max_tokens: int = DEFAULT_MAX_TOKENS) -> Iterator[List[Document]]:
+    """Stream the CSV in chunks and yield section chunks in batches of about
+    batch_size. All chunks of one monograph always land in the same batch."""
+    batch = []
+    for chunk in pd.read_csv(csv_path, sep=";", chunksize=chunk_size):
+        for row in chunk.to_dict("records"):
+            batch.extend(row_to_documents(row, max_tokens))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def select_changed(collection, docs: List[Document]) -> List[Document]:
+    """Drop chunks whose stored content hash is unchanged, and delete stale
+    entries (old chunks, legacy whole-monograph ids) that share a source with the batch."""
+    existing = collection.get(where={"source": {"$in": [d.metadata["source"] for d in docs]}},
+                              include=["metadatas"])
+    stored = dict(zip(existing["ids"], existing["metadatas"]))
+    wanted = {d.id for d in docs}
+    stale = [doc_id for doc_id in stored if doc_id not in wanted]
+    if stale:
+        collection.delete(ids=stale)
+    return [d for d in docs
+            if (stored.get(d.id) or {}).get("content_hash") != d.metadata["content_hash"]]
+
+
+def _embed_texts(texts: List[str]) -> List[List[float]]:
+    # Runs in worker processes too: each worker loads the model once via the registry
+    return get_embedding().embed_documents(texts)
+
+
+def inject_medlineplus_to_chroma(csv_path="./data/medlineplus_drugs.csv", persist_dir: Optional[str] = None,
+                                 chunk_size: int = 1000, batch_size: int = 64, workers: int = 0,
+                                 max_tokens: int = DEFAULT_MAX_TOKENS):
+    """
+    Incrementally upsert the MedlinePlus CSV into the vector store (Chroma or VECTOR_STORE=numpy).
+
+    Args:
+        csv_path: Semicolon-separated CSV produced by utils/scrape.py
+        persist_dir: Store directory (default CHROMA_DIR / NUMPY_STORE_DIR)
+        chunk_size: Rows read from the CSV at a time
+        batch_size: Chunks embedded and upserted per batch
+        workers: Embed batches in this many processes (0 embeds in-process)
+        max_tokens: Token budget per section chunk
+
+    Returns:
+        Chunk counts, elapsed seconds and docs/sec throughput
+    """
+    persist_dir = persist_dir or default_store_dir()
+    collection = get_vectordb(persist_dir)._collection
+
+    start = time.perf_counter()
+    seen = embedded = 0
+    sample = None
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    try:
+        pending = []
+        for docs in iter_document_batches(csv_path, chunk_size, batch_size, max_tokens):
+            seen += len(docs)
+            sample = sample or docs[0]
+            changed = select_changed(collection, docs)
+            if not changed:
+                continue
+            texts = [d.page_content for d in changed]
+            if pool is None:
+                pending.append((changed, _embed_texts(texts)))
+            else:
+                pending.append((changed, pool.submit(_embed_texts, texts)))
+            # Keep at most `workers` batches in flight
+            while pending and (pool is None or len(pending) > workers):
+                embedded += _upsert(collection, *pending.pop(0))
+        while pending:
+            embedded += _upsert(collection, *pending.pop(0))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # Rebuild the BM25 / drug-name index from the final state of the collection
+    HybridIndex.from_collection(collection).save(hybrid_index_path(persist_dir))
+
+    elapsed = time.perf_counter() - start
     print(f"\n✅ Embedding Complete!")
-    print(f"📁 Chroma DB stored at: '{persist_dir}'")
-    print(f"📄 Documents embedded: {doc_count}\n")
-    
-    print("🧾 Sample document:\n")
-    print(docs[0].page_content[:500])
+    print(f"📁 Vector store at: '{persist_dir}'")
+    print(f"📄 Chunks read: {seen} | embedded/updated: {embedded} | unchanged: {seen - embedded}")
+    print(f"⚡ Throughput: {seen / elapsed if elapsed else 0:.1f} docs/sec "
+          f"({embedded / elapsed if elapsed else 0:.1f} embedded docs/sec) in {elapsed:.2f}s")
+    print(f"📚 Documents in collection: {collection.count()}\n")
+
+    if sample is not None:
+        print("🧾 Sample document:\n")
+        print(sample.page_content[:500])
+
+    return {"chunks": seen, "embedded": embedded, "seconds": elapsed,
+            "docs_per_sec": seen / elapsed if elapsed else 0.0}
+
 
+def _upsert(collection, docs: List[Document], embeddings) -> int:
+    if hasattr(embeddings, "result"):
+        embeddings = embeddings.result()
+    collection.upsert(
+        ids=[d.id for d in docs],
+        embeddings=embeddings,
+        documents=[d.page_content for d in docs],
+        metadatas=[d.metadata for d in docs],
+    )
+    return len(docs)
 
 
 if __name__ == "__main__":
-    inject_medlineplus_to_chroma()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Embed MedlinePlus drug data into the vector store")
+    parser.add_argument("--csv", default="./data/medlineplus_drugs.csv")
+    parser.add_argument("--persist-dir", help="default: CHROMA_DIR, or NUMPY_STORE_DIR with VECTOR_STORE=numpy")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="CSV rows read at a time")
+    parser.add_argument("--batch-size", type=int, default=64, help="chunks embedded per batch")
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS, help="token budget per chunk")
+    parser.add_argument("--workers", type=int, default=0, help="embedding processes (0 = in-process)")
+    parser.add_argument("--backend", choices=embedding_config.BACKENDS, default=embedding_config.EMBEDDING_BACKEND,
+                        help="embedding backend")
+    parser.add_argument("--threads", type=int, default=embedding_config.EMBEDDING_THREADS,
+                        help="inference threads per process (0 = library default)")
+    args = parser.parse_args()
+    # Set through the environment as well so spawned worker processes pick them up
+    embedding_config.EMBEDDING_BACKEND, embedding_config.EMBEDDING_THREADS = args.backend, args.threads
+    os.environ.update(EMBEDDING_BACKEND=args.backend, EMBEDDING_THREADS=str(args.threads))
+    inject_medlineplus_to_chroma(args.csv, args.persist_dir, args.chunk_size, args.batch_size, args.workers,
+                                 args.max_tokens)
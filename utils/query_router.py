@@ -0,0 +1,78 @@
+"""Fast path for single-drug, single-section questions.
+
+"Side effects of ibuprofen" needs one MedlinePlus section, not a ReAct loop
+with tool selection. `route()` uses rules over the known drug names (the
+hybrid index name table) and a few intent patterns: a question that names
+exactly one drug and asks for exactly one of Uses / Side Effects /
+Precautions, with nothing that needs trials, the web or another drug, is
+answered by `answer_fast()` with one summarizing LLM call over that
+section. Everything else goes to the agent.
+"""
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from tools.drug_retrieval import drug_section, match_drugs
+from utils.context_budget import CONTEXT_OBSERVATION_TOKENS, trim_observation
+
+# Section label -> pattern of questions asking for it
+INTENTS = {
+    "Side Effects": re.compile(r"side[- ]?effects?|adverse|reactions?"),
+    "Precautions": re.compile(r"precautions?|before (taking|using)|warnings?|pregnan\w*|breast-?feed\w*"
+                              r"|allerg\w*|\bavoid\b|\bsafe\b"),
+    "Uses": re.compile(r"used (for|to)|\buses?\b|\btreats?\b|prescribed|indications?|good for"),
+}
+# "What is metformin?" asks for Uses, unless a more specific section matched
+GENERIC_USES = re.compile(r"^(what is|what's|what does)\b")
+
+# Anything here needs live data, several drugs or dosing details: leave it to the agent
+AGENT_ONLY = re.compile(r"trials?|stud(y|ies)|recruiting|latest|news|\bfda\b|recall|approv\w*|\b20\d\d\b"
+                        r"|interact\w*|\bvs\.?\b|versus|compar\w*|\bdos(e|es|age|ing)\b|\bmg\b")
+
+SUMMARY_PROMPT = """You are a helpful medical information agent.
+Answer the user's question using only the MedlinePlus excerpt below. Be concise and
+accurate; if the excerpt does not answer the question, say so. Remind the user to
+consult a doctor or pharmacist for personal medical advice."""
+
+
+@dataclass
+class Route:
+    path: str  # "fast" or "agent"
+    reason: str
+    drug: Optional[str] = None
+    section: Optional[str] = None
+
+
+def route(query: str) -> Route:
+    """Decide whether query can skip the agent loop."""
+    text = query.lower()
+    if AGENT_ONLY.search(text):
+        return Route("agent", "needs live data or several drugs")
+    drugs = match_drugs(query)
+    if len(drugs) != 1:
+        return Route("agent", "no known drug named" if not drugs else "several drugs named")
+    sections = [section for section, pattern in INTENTS.items() if pattern.search(text)]
+    if not sections and GENERIC_USES.search(text.strip()):
+        sections = ["Uses"]
+    if len(sections) != 1:
+        return Route("agent", "no section intent" if not sections else "several sections asked", drug=drugs[0])
+    return Route("fast", "single drug and section", drug=drugs[0], section=sections[0])
+
+
+def answer_fast(query: str, decision: Route, llm, config=None) -> AIMessage:
+    """
+    Answer from one monograph section with a single LLM call
+
+    Raises:
+        LookupError: when the drug has no indexed text for that section
+    """
+    text = drug_section(decision.drug, decision.section)
+    if not text:
+        raise LookupError(f"no {decision.section} section indexed for {decision.drug}")
+    excerpt = trim_observation(text, query, CONTEXT_OBSERVATION_TOKENS)
+    return llm.invoke([
+        SystemMessage(SUMMARY_PROMPT),
+        HumanMessage(f"Question: {query}\n\nMedlinePlus, {decision.drug}, {decision.section}:\n{excerpt}"),
+    ], config=config)
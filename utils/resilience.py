@@ -0,0 +1,360 @@
+"""Failure handling for remote dependencies (ClinicalTrials.gov, web search).
+
+A `Dependency` puts one remote service behind:
+
+* a circuit breaker: after `failures` consecutive failures calls are
+  refused for `reset_after_s`, then one probe call decides whether to close
+  (a probe that has not reported back after another `reset_after_s` is
+  given up on and the next call probes instead);
+* a deadline: never wait longer than `timeout_s` or the time left in the
+  question's budget (`query_budget`), whichever is shorter, counted from
+  when the request starts running;
+* its own request slots: at most `max_in_flight` requests on the wire,
+  abandoned (timed-out) ones included, so one slow service cannot tie up
+  the threads of another;
+* a hedged request: if no answer arrived after `hedge_after_s`, the same
+  request is sent again and the first good response wins;
+* a stale fallback: when all of that fails, the caller's `fallback` (e.g.
+  an expired cache entry) is served instead.
+
+If nothing can be served, `DependencyUnavailable` is raised; the tool
+runtime turns it into an "unavailable" observation so the agent answers
+with its other tools instead of retrying.
+"""
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from langchain.agents.middleware import AgentMiddleware, hook_config
+from langchain_core.messages import AIMessage
+
+from utils.tracing import current_trace, metrics, span
+
+QUERY_BUDGET_S = float(os.getenv("QUERY_BUDGET_S", "60"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_S = float(os.getenv("BREAKER_RESET_S", "30"))
+DEPENDENCY_MAX_IN_FLIGHT = int(os.getenv("DEPENDENCY_MAX_IN_FLIGHT", "8"))
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("medagent_deadline", default=None)
+
+
+class DependencyUnavailable(Exception):
+    """A dependency failed and there was no stale result to fall back on."""
+
+    def __init__(self, name: str, reason: str):
+        super().__init__(f"{name} is unavailable: {reason}")
+        self.name = name
+        self.reason = reason
+
+
+@contextmanager
+def query_budget(seconds: float = QUERY_BUDGET_S):
+    """Give everything run inside the block (tools, dependencies, model turns) a shared deadline."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> float:
+    """Seconds left in the current question's budget (inf outside of one)."""
+    deadline = _deadline.get()
+    return math.inf if deadline is None else deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed."""
+
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_after_s: float = BREAKER_RESET_S):
+        """
+        Args:
+            name: Dependency name, used in metrics
+            failures: Consecutive failures that open the circuit
+            reset_after_s: Seconds the circuit stays open before a probe call
+        """
+        self.name = name
+        self.failures = failures
+        self.reset_after_s = reset_after_s
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        metrics.set_circuit_state(self.name, state)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (at most one probe while half-open)."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open" and now - self._opened_at >= self.reset_after_s:
+                self._set_state("half-open")
+                self._probing = False
+            if self.state == "closed":
+                return True
+            if self.state == "half-open" and (not self._probing or now - self._probe_started >= self.reset_after_s):
+                self._probing = True
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._probing = False
+            if self.state != "closed":
+                self._set_state("closed")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            self._probing = False
+            if self.state == "half-open" or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+                self._set_state("open")
+
+
+class RequestSlots:
+    """Worker threads of one dependency, each request holding one until it returns.
+
+    A request that outlives its deadline keeps its slot until the client's
+    own timeout fires, so slots bound what is really on the wire.
+    """
+
+    def __init__(self, name: str, size: int = DEPENDENCY_MAX_IN_FLIGHT):
+        self.size = size
+        self._free = threading.BoundedSemaphore(size)
+        # One thread per slot: a request that got a slot starts at once
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"medagent-{name}")
+
+    def submit(self, fn: Callable[[], Any], wait_s: float = 0.0) -> Optional[Future]:
+        """Start fn on a free slot, waiting up to wait_s for one (None if none freed up)."""
+        if not self._free.acquire(timeout=max(0.0, wait_s)):
+            return None
+        future = self._executor.submit(contextvars.copy_context().run, fn)
+        future.add_done_callback(lambda _: self._free.release())
+        return future
+
+
+FailureCheck = Optional[Callable[[Any], Optional[str]]]
+
+
+def hedged_call(fn: Callable[[], Any], slots: RequestSlots, timeout_s: float, hedge_after_s: Optional[float] = None,
+                failure_reason: FailureCheck = None) -> Tuple[Any, bool]:
+    """
+    Run fn on one of slots' workers, sending a second copy if the first is slow
+
+    Args:
+        fn: The request; raises or returns a response
+        slots: Workers of the dependency being called
+        timeout_s: Give up this many seconds after the request started (waiting
+            for a free slot takes at most as long again)
+        hedge_after_s: Start a second copy after this many seconds (None: never);
+            a copy that fails fast is also retried once this way. Copies are
+            only sent while a slot is free
+        failure_reason: Returns why a response counts as a failure, or None
+
+    Returns:
+        (first good response, whether a hedge was sent)
+
+    Raises:
+        TimeoutError, or the last failure when every copy failed
+    """
+    first = slots.submit(fn, wait_s=timeout_s)
+    if first is None:
+        raise TimeoutError(f"all {slots.size} request slots stayed busy for {timeout_s:g}s")
+    # The deadline starts now that the request runs, within what is left of the budget
+    start = time.monotonic()
+    timeout_s = min(timeout_s, remaining_budget())
+    deadline = start + timeout_s
+    hedge_at = start + hedge_after_s if hedge_after_s is not None and hedge_after_s < timeout_s else None
+
+    pending = {first}
+    hedged = False
+    error: Optional[BaseException] = None
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            raise TimeoutError(f"no response within {timeout_s:g}s") from error
+        if hedge_at is not None and (now >= hedge_at or not pending):
+            copy = slots.submit(fn)
+            if copy is not None:
+                pending.add(copy)
+                hedged = True
+            hedge_at = None
+        if not pending:
+            raise error
+        wake = min(deadline, hedge_at) if hedge_at is not None else deadline
+        done, pending = wait(pending, timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                error = e
+                continue
+            reason = failure_reason(result) if failure_reason else None
+            if reason:
+                error = RuntimeError(reason)
+                continue
+            return result, hedged
+
+
+async def ahedged_call(fn: Callable[[], Any], timeout_s: float, hedge_after_s: Optional[float] = None,
+                       failure_reason: FailureCheck = None) -> Tuple[Any, bool]:
+    """Async counterpart of hedged_call; fn returns an awaitable, slower copies are cancelled."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    deadline = start + timeout_s
+    hedge_at = start + hedge_after_s if hedge_after_s is not None and hedge_after_s < timeout_s else None
+    pending = {asyncio.ensure_future(fn())}
+    hedged = False
+    error: Optional[BaseException] = None
+    try:
+        while True:
+            now = loop.time()
+            if now >= deadline:
+                raise TimeoutError(f"no response within {timeout_s:g}s") from error
+            if hedge_at is not None and (now >= hedge_at or not pending):
+                pending.add(asyncio.ensure_future(fn()))
+                hedge_at, hedged = None, True
+            if not pending:
+                raise error
+            wake = min(deadline, hedge_at) if hedge_at is not None else deadline
+            done, pending = await asyncio.wait(pending, timeout=max(0.0, wake - now),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    result = task.result()
+                except Exception as e:
+                    error = e
+                    continue
+                reason = failure_reason(result) if failure_reason else None
+                if reason:
+                    error = RuntimeError(reason)
+                    continue
+                return result, hedged
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class Dependency:
+    """Breaker, deadline, hedging and stale fallback for one remote service."""
+
+    def __init__(self, name: str, timeout_s: float, hedge_after_s: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None, max_in_flight: int = DEPENDENCY_MAX_IN_FLIGHT):
+        """
+        Args:
+            name: Service name shown to the agent and in metrics
+            timeout_s: Longest wait for one call
+            hedge_after_s: Send a second request after this many seconds (None: never)
+            breaker: Circuit breaker; default one with BREAKER_FAILURES / BREAKER_RESET_S
+            max_in_flight: Requests (hedges and abandoned ones included) on the wire
+                at once from call(); acall() runs on the event loop instead
+        """
+        self.name = name
+        self.timeout_s = timeout_s
+        self.hedge_after_s = hedge_after_s
+        self.breaker = breaker or CircuitBreaker(name)
+        self.slots = RequestSlots(name, max_in_flight)
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, attributes: Dict, outcome: str) -> None:
+        attributes["outcome"] = outcome
+        with self._lock:
+            self.counters[outcome] = self.counters.get(outcome, 0) + 1
+        if current_trace() is None:
+            metrics.observe_dependency(self.name, outcome)
+
+    def _admit(self) -> Tuple[Optional[float], str]:
+        """(timeout for this call, or None with the reason it may not go out)."""
+        # Budget first: once allow() hands out the half-open probe, the call must go out
+        timeout = min(self.timeout_s, remaining_budget())
+        if timeout <= 0:
+            return None, "time budget for this question is used up"
+        if not self.breaker.allow():
+            return None, "circuit open after repeated failures"
+        return timeout, ""
+
+    def _fail(self, attributes: Dict, reason: str, fallback: Optional[Callable[[], Any]]):
+        stale = fallback() if fallback is not None else None
+        if stale is not None:
+            self._record(attributes, "stale")
+            return stale
+        self._record(attributes, "unavailable")
+        raise DependencyUnavailable(self.name, reason)
+
+    def call(self, fn: Callable[[], Any], failure_reason: FailureCheck = None,
+             fallback: Optional[Callable[[], Any]] = None):
+        """fn() under this dependency's policies; fallback() supplies a stale result or None."""
+        with span(self.name, "dependency", dependency=self.name) as attributes:
+            timeout, reason = self._admit()
+            if timeout is not None:
+                try:
+                    result, hedged = hedged_call(fn, self.slots, timeout, self.hedge_after_s, failure_reason)
+                    self.breaker.record_success()
+                    self._record(attributes, "hedged" if hedged else "ok")
+                    return result
+                except Exception as e:
+                    self.breaker.record_failure()
+                    reason = str(e) or type(e).__name__
+                except BaseException:
+                    # Interrupted or cancelled: a half-open probe must not stay taken
+                    self.breaker.record_failure()
+                    raise
+            return self._fail(attributes, reason, fallback)
+
+    async def acall(self, fn: Callable[[], Any], failure_reason: FailureCheck = None,
+                    fallback: Optional[Callable[[], Any]] = None):
+        """Async counterpart of call; fn returns an awaitable."""
+        with span(self.name, "dependency", dependency=self.name) as attributes:
+            timeout, reason = self._admit()
+            if timeout is not None:
+                try:
+                    result, hedged = await ahedged_call(fn, timeout, self.hedge_after_s, failure_reason)
+                    self.breaker.record_success()
+                    self._record(attributes, "hedged" if hedged else "ok")
+                    return result
+                except Exception as e:
+                    self.breaker.record_failure()
+                    reason = str(e) or type(e).__name__
+                except BaseException:
+                    self.breaker.record_failure()
+                    raise
+            return self._fail(attributes, reason, fallback)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"state": self.breaker.state, **self.counters}
+
+
+class QueryBudgetMiddleware(AgentMiddleware):
+    """Ends the agent loop once the question's time budget is spent."""
+
+    @staticmethod
+    def _out_of_time() -> Optional[Dict]:
+        if remaining_budget() > 0:
+            return None
+        message = AIMessage(content="Sorry, I could not finish answering within the time limit. "
+                                    "Some services may be slow right now; please try again shortly.",
+                            response_metadata={"budget_exhausted": True})
+        return {"jump_to": "end", "messages": [message]}
+
+    @hook_config(can_jump_to=["end"])
+    def before_model(self, state, runtime):
+        return self._out_of_time()
+
+    @hook_config(can_jump_to=["end"])
+    async def abefore_model(self, state, runtime):
+        return self._out_of_time()
@@ -0,0 +1,205 @@
+"""Process-wide registry for the heavy shared resources.
+
+The embedding model, the Chroma vector store and the chat model are each
+loaded at most once per process, on first use, and shared by the agent,
+the retrieval tools and the ingestion scripts. `warm_up()` loads them on a
+background thread at startup so the first question does not pay for it.
+"""
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from utils.runtime_profile import MEDAGENT_PROFILE, heavy_modules_loaded, setting
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+CHROMA_DIR = os.getenv("CHROMA_DIR", "chroma_db")
+# "chroma" (default) or "numpy": exact search over a memory-mapped matrix (tools/numpy_store.py)
+VECTOR_STORE = setting("VECTOR_STORE", "chroma")
+NUMPY_STORE_DIR = os.getenv("NUMPY_STORE_DIR", "numpy_store")
+NUMPY_STORE_DTYPE = os.getenv("NUMPY_STORE_DTYPE", "float32")
+
+_instances: Dict[str, object] = {}
+_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+_timings: Dict[str, float] = {}
+# Directory each loaded vector store was opened from, after resolving symlinks
+_resolved_dirs: Dict[str, str] = {}
+_process_start = time.perf_counter()
+_warm_thread: Optional[threading.Thread] = None
+
+
+@contextmanager
+def timed(phase: str):
+    """Record the wall-clock duration of a startup phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings[phase] = time.perf_counter() - start
+
+
+def _get_or_create(name: str, factory: Callable[[], object]) -> object:
+    # Double-checked locking: one lock per resource so loading the LLM
+    # never blocks a caller that only needs the embedder.
+    if name in _instances:
+        return _instances[name]
+    with _registry_lock:
+        lock = _locks.setdefault(name, threading.Lock())
+    with lock:
+        if name not in _instances:
+            with timed(f"load_{name}"):
+                _instances[name] = factory()
+    return _instances[name]
+
+
+def get_embedding():
+    """Shared sentence-transformers embedding model on the EMBEDDING_BACKEND backend."""
+    def factory():
+        from utils.embeddings import load_embeddings
+        return load_embeddings(EMBEDDING_MODEL)
+    return _get_or_create("embedding", factory)
+
+
+def default_store_dir() -> str:
+    """Persist directory of the configured VECTOR_STORE."""
+    return NUMPY_STORE_DIR if VECTOR_STORE == "numpy" else CHROMA_DIR
+
+
+def get_vectordb(persist_dir: Optional[str] = None):
+    """Shared vector store backed by persist_dir (default: the VECTOR_STORE's directory).
+
+    persist_dir may be a symlink swapped by utils/index_maintenance.py; the
+    store is opened at the resolved path so a swap opens a new store rather
+    than Chroma's cached one.
+    """
+    persist_dir = persist_dir or default_store_dir()
+    name = "vectordb" if persist_dir == default_store_dir() else f"vectordb:{persist_dir}"
+
+    def factory():
+        from utils.embeddings import LazyEmbeddings
+        resolved = os.path.realpath(persist_dir)
+        # The embedding model loads on the first query that needs it, not here
+        embedding = LazyEmbeddings(get_embedding)
+        if VECTOR_STORE == "numpy":
+            from tools.numpy_store import NumpyVectorStore
+            vectordb = NumpyVectorStore(resolved, embedding, dtype=NUMPY_STORE_DTYPE)
+        else:
+            from langchain_chroma import Chroma
+            vectordb = Chroma(persist_directory=resolved, embedding_function=embedding)
+        _resolved_dirs[name] = resolved
+        return vectordb
+    return _get_or_create(name, factory)
+
+
+def reload_if_swapped() -> bool:
+    """Drop the shared vector store if its directory now resolves elsewhere.
+
+    Returns:
+        True when the store will be reopened on next use
+    """
+    resolved = _resolved_dirs.get("vectordb")
+    if resolved is None or resolved == os.path.realpath(default_store_dir()):
+        return False
+    reset("vectordb")
+    return True
+
+
+def hybrid_index_path(persist_dir: Optional[str] = None) -> str:
+    from tools.hybrid_index import INDEX_FILENAME
+    return os.path.join(persist_dir or default_store_dir(), INDEX_FILENAME)
+
+
+def get_hybrid_index():
+    """Shared BM25 + drug-name index saved next to the vector store.
+
+    Falls back to building it from the collection when the file is missing
+    (stores ingested before the index existed).
+    """
+    def factory():
+        from tools.hybrid_index import HybridIndex
+        path = hybrid_index_path()
+        if os.path.exists(path):
+            return HybridIndex.load(path)
+        return HybridIndex.from_collection(get_vectordb()._collection)
+    return _get_or_create("hybrid_index", factory)
+
+
+def get_llm():
+    """Shared chat model configured from MODEL_NAME / GEMINI_API_KEY."""
+    def factory():
+        from dotenv import load_dotenv
+        from langchain.chat_models import init_chat_model
+
+        load_dotenv(dotenv_path=".env", override=True)
+        if not os.getenv("GEMINI_API_KEY"):
+            raise ValueError("GEMINI_API_KEY not set. Check your .env file.")
+        return init_chat_model(os.getenv("MODEL_NAME"),
+                               model_provider="google_genai",
+                               api_key=os.getenv("GEMINI_API_KEY"))
+    return _get_or_create("llm", factory)
+
+
+def reset(name: Optional[str] = None) -> None:
+    """Drop one cached resource (or all of them) so it is reloaded on next use."""
+    with _registry_lock:
+        if name is None:
+            _instances.clear()
+        else:
+            _instances.pop(name, None)
+
+
+def _warm(include_llm: bool) -> None:
+    with timed("warm_up"):
+        get_vectordb()
+        # Lexical-only retrieval never embeds a query
+        if setting("RETRIEVAL_MODE", "hybrid") != "lexical":
+            with timed("first_embedding"):
+                get_embedding().embed_query("warm up")
+        if include_llm:
+            try:
+                get_llm()
+            except Exception as e:
+                print(f"⚠️ LLM warm-up skipped: {e}")
+
+
+def warm_up(background: bool = True, include_llm: bool = True) -> Optional[threading.Thread]:
+    """
+    Pre-load the shared resources.
+
+    Args:
+        background: Load on a daemon thread and return immediately
+        include_llm: Also initialise the chat model
+
+    Returns:
+        The warm-up thread when running in the background, else None
+    """
+    global _warm_thread
+    if not background:
+        _warm(include_llm)
+        return None
+    with _registry_lock:
+        if _warm_thread is None:
+            _warm_thread = threading.Thread(target=_warm, args=(include_llm,),
+                                            name="medagent-warm-up", daemon=True)
+            _warm_thread.start()
+    return _warm_thread
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def startup_report() -> Dict:
+    """Startup phase timings, loaded resources, heavy modules imported so far and peak RSS."""
+    return {
+        "profile": MEDAGENT_PROFILE,
+        "phases_s": {phase: round(seconds, 4) for phase, seconds in _timings.items()},
+        "loaded": sorted(_instances),
+        "heavy_modules": heavy_modules_loaded(),
+        "uptime_s": round(time.perf_counter() - _process_start, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
@@ -0,0 +1,132 @@
+"""Local HTTP service that owns the embedder, Chroma store and hybrid index.
+
+`serve.py` starts it once in the parent process; agent workers set
+RETRIEVAL_SERVICE_URL and call it instead of loading their own copies of
+the model and index. The wire format is JSON:
+
+    POST /retrieve  {"query", "k", "threshold", "expand_parents"} -> {"documents": [...], "version"}
+    POST /match     {"query"} -> {"drugs": [...]}
+    POST /section   {"drug", "section"} -> {"text"}
+    GET  /version   -> {"version"}
+    GET  /health    -> {"status": "ok", "documents"}
+
+Errors come back as {"error": message} with status 400 (bad request),
+404 (unknown path) or 500 (retrieval failed); remote_call raises them as
+RetrievalServiceError.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import requests
+from langchain_core.documents import Document
+
+from utils.tracing import span
+
+_session = requests.Session()
+
+
+class RetrievalServiceError(requests.HTTPError):
+    """The retrieval service answered with an error status."""
+
+
+def _document_to_dict(doc: Document) -> Dict:
+    return {"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata}
+
+
+def start_retrieval_service(port: int = 0, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve retrieve_drug_info on a daemon thread; port 0 picks a free port."""
+    from tools.drug_retrieval import drug_section, knowledge_version, match_drugs, retrieve_drug_info
+    from utils.resources import get_vectordb
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: Dict) -> None:
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send_failure(self, error: Exception) -> None:
+            # Without a reply the worker would only see a dropped connection
+            self._send(500, {"error": f"{type(error).__name__}: {error}"})
+
+        def do_GET(self):
+            try:
+                if self.path == "/version":
+                    result = {"version": knowledge_version()}
+                elif self.path == "/health":
+                    result = {"status": "ok", "documents": get_vectordb()._collection.count()}
+                else:
+                    self._send(404, {"error": "not found"})
+                    return
+            except Exception as e:
+                self._send_failure(e)
+                return
+            self._send(200, result)
+
+        def do_POST(self):
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path == "/retrieve":
+                    docs = retrieve_drug_info(body["query"], k=int(body.get("k", 3)),
+                                              threshold=float(body.get("threshold", 0.0)),
+                                              expand_parents=bool(body.get("expand_parents", False)))
+                    result = {"documents": [_document_to_dict(d) for d in docs], "version": knowledge_version()}
+                elif self.path == "/match":
+                    result = {"drugs": match_drugs(body["query"])}
+                elif self.path == "/section":
+                    result = {"text": drug_section(body["drug"], body["section"])}
+                else:
+                    self._send(404, {"error": "not found"})
+                    return
+            except (KeyError, ValueError) as e:
+                self._send(400, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send_failure(e)
+                return
+            self._send(200, result)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="medagent-retrieval", daemon=True).start()
+    return server
+
+
+def _raise_for_error(response: requests.Response, path: str) -> None:
+    if response.ok:
+        return
+    try:
+        error = response.json().get("error")
+    except ValueError:
+        error = None
+    raise RetrievalServiceError(f"retrieval service {path} failed with {response.status_code}: "
+                                f"{error or response.reason}", response=response)
+
+
+def remote_call(url: str, path: str, body: Dict, timeout: float = 30.0) -> Dict:
+    """POST body to an endpoint of the retrieval service at url."""
+    with span("retrieval service", "rpc", path=path):
+        response = _session.post(f"{url}{path}", json=body, timeout=timeout)
+        _raise_for_error(response, path)
+        return response.json()
+
+
+def remote_retrieve(url: str, query: str, k: int = 3, threshold: float = 0.0,
+                    expand_parents: bool = False, timeout: float = 30.0) -> List[Document]:
+    """retrieve_drug_info executed by the retrieval service at url."""
+    documents = remote_call(url, "/retrieve", timeout=timeout, body={
+        "query": query, "k": k, "threshold": threshold, "expand_parents": expand_parents,
+    })["documents"]
+    return [Document(id=d["id"], page_content=d["page_content"], metadata=d["metadata"]) for d in documents]
+
+
+def remote_version(url: str, timeout: float = 5.0) -> str:
+    response = _session.get(f"{url}/version", timeout=timeout)
+    _raise_for_error(response, "/version")
+    return response.json()["version"]
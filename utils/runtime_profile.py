@@ -0,0 +1,40 @@
+"""Runtime profiles: which backends MedAgent uses when not configured explicitly.
+
+`full` (default) embeds with sentence-transformers on torch and searches
+Chroma. `lite` serves without torch, sentence-transformers or Chroma: the
+int8 ONNX graph of the same model (ONNX Runtime + tokenizers) and the
+memory-mapped NumPy store, whose document vectors were computed at export
+time. Without onnxruntime installed, lite retrieval is lexical only
+(drug-name table + BM25, no query embedding). Select it with
+MEDAGENT_PROFILE=lite; variables set explicitly (EMBEDDING_BACKEND,
+VECTOR_STORE, RETRIEVAL_MODE) still win.
+"""
+import importlib.util
+import os
+import sys
+from typing import Dict, List
+
+PROFILES: Dict[str, Dict[str, str]] = {
+    "full": {},
+    "lite": {
+        "EMBEDDING_BACKEND": "onnx-int8",
+        "VECTOR_STORE": "numpy",
+        "RETRIEVAL_MODE": "hybrid" if importlib.util.find_spec("onnxruntime") else "lexical",
+    },
+}
+MEDAGENT_PROFILE = os.getenv("MEDAGENT_PROFILE", "full")
+if MEDAGENT_PROFILE not in PROFILES:
+    raise ValueError(f"Unknown MEDAGENT_PROFILE '{MEDAGENT_PROFILE}', expected one of {', '.join(PROFILES)}")
+
+# Imports worth knowing about when looking at startup time and RSS
+HEAVY_MODULES = ("torch", "transformers", "sentence_transformers", "chromadb", "onnxruntime",
+                 "pandas", "streamlit", "langgraph", "langchain_community")
+
+
+def setting(name: str, default: str) -> str:
+    """An environment setting, defaulting to the active profile's value, then to default."""
+    return os.getenv(name) or PROFILES[MEDAGENT_PROFILE].get(name, default)
+
+
+def heavy_modules_loaded() -> List[str]:
+    return [name for name in HEAVY_MODULES if name in sys.modules]
@@ -1,14 +1,29 @@
+import argparse
+import csv
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
 import requests
 import pandas as pd
-from typing import List, Dict
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 
 HEADERS = {"User-Agent": "Mozilla/5.0"}
+FIELDS = ["drug_name", "url", "uses", "side_effects", "precautions"]
 
-def scrape_medlineplus_drug(url: str) -> Dict:
-    r = requests.get(url, headers=HEADERS, timeout=10)
-    soup = BeautifulSoup(r.text, 'html.parser')
+
+def parse_medlineplus_html(html: str, url: str, parser: str = "html.parser") -> Dict:
+    """Extract a drug record from a MedlinePlus monograph page.
+
+    `parser` is any BeautifulSoup backend; "lxml" is several times faster
+    than the default pure-Python "html.parser".
+    """
+    soup = BeautifulSoup(html, parser)
 
     name = soup.find("h1").text.strip()
 
@@ -29,6 +44,12 @@ def scrape_medlineplus_drug(url: str) -> Dict:
         "precautions": extract_section("What special precautions")
     }
 
+
+def scrape_medlineplus_drug(url: str) -> Dict:
+    r = requests.get(url, headers=HEADERS, timeout=10)
+    return parse_medlineplus_html(r.text, url)
+
+
 def scrape_multiple_drugs(drug_urls: List[str], output_path: str = "data/medlineplus_drugs.csv"):
     os.makedirs("data", exist_ok=True)
     records = []
@@ -39,24 +60,245 @@ def scrape_multiple_drugs(drug_urls: List[str], output_path: str = "data/medline
             records.append(record)
         except Exception as e:
             print(f"Failed to scrape {url}: {e}")
-    
+
     df = pd.DataFrame(records)
     df.to_csv(output_path, index=False, sep=";")
     print(f"Saved scraped data to {output_path}")
 
+
+class HttpFetcher:
+    """Pooled-session fetcher that sends conditional GETs.
+
+    Requests to the same host are limited to `per_host` in flight and spaced
+    at least `min_interval` seconds apart.
+    """
+
+    def __init__(self, pool_size: int = 8, per_host: int = 2, min_interval: float = 0.5, timeout: float = 10):
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self._host_slots: Dict[str, threading.Semaphore] = {}
+        self._host_next: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _wait_for_host(self, host: str) -> threading.Semaphore:
+        with self._lock:
+            slot = self._host_slots.setdefault(host, threading.Semaphore(self.per_host))
+        slot.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._host_next.get(host, now))
+            self._host_next[host] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+        return slot
+
+    def fetch(self, url: str, validators: Dict) -> Tuple[int, Optional[str], Dict]:
+        """Return (status, body, validators); status 304 means unchanged."""
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        slot = self._wait_for_host(urlparse(url).netloc)
+        try:
+            r = self.session.get(url, headers=headers, timeout=self.timeout)
+        finally:
+            slot.release()
+        if r.status_code == 304:
+            return 304, None, validators
+        r.raise_for_status()
+        return r.status_code, r.text, {
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+        }
+
+
+class FixtureFetcher:
+    """Offline fetcher serving saved pages from a directory.
+
+    A URL maps to the file named after its last path segment (e.g.
+    a696005.html). The file mtime stands in for Last-Modified, so touching a
+    fixture makes the next run treat the page as changed.
+    """
+
+    def __init__(self, fixtures_dir: str):
+        self.fixtures_dir = fixtures_dir
+
+    def fetch(self, url: str, validators: Dict) -> Tuple[int, Optional[str], Dict]:
+        path = os.path.join(self.fixtures_dir, os.path.basename(urlparse(url).path))
+        last_modified = str(os.path.getmtime(path))
+        if validators.get("last_modified") == last_modified:
+            return 304, None, validators
+        with open(path, encoding="utf-8") as f:
+            return 200, f.read(), {"etag": None, "last_modified": last_modified}
+
+
+class Checkpoint:
+    """On-disk record of each URL's validators, one JSON line appended per page.
+
+    Later lines win; a line torn by a crash is ignored. `compact` rewrites
+    the file with one line per URL. A checkpoint written as a single JSON
+    object (url -> validators) by older versions still loads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if not isinstance(entry, dict):
+                        continue
+                    if isinstance(entry.get("url"), str):
+                        self.entries[entry.pop("url")] = entry
+                    else:
+                        self.entries.update(entry)
+
+    def get(self, url: str) -> Dict:
+        return self.entries.get(url, {})
+
+    def update(self, url: str, validators: Dict) -> None:
+        with self._lock:
+            self.entries[url] = {**validators, "fetched_at": time.time()}
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"url": url, **self.entries[url]}) + "\n")
+
+    def compact(self) -> None:
+        with self._lock:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for url, validators in self.entries.items():
+                    f.write(json.dumps({"url": url, **validators}) + "\n")
+            os.replace(tmp, self.path)
+
+
+def _append_record(output_path: str, record: Dict, lock: threading.Lock) -> None:
+    with lock:
+        new_file = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        with open(output_path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS, delimiter=";")
+            if new_file:
+                writer.writeheader()
+            writer.writerow(record)
+
+
+def compact_csv(output_path: str) -> int:
+    """Keep only the latest record per URL; returns the remaining row count."""
+    df = pd.read_csv(output_path, sep=";")
+    df = df.drop_duplicates(subset="url", keep="last")
+    tmp = f"{output_path}.tmp"
+    df.to_csv(tmp, index=False, sep=";")
+    os.replace(tmp, output_path)
+    return len(df)
+
+
+def scrape_incremental(drug_urls: List[str],
+                       output_path: str = "data/medlineplus_drugs.csv",
+                       checkpoint_path: str = "data/scrape_checkpoint.json",
+                       workers: int = 8,
+                       fetcher=None,
+                       parser: str = "html.parser") -> Dict:
+    """
+    Scrape many monographs concurrently and resumably.
+
+    Each page is fetched with a conditional GET; unchanged pages (304) are
+    skipped. Changed pages are parsed and appended to the CSV immediately,
+    and their validators appended to the checkpoint, so a crash loses at
+    most the pages in flight. The CSV and the checkpoint are compacted to
+    one row per URL at the end.
+
+    Args:
+        drug_urls: Monograph URLs to scrape
+        output_path: Semicolon-separated CSV to append to
+        checkpoint_path: JSON-lines file holding ETag/Last-Modified per URL
+        workers: Size of the worker pool
+        fetcher: HttpFetcher (default) or FixtureFetcher for offline runs
+        parser: BeautifulSoup backend ("html.parser" or "lxml")
+
+    Returns:
+        Counts of fetched, unchanged and failed pages
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    fetcher = fetcher or HttpFetcher(pool_size=workers)
+    checkpoint = Checkpoint(checkpoint_path)
+    csv_lock = threading.Lock()
+    counts = {"fetched": 0, "unchanged": 0, "failed": 0}
+
+    def work(url: str) -> str:
+        status, html, validators = fetcher.fetch(url, checkpoint.get(url))
+        if status == 304:
+            return "unchanged"
+        _append_record(output_path, parse_medlineplus_html(html, url, parser), csv_lock)
+        checkpoint.update(url, validators)
+        return "fetched"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(work, url): url for url in drug_urls}
+        for future in as_completed(futures):
+            try:
+                counts[future.result()] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"Failed to scrape {futures[future]}: {e}")
+
+    if counts["fetched"]:
+        counts["rows"] = compact_csv(output_path)
+        checkpoint.compact()
+    counts["seconds"] = round(time.perf_counter() - start, 2)
+    print(f"Scraped {counts['fetched']} changed, {counts['unchanged']} unchanged, "
+          f"{counts['failed']} failed in {counts['seconds']}s -> {output_path}")
+    return counts
+
+
+DEFAULT_URLS = [
+    "https://medlineplus.gov/druginfo/meds/a696005.html",  # Metformin
+    "https://medlineplus.gov/druginfo/meds/a682159.html",  # Ibuprofen
+    "https://medlineplus.gov/druginfo/meds/a611014.html",  # Ceftaroline
+    "https://medlineplus.gov/druginfo/meds/a611003.html",  # Liraglutide
+    "https://medlineplus.gov/druginfo/meds/a699002.html",  # Diclofenac and Misoprostol
+    "https://medlineplus.gov/druginfo/meds/a604002.html",  # Alfuzosin
+    "https://medlineplus.gov/druginfo/meds/a682145.html",  # Albuterol
+    "https://medlineplus.gov/druginfo/meds/a693050.html",  # Omeprazole
+    "https://medlineplus.gov/druginfo/meds/a682461.html",  # Levothyroxine
+    "https://medlineplus.gov/druginfo/meds/a682277.html",  # Warfarin
+    "https://medlineplus.gov/druginfo/meds/a685001.html",  # Amoxicillin
+    "https://medlineplus.gov/druginfo/meds/a600045.html", # Atorvastatin
+    ]
+
 if __name__ == "__main__":
-    urls = [
-        "https://medlineplus.gov/druginfo/meds/a696005.html",  # Metformin
-        "https://medlineplus.gov/druginfo/meds/a682159.html",  # Ibuprofen
-        "https://medlineplus.gov/druginfo/meds/a611014.html",  # Ceftaroline
-        "https://medlineplus.gov/druginfo/meds/a611003.html",  # Liraglutide
-        "https://medlineplus.gov/druginfo/meds/a699002.html",  # Diclofenac and Misoprostol 
-        "https://medlineplus.gov/druginfo/meds/a604002.html",  # Alfuzosin 
-        "https://medlineplus.gov/druginfo/meds/a682145.html",  # Albuterol
-        "https://medlineplus.gov/druginfo/meds/a693050.html",  # Omeprazole
-        "https://medlineplus.gov/druginfo/meds/a682461.html",  # Levothyroxine
-        "https://medlineplus.gov/druginfo/meds/a682277.html",  # Warfarin
-        "https://medlineplus.gov/druginfo/meds/a685001.html",  # Amoxicillin
-        "https://medlineplus.gov/druginfo/meds/a600045.html", # Atorvastatin
-        ]
-    scrape_multiple_drugs(urls)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape MedlinePlus drug monographs")
+    parser.add_argument("--urls-file", help="file with one monograph URL per line (default: built-in list)")
+    parser.add_argument("--output", default="data/medlineplus_drugs.csv")
+    parser.add_argument("--incremental", action="store_true",
+                        help="concurrent, resumable mode with conditional GETs")
+    parser.add_argument("--checkpoint", default="data/scrape_checkpoint.json")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--per-host", type=int, default=2, help="max concurrent requests per host")
+    parser.add_argument("--delay", type=float, default=0.5, help="min seconds between requests to a host")
+    parser.add_argument("--parser", default="html.parser", help="BeautifulSoup backend, e.g. lxml")
+    parser.add_argument("--fixtures", help="serve pages from this directory of saved HTML instead of the web")
+    args = parser.parse_args()
+
+    urls = DEFAULT_URLS
+    if args.urls_file:
+        with open(args.urls_file) as f:
+            urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    if args.incremental or args.fixtures:
+        fetcher = (FixtureFetcher(args.fixtures) if args.fixtures
+                   else HttpFetcher(pool_size=args.workers, per_host=args.per_host, min_interval=args.delay))
+        scrape_incremental(urls, args.output, args.checkpoint, args.workers, fetcher, args.parser)
+    else:
+        scrape_multiple_drugs(urls, args.output)
@@ -0,0 +1,107 @@
+"""Tool results shared by every question of a batch run.
+
+In a batch of curated questions many ask about the same drug, so the agent
+calls DrugInfo("metformin") or searches the same trials over and over. The
+middleware keys each call on the tool name and its normalized arguments:
+the first call runs, concurrent identical calls wait for it, and later ones
+reuse its result. Failed calls are not kept, so they are retried.
+"""
+import asyncio
+import json
+import threading
+from concurrent.futures import Future
+from typing import Dict, Tuple
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import ToolMessage
+
+from tools.retrieval_cache import normalize_query
+from utils.tracing import span
+
+
+def call_key(tool_call: Dict) -> Tuple[str, str]:
+    """(tool name, arguments with string values normalized)."""
+    args = {name: normalize_query(value) if isinstance(value, str) else value
+            for name, value in (tool_call.get("args") or {}).items()}
+    return tool_call["name"], json.dumps(args, sort_keys=True, default=str)
+
+
+class SharedToolCallMiddleware(AgentMiddleware):
+    """Memoizes tool results across conversations with single-flight execution."""
+
+    def __init__(self, max_entries: int = 10_000):
+        """
+        Args:
+            max_entries: Results kept; the oldest are dropped beyond this
+        """
+        super().__init__()
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._results: Dict[Tuple[str, str], Future] = {}
+        self.counters = {"calls": 0, "executed": 0, "shared": 0}
+
+    def _claim(self, key) -> Tuple[Future, bool]:
+        """The future holding key's result, and whether the caller must produce it."""
+        with self._lock:
+            self.counters["calls"] += 1
+            future = self._results.get(key)
+            if future is not None:
+                self.counters["shared"] += 1
+                return future, False
+            future = self._results[key] = Future()
+            self.counters["executed"] += 1
+            while len(self._results) > self.max_entries:
+                self._results.pop(next(iter(self._results)))
+            return future, True
+
+    def _settle(self, key, future: Future, message) -> None:
+        if not isinstance(message, ToolMessage) or message.status == "error":
+            with self._lock:
+                if self._results.get(key) is future:
+                    del self._results[key]
+        future.set_result(message)
+
+    def _abandon(self, key, future: Future, error: BaseException) -> None:
+        with self._lock:
+            if self._results.get(key) is future:
+                del self._results[key]
+        future.set_exception(error)
+
+    @staticmethod
+    def _reply(request, message):
+        # The stored observation answers another call id
+        if isinstance(message, ToolMessage):
+            return message.model_copy(update={"tool_call_id": request.tool_call["id"], "id": None})
+        return message
+
+    def wrap_tool_call(self, request, handler):
+        key = call_key(request.tool_call)
+        future, owner = self._claim(key)
+        if not owner:
+            with span("shared tool call", "tool", tool=key[0]):
+                return self._reply(request, future.result())
+        try:
+            message = handler(request)
+        except BaseException as e:
+            self._abandon(key, future, e)
+            raise
+        self._settle(key, future, message)
+        return message
+
+    async def awrap_tool_call(self, request, handler):
+        key = call_key(request.tool_call)
+        future, owner = self._claim(key)
+        if not owner:
+            with span("shared tool call", "tool", tool=key[0]):
+                return self._reply(request, await asyncio.wrap_future(future))
+        try:
+            message = await handler(request)
+        except BaseException as e:
+            self._abandon(key, future, e)
+            raise
+        self._settle(key, future, message)
+        return message
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self.counters, "entries": len(self._results)}
@@ -0,0 +1,96 @@
+"""Coalescing of identical in-flight calls.
+
+When several sessions ask about the same trending drug at once, each would
+embed the query, search the store and call ClinicalTrials.gov / DuckDuckGo
+with the same arguments. A `SingleFlight` group lets the first caller of a
+key run the call while concurrent callers of that key wait for its result;
+the key is forgotten as soon as the call finishes, so nothing is cached.
+Threads (`do`) and asyncio tasks (`ado`) share one group.
+
+Each call is recorded as a span with a `coalesced` flag (and so reaches
+`/metrics` as medagent_singleflight_*); calls made outside a trace are
+counted directly.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Set, Tuple
+
+from utils.tracing import current_trace, metrics, span
+
+
+class SingleFlight:
+    """One group of coalesced calls, e.g. every retrieve_drug_info call."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        # Shared asyncio calls, referenced until they finish
+        self._tasks: Set[asyncio.Task] = set()
+        self.counters = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """The future of key's call, and whether the caller must run it."""
+        with self._lock:
+            self.counters["calls"] += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.counters["executed"] += 1
+            else:
+                self.counters["coalesced"] += 1
+        if current_trace() is None:
+            metrics.observe_single_flight(self.name, coalesced=not leader)
+        return future, leader
+
+    def _finish(self, key: Hashable, future: Future, result=None, error: BaseException = None) -> None:
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        """fn(*args, **kwargs), shared with concurrent calls of the same key."""
+        future, leader = self._join(key)
+        with span(self.name, "coalesce", single_flight=self.name, coalesced=not leader):
+            if not leader:
+                return future.result()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                self._finish(key, future, error=e)
+                raise
+            self._finish(key, future, result)
+            return result
+
+    def _settle(self, key: Hashable, future: Future, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if task.cancelled():
+            self._finish(key, future, error=asyncio.CancelledError())
+        elif task.exception() is not None:
+            self._finish(key, future, error=task.exception())
+        else:
+            self._finish(key, future, task.result())
+
+    async def ado(self, key: Hashable, fn: Callable, *args, **kwargs):
+        """await fn(*args, **kwargs), shared with concurrent calls of the same key."""
+        future, leader = self._join(key)
+        with span(self.name, "coalesce", single_flight=self.name, coalesced=not leader):
+            if not leader:
+                # Shielded: a cancelled waiter must not cancel the shared call
+                return await asyncio.shield(asyncio.wrap_future(future))
+            # The call runs as a task of its own, so cancelling the caller that
+            # started it leaves it running for the callers waiting on it
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._tasks.add(task)
+            task.add_done_callback(lambda done: self._settle(key, future, done))
+            return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self.counters, "in_flight": len(self._calls)}
@@ -0,0 +1,34 @@
+"""Token estimates shared by ingestion (chunk sizes) and the context budget."""
+import re
+from typing import List
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 word pieces per 3 words for English medical prose
+    return len(text.split()) * 4 // 3 + 1
+
+
+def split_by_tokens(text: str, max_tokens: int) -> List[str]:
+    """Greedily pack sentences into pieces of at most max_tokens (estimated)."""
+    sentences = re.split(r"(?<=[.!?])\s+", text.strip())
+    pieces, current = [], []
+    for sentence in sentences:
+        words = sentence.split()
+        # A single overlong sentence is hard-wrapped on word boundaries
+        while estimate_tokens(" ".join(words)) > max_tokens:
+            # Most words whose estimate stays within max_tokens (inverse of estimate_tokens)
+            cut = max(1, (3 * max_tokens - 1) // 4)
+            if current:
+                pieces.append(" ".join(current))
+                current = []
+            pieces.append(" ".join(words[:cut]))
+            words = words[cut:]
+        if not words:
+            continue
+        if current and estimate_tokens(" ".join(current + words)) > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+        current.extend(words)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
@@ -0,0 +1,143 @@
+"""Concurrency cap and timeout for the tool calls of one agent turn.
+
+The agent's ToolNode already fans the tool calls of a model turn out to a
+thread pool (invoke) or asyncio.gather (ainvoke). This middleware bounds
+how many of them run at once per turn and turns a slow tool into a short
+"timed out" observation, so a turn never takes longer than the timeout
+(or than what is left of the question's time budget). A tool whose
+dependency is down (DependencyUnavailable) becomes an "unavailable"
+observation telling the agent not to call it again for this question.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import AIMessage, ToolMessage
+
+from utils.resilience import DependencyUnavailable, remaining_budget
+
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))
+TOOL_TIMEOUT_S = float(os.getenv("TOOL_TIMEOUT_S", "20"))
+
+
+def _turn_key(request) -> str:
+    # Tool calls of one turn all come from the latest AIMessage in the state
+    messages = request.state.get("messages", []) if isinstance(request.state, dict) else []
+    for message in reversed(messages):
+        if isinstance(message, AIMessage):
+            return message.id or str(id(message))
+    return "turn"
+
+
+def _error(request, content: str) -> ToolMessage:
+    return ToolMessage(content=content, tool_call_id=request.tool_call["id"],
+                       name=request.tool_call["name"], status="error")
+
+
+def _timed_out(request, timeout_s: float) -> ToolMessage:
+    return _error(request, f"{request.tool_call['name']} did not respond within {timeout_s:g}s and is "
+                           f"unavailable right now. Answer with the other tools or say the information "
+                           f"could not be retrieved.")
+
+
+def _unavailable(request, error: DependencyUnavailable) -> ToolMessage:
+    return _error(request, f"{request.tool_call['name']} is unavailable right now ({error.reason}). "
+                           f"Do not call it again for this question; answer with the other tools or say "
+                           f"the information could not be retrieved.")
+
+
+def _out_of_time(request) -> ToolMessage:
+    return _error(request, f"{request.tool_call['name']} was not called: the time budget for this question "
+                           f"is used up. Answer now with the information you already have.")
+
+
+def _start_call(handler, request) -> Future:
+    """Run handler(request) on a thread of its own, starting now.
+
+    A dedicated thread means the timeout covers the tool's own run time only
+    (no queueing behind other calls), and a call that overruns holds nothing
+    but its own thread, which ends when the tool returns.
+    """
+    future: Future = Future()
+    context = contextvars.copy_context()
+
+    def run() -> None:
+        try:
+            # Carry tracing / callback / budget context into the thread
+            future.set_result(context.run(handler, request))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=f"medagent-tool-{request.tool_call['name']}", daemon=True).start()
+    return future
+
+
+class ParallelToolMiddleware(AgentMiddleware):
+    """Per-turn concurrency cap and per-call timeout for tool execution."""
+
+    def __init__(self, max_concurrency: int = TOOL_CONCURRENCY, timeout_s: float = TOOL_TIMEOUT_S):
+        """
+        Args:
+            max_concurrency: Tool calls of one model turn allowed to run at once
+            timeout_s: Seconds before a tool call is answered with a timeout observation
+        """
+        super().__init__()
+        self.max_concurrency = max_concurrency
+        self.timeout_s = timeout_s
+        self._lock = threading.Lock()
+        self._turns = {}
+
+    def _slot(self, key: str, factory):
+        with self._lock:
+            entry = self._turns.get(key)
+            if entry is None:
+                entry = self._turns[key] = [factory(self.max_concurrency), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            entry = self._turns.get(key)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._turns[key]
+
+    def wrap_tool_call(self, request, handler):
+        key = "sync:" + _turn_key(request)
+        semaphore = self._slot(key, threading.BoundedSemaphore)
+        try:
+            with semaphore:
+                timeout = min(self.timeout_s, remaining_budget())
+                if timeout <= 0:
+                    return _out_of_time(request)
+                future = _start_call(handler, request)
+                try:
+                    return future.result(timeout=timeout)
+                except FutureTimeout:
+                    return _timed_out(request, timeout)
+                except DependencyUnavailable as e:
+                    return _unavailable(request, e)
+        finally:
+            self._release(key)
+
+    async def awrap_tool_call(self, request, handler):
+        key = "async:" + _turn_key(request)
+        semaphore = self._slot(key, asyncio.Semaphore)
+        try:
+            async with semaphore:
+                timeout = min(self.timeout_s, remaining_budget())
+                if timeout <= 0:
+                    return _out_of_time(request)
+                try:
+                    return await asyncio.wait_for(handler(request), timeout=timeout)
+                except asyncio.TimeoutError:
+                    return _timed_out(request, timeout)
+                except DependencyUnavailable as e:
+                    return _unavailable(request, e)
+        finally:
+            self._release(key)
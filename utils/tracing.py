@@ -0,0 +1,298 @@
+"""Per-request latency tracing for the agent, its tools and the embedder.
+
+A `trace()` block collects spans (name, kind, start offset, duration,
+payload sizes, token counts) for one question. LLM turns and tool calls are
+captured by the LangChain callback handler from `Trace.callbacks()`; code
+that is not a LangChain runnable (embedding, vector search) records spans
+with `span()`. Finished traces are aggregated into Prometheus-style metrics
+and, when MEDAGENT_TRACE_FILE is set, appended to a JSONL file.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+TRACE_FILE = os.getenv("MEDAGENT_TRACE_FILE")
+
+_current: contextvars.ContextVar = contextvars.ContextVar("medagent_trace", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str
+    start_s: float
+    duration_s: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class Trace:
+    """Spans recorded while answering one question."""
+
+    def __init__(self, label: str = ""):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.label = label
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.duration_s = 0.0
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def offset(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def callbacks(self) -> List[BaseCallbackHandler]:
+        """Callback handlers to pass as config={"callbacks": ...} to invoke()."""
+        return [TracingCallbackHandler(self)]
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "label": self.label,
+            "started_at": self.started_at,
+            "duration_s": round(self.duration_s, 6),
+            "spans": [asdict(s) for s in sorted(self.spans, key=lambda s: s.start_s)],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Trace":
+        """Rebuild a finished trace, e.g. one recorded in another process."""
+        restored = cls(data.get("label", ""))
+        restored.trace_id = data.get("trace_id", restored.trace_id)
+        restored.started_at = data.get("started_at", restored.started_at)
+        restored.duration_s = data.get("duration_s", 0.0)
+        restored.spans = [Span(**s) for s in data.get("spans", [])]
+        return restored
+
+    def waterfall(self, width: int = 40) -> str:
+        """Plain-text waterfall: one bar per span, positioned on the trace timeline."""
+        total = self.duration_s or max((s.start_s + s.duration_s for s in self.spans), default=0.0) or 1e-9
+        lines = [f"{'span':<28} {'kind':<9} {'ms':>9}  timeline"]
+        for s in sorted(self.spans, key=lambda s: s.start_s):
+            begin = int(s.start_s / total * width)
+            length = max(1, int(s.duration_s / total * width))
+            bar = " " * begin + "█" * min(length, width - begin)
+            lines.append(f"{s.name[:28]:<28} {s.kind:<9} {s.duration_s * 1000:>9.1f}  |{bar:<{width}}|")
+        lines.append(f"{'total':<28} {'':<9} {total * 1000:>9.1f}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def trace(label: str = ""):
+    """Open a trace for one request; it is exported when the block exits."""
+    current = Trace(label)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        current.duration_s = current.offset()
+        _current.reset(token)
+        metrics.observe_trace(current)
+        if TRACE_FILE:
+            export_jsonl(current, TRACE_FILE)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """Record a span in the active trace (no-op outside of a trace)."""
+    current = _current.get()
+    if current is None:
+        yield attributes
+        return
+    record = Span(name=name, kind=kind, start_s=current.offset(), attributes=attributes)
+    start = time.perf_counter()
+    try:
+        yield record.attributes
+    finally:
+        record.duration_s = time.perf_counter() - start
+        current.add(record)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Turns LangChain LLM and tool callbacks into spans of a Trace."""
+
+    def __init__(self, current: Trace):
+        self.trace = current
+        self._open: Dict[Any, Span] = {}
+        self._llm_turns = 0
+
+    def _start(self, run_id, name: str, kind: str, **attributes) -> None:
+        self._open[run_id] = Span(name=name, kind=kind, start_s=self.trace.offset(), attributes=attributes)
+
+    def _end(self, run_id, **attributes) -> None:
+        record = self._open.pop(run_id, None)
+        if record is None:
+            return
+        record.duration_s = self.trace.offset() - record.start_s
+        record.attributes.update(attributes)
+        self.trace.add(record)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._llm_turns += 1
+        chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._start(run_id, f"llm turn {self._llm_turns}", "llm", input_chars=chars)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage: Dict[str, int] = {}
+        output_chars = 0
+        for generations in response.generations:
+            for generation in generations:
+                output_chars += len(getattr(generation, "text", "") or "")
+                message = getattr(generation, "message", None)
+                for key, value in (getattr(message, "usage_metadata", None) or {}).items():
+                    if isinstance(value, int):
+                        usage[key] = usage.get(key, 0) + value
+        self._end(run_id, output_chars=output_chars, **usage)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=str(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start(run_id, name, "tool", input_chars=len(input_str or ""))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        content = getattr(output, "content", output)
+        self._end(run_id, output_chars=len(str(content)))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=str(error))
+
+
+_file_lock = threading.Lock()
+
+
+def export_jsonl(current: Trace, path: str) -> None:
+    line = json.dumps(current.to_dict())
+    with _file_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class Metrics:
+    """Process-wide aggregates of finished traces, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.request_seconds = 0.0
+        self.spans: Dict[tuple, List[float]] = {}
+        self.tokens: Dict[str, int] = {}
+        self.context_tokens_saved = 0
+        # name -> [calls, coalesced] of utils/single_flight.py groups
+        self.single_flight: Dict[str, List[int]] = {}
+        # (name, outcome) -> calls, and name -> breaker state, of utils/resilience.py dependencies
+        self.dependency_calls: Dict[tuple, int] = {}
+        self.circuit_state: Dict[str, str] = {}
+
+    def observe_dependency(self, name: str, outcome: str) -> None:
+        with self._lock:
+            self._count_dependency(name, outcome)
+
+    def _count_dependency(self, name: str, outcome: str) -> None:
+        self.dependency_calls[(name, outcome)] = self.dependency_calls.get((name, outcome), 0) + 1
+
+    def set_circuit_state(self, name: str, state: str) -> None:
+        with self._lock:
+            self.circuit_state[name] = state
+
+    def observe_single_flight(self, name: str, coalesced: bool) -> None:
+        with self._lock:
+            self._count_single_flight(name, coalesced)
+
+    def _count_single_flight(self, name: str, coalesced: bool) -> None:
+        counts = self.single_flight.setdefault(name, [0, 0])
+        counts[0] += 1
+        counts[1] += int(coalesced)
+
+    def observe_trace(self, current: Trace) -> None:
+        with self._lock:
+            self.requests += 1
+            self.request_seconds += current.duration_s
+            for s in current.spans:
+                name = "llm turn" if s.kind == "llm" else s.name
+                count_sum = self.spans.setdefault((s.kind, name), [0, 0.0])
+                count_sum[0] += 1
+                count_sum[1] += s.duration_s
+                for key in ("input_tokens", "output_tokens"):
+                    if key in s.attributes:
+                        self.tokens[key] = self.tokens.get(key, 0) + s.attributes[key]
+                self.context_tokens_saved += s.attributes.get("tokens_saved", 0)
+                if "single_flight" in s.attributes:
+                    self._count_single_flight(s.attributes["single_flight"], s.attributes.get("coalesced", False))
+                if "dependency" in s.attributes and "outcome" in s.attributes:
+                    self._count_dependency(s.attributes["dependency"], s.attributes["outcome"])
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            lines = [
+                "# TYPE medagent_requests_total counter",
+                f"medagent_requests_total {self.requests}",
+                "# TYPE medagent_request_seconds_sum counter",
+                f"medagent_request_seconds_sum {self.request_seconds:.6f}",
+                "# TYPE medagent_span_seconds summary",
+            ]
+            for (kind, name), (count, total) in sorted(self.spans.items()):
+                labels = f'kind="{kind}",name="{name}"'
+                lines.append(f"medagent_span_seconds_count{{{labels}}} {count}")
+                lines.append(f"medagent_span_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append("# TYPE medagent_llm_tokens_total counter")
+            for key, value in sorted(self.tokens.items()):
+                lines.append(f'medagent_llm_tokens_total{{type="{key}"}} {value}')
+            lines.append("# TYPE medagent_context_tokens_saved_total counter")
+            lines.append(f"medagent_context_tokens_saved_total {self.context_tokens_saved}")
+            lines.append("# TYPE medagent_singleflight_calls_total counter")
+            for name, (calls, _) in sorted(self.single_flight.items()):
+                lines.append(f'medagent_singleflight_calls_total{{name="{name}"}} {calls}')
+            lines.append("# TYPE medagent_singleflight_coalesced_total counter")
+            for name, (_, coalesced) in sorted(self.single_flight.items()):
+                lines.append(f'medagent_singleflight_coalesced_total{{name="{name}"}} {coalesced}')
+            lines.append("# TYPE medagent_dependency_calls_total counter")
+            for (name, outcome), count in sorted(self.dependency_calls.items()):
+                lines.append(f'medagent_dependency_calls_total{{name="{name}",outcome="{outcome}"}} {count}')
+            lines.append("# TYPE medagent_circuit_open gauge")
+            for name, state in sorted(self.circuit_state.items()):
+                lines.append(f'medagent_circuit_open{{name="{name}"}} {int(state == "open")}')
+            return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve GET /metrics in Prometheus text format on a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="medagent-metrics", daemon=True).start()
+    return server